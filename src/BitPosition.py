@@ -1,5 +1,6 @@
+import os
 import json
-import copy
+import hashlib
 import numpy as np
 import random
 
@@ -41,30 +42,19 @@ while len(random_numbers) < 801:
     random_numbers.add(random.randint(1, 2**64 - 1))
 random_numbers = list(random_numbers)
 
-white_pawn_zobrist_numbers = np.array(random_numbers[:64])
-white_knight_zobrist_numbers = np.array(random_numbers[64:2*64])
-white_bishop_zobrist_numbers = np.array(random_numbers[2*64:3*64])
-white_rook_zobrist_numbers = np.array(random_numbers[3*64:4*64])
-white_queen_zobrist_numbers = np.array(random_numbers[4*64:5*64])
-white_king_zobrist_numbers = np.array(random_numbers[5*64:6*64])
-black_pawn_zobrist_numbers = np.array(random_numbers[6*64:7*64])
-black_knight_zobrist_numbers = np.array(random_numbers[7*64:8*64])
-black_bishop_zobrist_numbers = np.array(random_numbers[8*64:9*64])
-black_rook_zobrist_numbers = np.array(random_numbers[9*64:10*64])
-black_queen_zobrist_numbers = np.array(random_numbers[10*64:11*64])
-black_king_zobrist_numbers = np.array(random_numbers[11*64:12*64])
+# One random number per (piece, square), indexed like the bitboards: zobrist_numbers_pieces[piece_index][square]
+zobrist_numbers_pieces = tuple(tuple(random_numbers[piece_index*64:(piece_index+1)*64]) for piece_index in range(12))
 
 black_to_move_zobrist_number = random_numbers[12*64]
 
-castling_rights_zobrist_numbers = np.array(random_numbers[((12*64)+1):((12*64)+17)])
+castling_rights_zobrist_numbers = tuple(random_numbers[((12*64)+1):((12*64)+17)]) # Indexed by the 4 bit castling rights
 
 passant_squares_zobrist_numbers = {-1: 0, 
                      16 : random_numbers[(12*64)+17], 17 : random_numbers[(12*64)+18], 18 : random_numbers[(12*64)+19], 19 : random_numbers[(12*64)+20], 20 : random_numbers[(12*64)+21], 21 : random_numbers[(12*64)+22], 22 : random_numbers[(12*64)+23], 23: random_numbers[(12*64)+24], 
                      40 : random_numbers[(12*64)+25], 41 : random_numbers[(12*64)+26], 42 : random_numbers[(12*64)+27], 43 : random_numbers[(12*64)+28], 44 : random_numbers[(12*64)+29], 45 : random_numbers[(12*64)+30], 46 : random_numbers[(12*64)+31], 47 : random_numbers[(12*64)+32]}
 
-zobrist_numbers_pieces = (white_pawn_zobrist_numbers, white_knight_zobrist_numbers, white_bishop_zobrist_numbers, white_rook_zobrist_numbers, 
-                         white_queen_zobrist_numbers, white_king_zobrist_numbers, black_pawn_zobrist_numbers, black_king_zobrist_numbers, 
-                         black_bishop_zobrist_numbers, black_rook_zobrist_numbers, black_queen_zobrist_numbers, black_king_zobrist_numbers)
+# Set BITPOSITION_DEBUG=1 to check the incremental Zobrist key against a full recompute after every move and unmake_move
+debug_zobrist = os.environ.get('BITPOSITION_DEBUG') == '1'
 
 ####################################
 # Pre-computed crawler tables 
@@ -74,9 +64,14 @@ zobrist_numbers_pieces = (white_pawn_zobrist_numbers, white_knight_zobrist_numbe
 # Precomputed move tables
 knight_moves = (132096, 329728, 659712, 1319424, 2638848, 5277696, 10489856, 4202496, 33816580, 84410376, 168886289, 337772578, 675545156, 1351090312, 2685403152, 1075839008, 8657044482, 21609056261, 43234889994, 86469779988, 172939559976, 345879119952, 687463207072, 275414786112, 2216203387392, 5531918402816, 11068131838464, 22136263676928, 44272527353856, 88545054707712, 175990581010432, 70506185244672, 567348067172352, 1416171111120896, 2833441750646784, 5666883501293568, 11333767002587136, 22667534005174272, 45053588738670592, 18049583422636032, 145241105196122112, 362539804446949376, 725361088165576704, 1450722176331153408, 2901444352662306816, 5802888705324613632, 11533718717099671552, 4620693356194824192, 288234782788157440, 576469569871282176, 1224997833292120064, 2449995666584240128, 4899991333168480256, 9799982666336960512, 1152939783987658752, 2305878468463689728, 1128098930098176, 2257297371824128, 4796069720358912, 9592139440717824, 19184278881435648, 38368557762871296, 4679521487814656, 9077567998918656)
 king_moves = (770, 1797, 3594, 7188, 14376, 28752, 57504, 49216, 197123, 460039, 920078, 1840156, 3680312, 7360624, 14721248, 12599488, 50463488, 117769984, 235539968, 471079936, 942159872, 1884319744, 3768639488, 3225468928, 12918652928, 30149115904, 60298231808, 120596463616, 241192927232, 482385854464, 964771708928, 825720045568, 3307175149568, 7718173671424, 15436347342848, 30872694685696, 61745389371392, 123490778742784, 246981557485568, 211384331665408, 846636838289408, 1975852459884544, 3951704919769088, 7903409839538176, 15806819679076352, 31613639358152704, 63227278716305408, 54114388906344448, 216739030602088448, 505818229730443264, 1011636459460886528, 2023272918921773056, 4046545837843546112, 8093091675687092224, 16186183351374184448, 13853283560024178688, 144959613005987840, 362258295026614272, 724516590053228544, 1449033180106457088, 2898066360212914176, 5796132720425828352, 11592265440851656704, 4665729213955833856)
-white_pawn_moves = (0, 0, 0, 0, 0, 0, 0, 0, 65536, 131072, 262144, 524288, 1048576, 2097152, 4194304, 8388608, 16777216, 33554432, 67108864, 134217728, 268435456, 536870912, 1073741824, 2147483648, 4294967296, 8589934592, 17179869184, 34359738368, 68719476736, 137438953472, 274877906944, 549755813888, 1099511627776, 2199023255552, 4398046511104, 8796093022208, 17592186044416, 35184372088832, 70368744177664, 140737488355328, 281474976710656, 562949953421312, 1125899906842624, 2251799813685248, 4503599627370496, 9007199254740992, 18014398509481984, 36028797018963968, 72057594037927936, 144115188075855872, 288230376151711744, 576460752303423488, 1152921504606846976, 2305843009213693952, 4611686018427387904, 9223372036854775808, 0, 0, 0, 0, 0, 0, 0, 0)
 white_pawn_attacks = (512, 1280, 2560, 5120, 10240, 20480, 40960, 16384, 131072, 327680, 655360, 1310720, 2621440, 5242880, 10485760, 4194304, 33554432, 83886080, 167772160, 335544320, 671088640, 1342177280, 2684354560, 1073741824, 8589934592, 21474836480, 42949672960, 85899345920, 171798691840, 343597383680, 687194767360, 274877906944, 2199023255552, 5497558138880, 10995116277760, 21990232555520, 43980465111040, 87960930222080, 175921860444160, 70368744177664, 562949953421312, 1407374883553280, 2814749767106560, 5629499534213120, 11258999068426240, 22517998136852480, 45035996273704960, 18014398509481984, 144115188075855872, 360287970189639680, 720575940379279360, 1441151880758558720, 2882303761517117440, 5764607523034234880, 11529215046068469760, 4611686018427387904, 0, 0, 0, 0, 0, 0, 0, 0)
-black_pawn_moves = (0, 0, 0, 0, 0, 0, 0, 0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144, 524288, 1048576, 2097152, 4194304, 8388608, 16777216, 33554432, 67108864, 134217728, 268435456, 536870912, 1073741824, 2147483648, 4294967296, 8589934592, 17179869184, 34359738368, 68719476736, 137438953472, 274877906944, 549755813888, 1099511627776, 2199023255552, 4398046511104, 8796093022208, 17592186044416, 35184372088832, 70368744177664, 140737488355328, 0, 0, 0, 0, 0, 0, 0, 0)
+# Masks for moving all pawns at once with shifts, a diagonal shift wraps pawns on the a or h file around to the other side 
+# of the board so we mask out the file they would land on.
+not_a_file = 0xFEFEFEFEFEFEFEFE
+not_h_file = 0x7F7F7F7F7F7F7F7F
+rank_3 = 0xFF0000
+rank_6 = 0xFF0000000000
+first_and_last_ranks = 0xFF000000000000FF # Promotion squares
 black_pawn_attacks = (0, 0, 0, 0, 0, 0, 0, 0, 2, 5, 10, 20, 40, 80, 160, 64, 512, 1280, 2560, 5120, 10240, 20480, 40960, 16384, 131072, 327680, 655360, 1310720, 2621440, 5242880, 10485760, 4194304, 33554432, 83886080, 167772160, 335544320, 671088640, 1342177280, 2684354560, 1073741824, 8589934592, 21474836480, 42949672960, 85899345920, 171798691840, 343597383680, 687194767360, 274877906944, 2199023255552, 5497558138880, 10995116277760, 21990232555520, 43980465111040, 87960930222080, 175921860444160, 70368744177664, 562949953421312, 1407374883553280, 2814749767106560, 5629499534213120, 11258999068426240, 22517998136852480, 45035996273704960, 18014398509481984)
 
 
@@ -89,56 +84,97 @@ bishop_unfull_rays = (18049651735527936, 70506452091904, 275415828992, 107597516
 rook_full_rays = (72340172838076926, 144680345676153597, 289360691352306939, 578721382704613623, 1157442765409226991, 2314885530818453727, 4629771061636907199, 9259542123273814143, 72340172838141441, 144680345676217602, 289360691352369924, 578721382704674568, 1157442765409283856, 2314885530818502432, 4629771061636939584, 9259542123273813888, 72340172854657281, 144680345692602882, 289360691368494084, 578721382720276488, 1157442765423841296, 2314885530830970912, 4629771061645230144, 9259542123273748608, 72340177082712321, 144680349887234562, 289360695496279044, 578721386714368008, 1157442769150545936, 2314885534022901792, 4629771063767613504, 9259542123257036928, 72341259464802561, 144681423712944642, 289361752209228804, 578722409201797128, 1157443723186933776, 2314886351157207072, 4629771607097753664, 9259542118978846848, 72618349279904001, 144956323094725122, 289632270724367364, 578984165983651848, 1157687956502220816, 2315095537539358752, 4629910699613634624, 9259541023762186368, 143553341945872641, 215330564830528002, 358885010599838724, 645993902138460168, 1220211685215703056, 2368647251370188832, 4665518383679160384, 9259260648297103488, 18302911464433844481, 18231136449196065282, 18087586418720506884, 17800486357769390088, 17226286235867156496, 16077885992062689312, 13781085504453754944, 9187484529235886208)
 bishop_full_rays = (9241421688590303744, 36099303471056128, 141012904249856, 550848566272, 6480472064, 1108177604608, 283691315142656, 72624976668147712, 4620710844295151618, 9241421688590368773, 36099303487963146, 141017232965652, 1659000848424, 283693466779728, 72624976676520096, 145249953336262720, 2310355422147510788, 4620710844311799048, 9241421692918565393, 36100411639206946, 424704217196612, 72625527495610504, 145249955479592976, 290499906664153120, 1155177711057110024, 2310355426409252880, 4620711952330133792, 9241705379636978241, 108724279602332802, 145390965166737412, 290500455356698632, 580999811184992272, 577588851267340304, 1155178802063085600, 2310639079102947392, 4693335752243822976, 9386671504487645697, 326598935265674242, 581140276476643332, 1161999073681608712, 288793334762704928, 577868148797087808, 1227793891648880768, 2455587783297826816, 4911175566595588352, 9822351133174399489, 1197958188344280066, 2323857683139004420, 144117404414255168, 360293502378066048, 720587009051099136, 1441174018118909952, 2882348036221108224, 5764696068147249408, 11529391036782871041, 4611756524879479810, 567382630219904, 1416240237150208, 2833579985862656, 5667164249915392, 11334324221640704, 22667548931719168, 45053622886727936, 18049651735527937)
 
-# Combining into a tuple of tuples
-white_pawn_doubles = (0,0,0,0,0,0,0,0, 16777216, 33554432, 67108864, 134217728, 268435456, 536870912, 1073741824, 2147483648, 0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0)
-black_pawn_doubles = (0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,4294967296, 8589934592, 17179869184, 34359738368, 68719476736, 137438953472, 274877906944, 549755813888, 0,0,0,0,0,0,0,0)
 
 
-from utils import get_set_bit_indices, find_least_significant_bit_set, has_one_one, bit_to_numpy_array
+from bit_operations import get_set_bit_indices, find_least_significant_bit_set, count_bits
+from utils import bit_to_numpy_array
 
-# Precomputed bishop and rook moves without magic numbers (they are bits corresponding to moveable and capturing squares)
+# Precomputed slider tables. Building them takes a few seconds (mostly generating blocker combinations), so they are built once
+# into a binary file in magic_info which is memory-mapped on import. The file is rebuilt if it is missing or stale (different
+# version, different magic numbers or corrupted data). Set BITPOSITION_TABLES to use another path.
 
 from utils import generate_bit_combinations, get_valid_piece_moves_including_captures, generate_one_bit_combinations, get_valid_piece_moves
-long_precomputed_rook_table = []
-for square in range(64):
-    long_precomputed_rook_table.append({})
-    blockers_bits = generate_bit_combinations(square, 'R')
-    for blockers_bit in blockers_bits:
-        valid_moves_bit = get_valid_piece_moves_including_captures(square, 'R', blockers_bit)
-        long_precomputed_rook_table[square][blockers_bit] = valid_moves_bit
-
-
-long_precomputed_bishop_table = []
-for square in range(64):
-    long_precomputed_bishop_table.append({})
-    blockers_bits = generate_bit_combinations(square, 'B')
-    for blockers_bit in blockers_bits:
-        valid_moves_bit = get_valid_piece_moves_including_captures(square, 'B', blockers_bit)
-        long_precomputed_bishop_table[square][blockers_bit] = valid_moves_bit
+from utils import read_table_cache, write_table_cache
 
-# Precomputed bishop and rook moves with only one blocker and only on the direction of blocker (for pins)
+# Magic bitboards for sliders. For each square the blockers on the unfull rays times the magic number (modulo 2^64) shifted by
+# the square's shift gives the index of the valid moves in a flat list. The magic numbers were found with utils.find_magic_number,
+# the numbers in the older magic_info files don't fit in flat lists (their max indices are too big).
 
-long_precomputed_rook_table_one_blocker = []
-for square in range(64):
-    long_precomputed_rook_table_one_blocker.append({})
-    blockers_bits = generate_one_bit_combinations(rook_full_rays[square])
-    for blockers_bit in blockers_bits:
-        valid_moves_bit = get_valid_piece_moves(square, 'R', blockers_bit) & get_valid_piece_moves(find_least_significant_bit_set(blockers_bit), 'R', 2**square)
-        long_precomputed_rook_table_one_blocker[square][blockers_bit] = valid_moves_bit | (2**square)
+magic_info_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'magic_info')
+with open(os.path.join(magic_info_path, 'fixed_shift_magics.json'), 'rb') as file:
+    fixed_shift_magics_bytes = file.read()
+fixed_shift_magics = json.loads(fixed_shift_magics_bytes)
+
+rook_magic_numbers = tuple(magic_number for magic_number, _ in fixed_shift_magics['R'])
+rook_magic_shifts = tuple(shift for _, shift in fixed_shift_magics['R'])
+bishop_magic_numbers = tuple(magic_number for magic_number, _ in fixed_shift_magics['B'])
+bishop_magic_shifts = tuple(shift for _, shift in fixed_shift_magics['B'])
 
+attack_tables_version = 2 # Increase when the way tables are built changes
+attack_tables_path = os.environ.get('BITPOSITION_TABLES', os.path.join(magic_info_path, 'attack_tables.bin'))
+attack_tables_checksum = hashlib.sha256(str(attack_tables_version).encode() + fixed_shift_magics_bytes).digest()
+
+def build_attack_tables():
+    '''
+    Build all slider tables from scratch, each as a flat list of 64-bit integers so they can be stored in the binary cache:
+    - rook_magic (bishop_magic): valid moves indexed by magic index, square s starts at the sum of the table sizes of 
+      the previous squares.
+    - rook_one_blocker (bishop_one_blocker): squares from a piece on square s (included) up to a blocker on square b 
+      (not included) at s*64 + b, only for pins.
+    '''
+    tables = {}
+    for piece_type, name, magic_numbers, magic_shifts, full_rays in (('R', 'rook', rook_magic_numbers, rook_magic_shifts, rook_full_rays), 
+                                                                      ('B', 'bishop', bishop_magic_numbers, bishop_magic_shifts, bishop_full_rays)):
+        magic_table = []
+        one_blocker_table = [0] * 4096
+        for square in range(64):
+            square_magic_table = [0] * (1 << (64 - magic_shifts[square]))
+            for blockers_bit in generate_bit_combinations(square, piece_type):
+                valid_moves_bit = get_valid_piece_moves_including_captures(square, piece_type, blockers_bit)
+                square_magic_table[((blockers_bit * magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> magic_shifts[square]] = valid_moves_bit
+            magic_table.extend(square_magic_table)
+
+            # Precomputed moves with only one blocker and only on the direction of blocker
+            for blockers_bit in generate_one_bit_combinations(full_rays[square]):
+                blocker_square = find_least_significant_bit_set(blockers_bit)
+                valid_moves_bit = get_valid_piece_moves(square, piece_type, blockers_bit) & get_valid_piece_moves(blocker_square, piece_type, 2**square)
+                one_blocker_table[square * 64 + blocker_square] = valid_moves_bit | (2**square)
+
+        tables[name + '_magic'] = magic_table
+        tables[name + '_one_blocker'] = one_blocker_table
+    return tables
+
+attack_tables = read_table_cache(attack_tables_path, attack_tables_version, attack_tables_checksum)
+if attack_tables is None:
+    attack_tables = build_attack_tables()
+    try:
+        write_table_cache(attack_tables_path, attack_tables_version, attack_tables_checksum, attack_tables)
+    except OSError: # Read only location, we keep the tables we just built
+        pass
+
+# The tables used while searching are turned into lists and dictionaries (indexing a memoryview is around 3 times slower).
 
+# Precomputed bishop and rook moves with only one blocker and only on the direction of blocker (for pins)
+long_precomputed_rook_table_one_blocker = []
 long_precomputed_bishop_table_one_blocker = []
-for square in range(64):
-    long_precomputed_bishop_table_one_blocker.append({})
-    blockers_bits = generate_one_bit_combinations(bishop_full_rays[square])
-    for blockers_bit in blockers_bits:
-        valid_moves_bit = get_valid_piece_moves(square, 'B', blockers_bit) & get_valid_piece_moves(find_least_significant_bit_set(blockers_bit), 'B', 2**square)
-        long_precomputed_bishop_table_one_blocker[square][blockers_bit] = valid_moves_bit | (2**square)
+for long_table, name, full_rays in ((long_precomputed_rook_table_one_blocker, 'rook', rook_full_rays), 
+                                    (long_precomputed_bishop_table_one_blocker, 'bishop', bishop_full_rays)):
+    one_blocker_table = attack_tables[name + '_one_blocker']
+    for square in range(64):
+        long_table.append({1 << blocker_square: one_blocker_table[square * 64 + blocker_square] for blocker_square in get_set_bit_indices(full_rays[square])})
 
+rook_magic_table = []
+bishop_magic_table = []
+for magic_table, name, magic_shifts in ((rook_magic_table, 'rook', rook_magic_shifts), (bishop_magic_table, 'bishop', bishop_magic_shifts)):
+    flat_magic_table = attack_tables[name + '_magic']
+    start = 0
+    for square in range(64):
+        end = start + (1 << (64 - magic_shifts[square]))
+        magic_table.append(list(flat_magic_table[start:end]))
+        start = end
+
+del attack_tables
 
-passant_bitboards = {-1: 0, 
-                     16 : 65536, 17 : 131072, 18 : 262144, 19 : 524288, 20 : 1048576, 21 : 2097152, 22 : 4194304, 23: 8388608, 
-                     40 : 1099511627776, 41 : 2199023255552, 42 : 4398046511104, 43 : 8796093022208, 44 : 17592186044416, 45 : 35184372088832, 46 : 70368744177664, 47 : 140737488355328}
 
 ######################
 # Position class
@@ -152,28 +188,62 @@ ENGINE IDEAS:
 Create a test for the engine where it may play against older versions of itself 1000 times. To
 see improvements.
 
-- New Transposition Tables: 
-For transposition tables I am going to use Zobrist Hashing, which is a method of hasshing poitions as 
-a bit integer. It performs much faster than hashing with the fen strings. However some positions may not 
-be distinguished from other different positions, but these are too small a number.
-
-- Add Late move reductions:
-This reduces the depth of moves which are ordered last in the ordered_moves. Read more about it.
-
-- Improve Iterative deepening:
-hmmm...
-
 - Keep alpha Beta
 - Keep Killer moves
 - Keep Quiescence search
 '''
 
 from collections import namedtuple
-Move = namedtuple("Move", "i j prom capture")  # So to define a move we must do Move(square, destination_square, promotion(maybe use array index), moving_pieces_bit)
+Move = namedtuple("Move", "i j prom capture")  # Readable form of a move: Move(square, destination_square, promotion, captured piece index)
+
+######################################################
+# Packed moves
+######################################################
+
+# The move generators, move/unmake_move and the engine pass moves around as packed integers instead of Move tuples, an int 
+# below 2**30 is a single small object and building one is a few bitwise operations, so a list of moves can also be stored 
+# in an array('I'). The bits are:
+#   0-5   origin square (a1 = 0, h8 = 63)
+#   6-11  destination square
+#   12-14 promotion (1 knight, 2 bishop, 3 rook, 4 queen, 0 if not a promotion)
+#   15-18 captured piece index + 1 (0 castling, 1 not a capture, 7-11 captured piece 6-10)
+# Castling is stored as the rook move (as Move did), with capture -1.
+
+def encode_move(i, j, prom = 0, capture = 0):
+    '''
+    Pack a move into an integer, capture is the index of the captured piece (6 to 10), 0 if not a capture and -1 for castling.
+    '''
+    return i | j << 6 | prom << 12 | (capture + 1) << 15
+
+def decode_move(move):
+    '''
+    Unpack an integer move into a Move.
+    '''
+    return Move(move & 63, move >> 6 & 63, move >> 12 & 7, (move >> 15) - 1)
+
+white_kingside_castling = encode_move(7, 5, 0, -1)
+white_queenside_castling = encode_move(0, 3, 0, -1)
+black_kingside_castling = encode_move(63, 61, 0, -1)
+black_queenside_castling = encode_move(56, 59, 0, -1)
+
+# Castling rights are kept as a 4 bit integer: 8 white kingside, 4 white queenside, 2 black kingside, 1 black queenside. 
+# A move from or to a king or rook starting square keeps only the rights in the mask of that square.
+castling_rights_masks = [15] * 64
+castling_rights_masks[0] = 11 # a1 rook
+castling_rights_masks[4] = 3 # e1 king
+castling_rights_masks[7] = 7 # h1 rook
+castling_rights_masks[56] = 14 # a8 rook
+castling_rights_masks[60] = 12 # e8 king
+castling_rights_masks[63] = 13 # h8 rook
+
+# Material of each piece type (pawn, knight, bishop, rook, queen, king) as in the evaluation, used by see and the search
+piece_values = (20, 40, 40, 50, 90, 100)
+
+# Number of plies the undo stack of a BitPosition can hold (game moves plus search depth)
+max_ply = 1024
 
 '''
-wc, bc  # The castling rights, these will be lists of two Boolean variables. The first element
-        # of the list represents kingside castle, the second queenside castle. They only check
+castling_rights  # The castling rights as a 4 bit integer (see castling_rights_masks). They only check
         # if the king or rook has already moved (to check if there are in between checks we do
         # it in gen_moves method).
 
@@ -194,36 +264,55 @@ class BitPosition:
     def __init__(self, bitboard, turn, wc = [True, True], bc = [True, True], passant_square = -1):
         self.bitboard = bitboard  # list of 64-bit integers: w_pawns, w_knights, w_bishops, w_rooks, w_queens, w_king, b_pawns, ...
         self.turn = turn  # True if white's turn, False if black
-        self.position_ply_info = [] # (wc, bc, psquare, pins, checks) 
-        self.move_ply_info = [] # (moving_piece, capture_index)
-        self.wc = wc # [Boolean, Boolean] represinting white kingside/ queenside castling rights
-        self.bc = bc # [Boolean, Boolean] represinting black kingside/ queenside castling rights
+        self.castling_rights = wc[0] << 3 | wc[1] << 2 | bc[0] << 1 | bc[1] # wc and bc are [Boolean, Boolean] representing kingside/ queenside castling rights
         self.psquare = passant_square # Index of the en passant square (a1 = 0, h8 = 63) if there is no en passant square then it is set to -1.
-        self.current_pins = (0,0)
-        self.current_checks = (0,0,0,0,0,0)    
+        self.current_pins = None # Pins and checks of the side to move, computed by position_info when needed
+        self.current_checks = None
+        self.current_attacks = None # Squares attacked by the side not to move, computed by attacked_squares when needed
+        # Occupancy bitboards, updated by move and unmake_move
+        self.white_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
+        self.black_pieces_bit = bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
+        self.all_pieces_bit = self.white_pieces_bit | self.black_pieces_bit
+        # Index of the bitboard of the piece on each square (-1 if empty), updated by move and unmake_move
+        self.mailbox = [-1] * 64
+        for piece_index, piece_bit in enumerate(bitboard):
+            for square in get_set_bit_indices(piece_bit):
+                self.mailbox[square] = piece_index
+        # Undo stack, the irreversible info of each ply is stored in preallocated slots indexed by ply (move writes them, unmake_move reads them)
+        self.ply = 0
+        self.castling_rights_stack = [0] * max_ply
+        self.psquare_stack = [0] * max_ply
+        self.moving_piece_stack = [0] * max_ply
+        self.pins_stack = [None] * max_ply
+        self.checks_stack = [None] * max_ply
+        self.attacks_stack = [None] * max_ply
+        self.zobrist_key_stack = [0] * max_ply
+        # Zobrist key of the position, updated with a few XORs by move (unmake_move takes it back from the undo stack)
+        self.zobrist_key = position_to_zobrist_key(self)
 
     def king_is_safe_after_passant(self, removed_square_1, removed_square_2):
         '''
-        See if the king is in check or not (from kings position). For when moving the king.
+        See if the king is safe from sliders after an en passant capture, removing the capturing and captured pawns and putting 
+        the capturing pawn on the passant square.
         '''
         bitboard = self.bitboard
         if self.turn: # If whites turn
             king_position = find_least_significant_bit_set(bitboard[5])
-            all_own_pieces_bit_without_king = (bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]) & ~(2**removed_square_1 | 2**removed_square_2)
+            all_own_pieces_bit_without_king = (self.all_pieces_bit & ~bitboard[5]) & ~(1 << removed_square_1 | 1 << removed_square_2) | 1 << self.psquare
             # Bishops
             if bitboard[8] != 0:
-                moveable_squares = long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_own_pieces_bit_without_king)]
+                moveable_squares = bishop_magic_table[king_position][(((bishop_unfull_rays[king_position] & all_own_pieces_bit_without_king) * bishop_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[king_position]]
                 if moveable_squares & bitboard[8] != 0: # If there is a bishop giving check
                     return False
             # Rooks
             if bitboard[9] != 0:
-                moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_own_pieces_bit_without_king)]
+                moveable_squares = rook_magic_table[king_position][(((rook_unfull_rays[king_position] & all_own_pieces_bit_without_king) * rook_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[king_position]]
                 if moveable_squares & bitboard[9] != 0: # If there is a rook giving check
                     return False
             # Queens
             if bitboard[10] != 0:
-                straight_moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_own_pieces_bit_without_king)]
-                diag_moveable_squares = long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_own_pieces_bit_without_king)] 
+                straight_moveable_squares = rook_magic_table[king_position][(((rook_unfull_rays[king_position] & all_own_pieces_bit_without_king) * rook_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[king_position]]
+                diag_moveable_squares = bishop_magic_table[king_position][(((bishop_unfull_rays[king_position] & all_own_pieces_bit_without_king) * bishop_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[king_position]] 
                 if straight_moveable_squares & bitboard[10] != 0: # If there is a queen giving check horizontally or vertically
                     return False
                 if diag_moveable_squares & bitboard[10] != 0: # If there is a queen giving check diagonally
@@ -232,21 +321,21 @@ class BitPosition:
         
         else: # If blacks turn
             king_position = find_least_significant_bit_set(bitboard[11])
-            all_own_pieces_bit_without_king = (bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5] | bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10]) & ~(2**removed_square_1 | 2**removed_square_2)
+            all_own_pieces_bit_without_king = (self.all_pieces_bit & ~bitboard[11]) & ~(1 << removed_square_1 | 1 << removed_square_2) | 1 << self.psquare
             # Bishops
             if bitboard[2] != 0:
-                moveable_squares = long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_own_pieces_bit_without_king)]
+                moveable_squares = bishop_magic_table[king_position][(((bishop_unfull_rays[king_position] & all_own_pieces_bit_without_king) * bishop_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[king_position]]
                 if moveable_squares & bitboard[2] != 0: # If there is a bishop giving check
                     return False
             # Rooks
             if bitboard[3] != 0:
-                moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_own_pieces_bit_without_king)]
+                moveable_squares = rook_magic_table[king_position][(((rook_unfull_rays[king_position] & all_own_pieces_bit_without_king) * rook_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[king_position]]
                 if moveable_squares & bitboard[3] != 0: # If there is a rook giving check
                     return False
             # Queens
             if bitboard[4] != 0:
-                straight_moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_own_pieces_bit_without_king)]
-                diag_moveable_squares = long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_own_pieces_bit_without_king)] 
+                straight_moveable_squares = rook_magic_table[king_position][(((rook_unfull_rays[king_position] & all_own_pieces_bit_without_king) * rook_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[king_position]]
+                diag_moveable_squares = bishop_magic_table[king_position][(((bishop_unfull_rays[king_position] & all_own_pieces_bit_without_king) * bishop_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[king_position]] 
                 if straight_moveable_squares & bitboard[4] != 0: # If there is a queen giving check horizontally or vertically
                     return False
                 if diag_moveable_squares & bitboard[4] != 0: # If there is a queen giving check diagonally
@@ -260,7 +349,7 @@ class BitPosition:
         '''
         bitboard = self.bitboard
         if self.turn: # If whites turn
-            all_own_pieces_bit_without_king = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11] 
+            all_own_pieces_bit_without_king = self.all_pieces_bit & ~bitboard[5] 
             # Pawns
             if bitboard[6] != 0: # For pawns we have to be carefull because they move upwards or downwards depending on whose turn it is
                 attacking_squares = white_pawn_attacks[destination]
@@ -273,7 +362,7 @@ class BitPosition:
                     return False
             # Bishops
             if bitboard[8] != 0:
-                moveable_squares = long_precomputed_bishop_table[destination][bishop_unfull_rays[destination] & (all_own_pieces_bit_without_king)]
+                moveable_squares = bishop_magic_table[destination][(((bishop_unfull_rays[destination] & all_own_pieces_bit_without_king) * bishop_magic_numbers[destination]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[destination]]
                 if moveable_squares & bitboard[8] != 0: # If there is a bishop giving check
                     return False
             # King
@@ -282,13 +371,13 @@ class BitPosition:
                 return False
             # Rooks
             if bitboard[9] != 0:
-                moveable_squares = long_precomputed_rook_table[destination][rook_unfull_rays[destination] & (all_own_pieces_bit_without_king)]
+                moveable_squares = rook_magic_table[destination][(((rook_unfull_rays[destination] & all_own_pieces_bit_without_king) * rook_magic_numbers[destination]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[destination]]
                 if moveable_squares & bitboard[9] != 0: # If there is a rook giving check
                     return False
             # Queens
             if bitboard[10] != 0:
-                straight_moveable_squares = long_precomputed_rook_table[destination][rook_unfull_rays[destination] & (all_own_pieces_bit_without_king)]
-                diag_moveable_squares = long_precomputed_bishop_table[destination][bishop_unfull_rays[destination] & (all_own_pieces_bit_without_king)] 
+                straight_moveable_squares = rook_magic_table[destination][(((rook_unfull_rays[destination] & all_own_pieces_bit_without_king) * rook_magic_numbers[destination]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[destination]]
+                diag_moveable_squares = bishop_magic_table[destination][(((bishop_unfull_rays[destination] & all_own_pieces_bit_without_king) * bishop_magic_numbers[destination]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[destination]] 
                 if straight_moveable_squares & bitboard[10] != 0: # If there is a queen giving check horizontally or vertically
                     return False
                 if diag_moveable_squares & bitboard[10] != 0: # If there is a queen giving check diagonally
@@ -296,7 +385,7 @@ class BitPosition:
             return True
         
         else: # If blacks turn
-            all_own_pieces_bit_without_king = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5] | bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10]
+            all_own_pieces_bit_without_king = self.all_pieces_bit & ~bitboard[11]
             # Pawns
             if bitboard[0] != 0: # For pawns we have to be carefull because they move upwards or downwards depending on whose turn it is
                 attacking_squares = black_pawn_attacks[destination]
@@ -309,7 +398,7 @@ class BitPosition:
                     return False
             # Bishops
             if bitboard[2] != 0:
-                moveable_squares = long_precomputed_bishop_table[destination][bishop_unfull_rays[destination] & (all_own_pieces_bit_without_king)]
+                moveable_squares = bishop_magic_table[destination][(((bishop_unfull_rays[destination] & all_own_pieces_bit_without_king) * bishop_magic_numbers[destination]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[destination]]
                 if moveable_squares & bitboard[2] != 0: # If there is a bishop giving check
                     return False
             # King
@@ -319,13 +408,13 @@ class BitPosition:
             
             # Rooks
             if bitboard[3] != 0:
-                moveable_squares = long_precomputed_rook_table[destination][rook_unfull_rays[destination] & (all_own_pieces_bit_without_king)]
+                moveable_squares = rook_magic_table[destination][(((rook_unfull_rays[destination] & all_own_pieces_bit_without_king) * rook_magic_numbers[destination]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[destination]]
                 if moveable_squares & bitboard[3] != 0: # If there is a rook giving check
                     return False
             # Queens
             if bitboard[4] != 0:
-                straight_moveable_squares = long_precomputed_rook_table[destination][rook_unfull_rays[destination] & (all_own_pieces_bit_without_king)]
-                diag_moveable_squares = long_precomputed_bishop_table[destination][bishop_unfull_rays[destination] & (all_own_pieces_bit_without_king)] 
+                straight_moveable_squares = rook_magic_table[destination][(((rook_unfull_rays[destination] & all_own_pieces_bit_without_king) * rook_magic_numbers[destination]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[destination]]
+                diag_moveable_squares = bishop_magic_table[destination][(((bishop_unfull_rays[destination] & all_own_pieces_bit_without_king) * bishop_magic_numbers[destination]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[destination]] 
                 if straight_moveable_squares & bitboard[4] != 0: # If there is a queen giving check horizontally or vertically
                     return False
                 if diag_moveable_squares & bitboard[4] != 0: # If there is a queen giving check diagonally
@@ -334,472 +423,238 @@ class BitPosition:
         
     def is_check(self):
         '''
-        Count number of checks and if any slider checks return the bit corresponding to the ray of the slider giving check (To block it later).
-        Since after making a check we store in the bitposition we have done so. Hence position has in_check attribute = True.
-        We are going to check for checks more efficiently from the kings position and assuming it can move as any piece.
+        True if the side to move is in check. The checks are computed by position_info (and cached for the ply), so the 
+        generators called after is_check don't compute them again.
         '''
-        bitboard = self.bitboard
-        all_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5] | bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-        if self.turn:
-            king_position = find_least_significant_bit_set(bitboard[5])
+        if self.current_checks is None:
+            self.position_info()
+        return self.current_checks[6] != 0
 
-            # Queens
-            if bitboard[10] != 0:
-                all_moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_pieces_bit)] | long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_pieces_bit)] 
-                if all_moveable_squares & bitboard[10] != 0: # If there is a queen giving check horizontally or vertically
-                    return True              
-            # Bishops
-            if bitboard[8] != 0:
-                moveable_squares = long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_pieces_bit)]
-                if moveable_squares & bitboard[8] != 0: # If there is a bishop giving check
-                    return True
-            # Rooks
-            if bitboard[9] != 0:
-                moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_pieces_bit)]
-                if moveable_squares & bitboard[9] != 0: # If there is a rook giving check
-                    return True
-            # Pawns
-            if bitboard[6] != 0: # For pawns we have to be carefull because they move upwards or downwards depending on whose turn it is
-                attacking_squares = white_pawn_attacks[king_position]
-                if attacking_squares & bitboard[6] != 0:
-                    return True
-
-            # Knights
-            if bitboard[7] != 0:
-                moveable_squares = knight_moves[king_position]
-                if moveable_squares & bitboard[7] != 0: # If there is a knight giving check
-                    return True
-                
-            return False # No checks
-        
-        else: # Blacks turn
-            king_position = find_least_significant_bit_set(bitboard[11])
-
-            # Queens
-            if bitboard[4] != 0:
-                all_moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_pieces_bit)] | long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_pieces_bit)] 
-                if all_moveable_squares & bitboard[4] != 0: # If there is a queen giving check horizontally or vertically
-                    return True
-                
-            # Bishops
-            if bitboard[2] != 0:
-                moveable_squares = long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_pieces_bit)]
-                if moveable_squares & bitboard[2] != 0: # If there is a bishop giving check
-                    return True
-
-            # Rooks 
-            if bitboard[3] != 0:
-                moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_pieces_bit)]
-                if moveable_squares & bitboard[3] != 0: # If there is a rook giving check
-                    return True
-
-            # Pawns 
-            if bitboard[0] != 0: # For pawns we have to be carefull because they move upwards or downwards depending on whose turn it is
-                attacking_squares = black_pawn_attacks[king_position]
-                if attacking_squares & bitboard[0] != 0:
-                    return True
-
-            # Knights 
-            if bitboard[1] != 0:
-                moveable_squares = knight_moves[king_position]
-                if moveable_squares & bitboard[1] != 0: # If there is a knight giving check
-                    return True
-
-            return False # No checks
-        
-    def get_pins_bits(self):
+    def position_info(self):
         '''
-        Get a bitboard of the pinned squares, these are squares containg pinned piece and the ray. We get two bitboards, one for straight pins and one for 
-        diagonal pins. This makes generating legal moves easier, since the pinned sliders can move diagonally or straight depending if the pin is diagonal 
-        or straight.
+        Compute the checks and pins of the side to move in one pass from the kings position, looking from the king as every
+        piece type. They are stored in current_checks and current_pins, which move resets and unmake_move restores from the undo 
+        stack, so they are computed once per ply and shared by is_check and all the generators:
+        - current_checks: bitboards of the pawns, knights, bishops, rooks and queens giving check, the squares between the king 
+          and the sliders giving check (to block them) and the number of checks.
+        - current_pins: a bitboard for diagonal pins and one for straight pins. A pin ray goes from the pinning piece (included) 
+          to the king (not included), so pinned sliders can only move inside their ray.
         '''
         bitboard = self.bitboard
-        
-        straight_pins = 0
-        diagonal_pins = 0
+        all_pieces_bit = self.all_pieces_bit
         if self.turn:
-            king_position = find_least_significant_bit_set(bitboard[5])
-            all_own_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
-            all_opp_pieces_bit = bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-
-            # Bishop pins
-            if bitboard[8] & bishop_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[8] & bishop_full_rays[king_position]):
-                    bishop_ray = long_precomputed_bishop_table_one_blocker[square][bitboard[5]]
-                    if has_one_one(bishop_ray & all_own_pieces_bit) and has_one_one(bishop_ray & all_opp_pieces_bit):
-                        diagonal_pins |= bishop_ray
-            
-            # Rook pins
-            if bitboard[9] & rook_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[9] & rook_full_rays[king_position]):
-                    rook_ray = long_precomputed_rook_table_one_blocker[square][bitboard[5]]
-                    if has_one_one(rook_ray & all_own_pieces_bit) and has_one_one(rook_ray & all_opp_pieces_bit):
-                        straight_pins |= rook_ray
-            
-            # Queen pins
-            if bitboard[10] & bishop_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[10] & bishop_full_rays[king_position]):
-                    bishop_ray = long_precomputed_bishop_table_one_blocker[square][bitboard[5]]
-                    if has_one_one(bishop_ray & all_own_pieces_bit) and has_one_one(bishop_ray & all_opp_pieces_bit):
-                        diagonal_pins |= bishop_ray
-
-            if bitboard[10] & rook_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[10] & rook_full_rays[king_position]):
-                    rook_ray = long_precomputed_rook_table_one_blocker[square][bitboard[5]]
-                    if has_one_one(rook_ray & all_own_pieces_bit) and has_one_one(rook_ray & all_opp_pieces_bit):
-                        straight_pins |= rook_ray
-
-
+            king_bit = bitboard[5]
+            king_position = find_least_significant_bit_set(king_bit)
+            all_own_pieces_bit = self.white_pieces_bit
+            pawn_checks = white_pawn_attacks[king_position] & bitboard[6] # For pawns we have to be carefull because they move upwards or downwards depending on whose turn it is
+            knight_checks = knight_moves[king_position] & bitboard[7]
+            bishops, rooks, queens = bitboard[8], bitboard[9], bitboard[10]
         else:
-            king_position = find_least_significant_bit_set(bitboard[11])
-            all_own_pieces_bit = bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-            all_opp_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
-
-            # Bishop pins
-            if bitboard[2] & bishop_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[2] & bishop_full_rays[king_position]):
-                    bishop_ray = long_precomputed_bishop_table_one_blocker[square][bitboard[11]]
-                    if has_one_one(bishop_ray & all_own_pieces_bit) and has_one_one(bishop_ray & all_opp_pieces_bit):
-                        diagonal_pins |= bishop_ray
-            
-            # Rook pins
-            if bitboard[3] & rook_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[3] & rook_full_rays[king_position]):
-                    rook_ray = long_precomputed_rook_table_one_blocker[square][bitboard[11]]
-                    if has_one_one(rook_ray & all_own_pieces_bit) and has_one_one(rook_ray & all_opp_pieces_bit):
-                        straight_pins |= rook_ray
-            
-            # Queen pins
-            if bitboard[4] & bishop_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[4] & bishop_full_rays[king_position]):
-                    bishop_ray = long_precomputed_bishop_table_one_blocker[square][bitboard[11]]
-                    if has_one_one(bishop_ray & all_own_pieces_bit) and has_one_one(bishop_ray & all_opp_pieces_bit):
-                        diagonal_pins |= bishop_ray
-
-            if bitboard[4] & rook_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[4] & rook_full_rays[king_position]):
-                    rook_ray = long_precomputed_rook_table_one_blocker[square][bitboard[11]]
-                    if has_one_one(rook_ray & all_own_pieces_bit) and has_one_one(rook_ray & all_opp_pieces_bit):
-                        straight_pins |= rook_ray
-        return diagonal_pins, straight_pins
-    
-    def new_checks_info(self):
-        '''
-        Get a bitboard of the pinned squares, these are squares containg pinned piece and the ray. We get two bitboards, one for straight pins and one for 
-        diagonal pins. This makes generating legal moves easier, since the pinned sliders can move diagonally or straight depending if the pin is diagonal 
-        or straight.
-        '''
-        bitboard = self.bitboard
-        # Positions of pieces giving checks (one bitboard for each piece type)
-        pawn_checks = 0
-        knight_checks = 0
+            king_bit = bitboard[11]
+            king_position = find_least_significant_bit_set(king_bit)
+            all_own_pieces_bit = self.black_pieces_bit
+            pawn_checks = black_pawn_attacks[king_position] & bitboard[0]
+            knight_checks = knight_moves[king_position] & bitboard[1]
+            bishops, rooks, queens = bitboard[2], bitboard[3], bitboard[4]
+
+        # Only one pawn and one knight can give check at a time
+        num_checks = (pawn_checks != 0) + (knight_checks != 0)
         bishop_checks = 0
         rook_checks = 0
         queen_checks = 0
-
         rays = 0 # Rays of sliders giving checks
-        num_checks = 0 # Number of checks
-
-        # Rays in which there is a pinned piece
-        straight_pins = 0
         diagonal_pins = 0
+        straight_pins = 0
 
-        if self.turn:
-            king_position = find_least_significant_bit_set(bitboard[5])
-            all_own_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
-            all_opp_pieces_bit = bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-            all_pieces_bit = all_own_pieces_bit | all_opp_pieces_bit
-
-            # Pawns (Note we can only give check with one pawn at a time)
-            # For pawns we have to be carefull because they move upwards or downwards depending on whose turn it is
-            attacking_squares = white_pawn_attacks[king_position]
-            if attacking_squares & bitboard[6] != 0:
-                pawn_checks |= attacking_squares & bitboard[6]
-                num_checks += 1
-
-            # Knights (Note we can only give check with one knight at a time)
-            moveable_squares = knight_moves[king_position]
-            if moveable_squares & bitboard[7] != 0: # If there is a knight giving check
-                knight_checks |= moveable_squares & bitboard[7]
-                num_checks += 1
-
-            # Bishop pins
-            if bitboard[8] & bishop_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[8] & bishop_full_rays[king_position]):
-                    bishop_ray = long_precomputed_bishop_table_one_blocker[square][bitboard[5]] # Ray from square where bishop is to king, including opponents bishop square (without taking into account blockers)
-                    if has_one_one(bishop_ray & all_pieces_bit): # Check
-                        bishop_checks |= bishop_ray & bitboard[8]
-                        rays = bishop_ray & ~bitboard[8]
-                        num_checks += 1
-                    elif has_one_one(bishop_ray & all_own_pieces_bit) and has_one_one(bishop_ray & all_opp_pieces_bit): # Pin
-                        diagonal_pins |= bishop_ray
-            
-            if num_checks == 2: # If there are two checks or more we may only move king hence other stuff like pins and rays don't need to be computed
-                return (0, 0, 0, 0, 0, 0, 2), (0, 0)
-            
-            # Rook pins
-            if bitboard[9] & rook_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[9] & rook_full_rays[king_position]):
-                    rook_ray = long_precomputed_rook_table_one_blocker[square][bitboard[5]]
-                    if has_one_one(rook_ray & all_pieces_bit): # Check
-                        rook_checks |= rook_ray & bitboard[9]
-                        rays = rook_ray & ~bitboard[9]
-                        num_checks += 1
-                    elif has_one_one(rook_ray & all_own_pieces_bit) and has_one_one(rook_ray & all_opp_pieces_bit): # Pin
-                        straight_pins |= rook_ray
-            
-
-            
-            # Queen pins
-            if bitboard[10] & bishop_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[10] & bishop_full_rays[king_position]):
-                    bishop_ray = long_precomputed_bishop_table_one_blocker[square][bitboard[5]]
-                    if has_one_one(bishop_ray & all_pieces_bit): # Check
-                        queen_checks |= bishop_ray & bitboard[10]
-                        rays = bishop_ray & ~bitboard[10]
-                        num_checks += 1
-                    elif has_one_one(bishop_ray & all_own_pieces_bit) and has_one_one(bishop_ray & all_opp_pieces_bit): # Pin
-                        diagonal_pins |= bishop_ray
-
-            if bitboard[10] & rook_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[10] & rook_full_rays[king_position]):
-                    rook_ray = long_precomputed_rook_table_one_blocker[square][bitboard[5]]
-                    if has_one_one(rook_ray & all_pieces_bit): # Check
-                        queen_checks |= rook_ray & bitboard[10]
-                        rays = rook_ray & ~bitboard[10]
-                        num_checks += 1
-                    elif has_one_one(rook_ray & all_own_pieces_bit) and has_one_one(rook_ray & all_opp_pieces_bit): # Pin
-                        straight_pins |= rook_ray
+        # For sliders we look from the king as a slider, the sliders we see give check. Then we take off the first own piece on each
+        # ray and see if there is an opponent slider behind it (x-ray), which pins it.
+
+        # Bishops and queens
+        diagonal_sliders = bishops | queens
+        if diagonal_sliders & bishop_full_rays[king_position] != 0:
+            moveable_squares = bishop_magic_table[king_position][(((bishop_unfull_rays[king_position] & all_pieces_bit) * bishop_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[king_position]]
+            checks_bit = moveable_squares & diagonal_sliders
+            if checks_bit != 0:
+                bishop_checks = checks_bit & bishops
+                queen_checks = checks_bit & queens
+                for square in get_set_bit_indices(checks_bit):
+                    rays |= long_precomputed_bishop_table_one_blocker[square][king_bit] & ~(1 << square)
+                    num_checks += 1
+            xray_occupancy = all_pieces_bit & ~(moveable_squares & all_own_pieces_bit)
+            xray_squares = bishop_magic_table[king_position][(((bishop_unfull_rays[king_position] & xray_occupancy) * bishop_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[king_position]] & ~moveable_squares
+            for square in get_set_bit_indices(xray_squares & diagonal_sliders):
+                diagonal_pins |= long_precomputed_bishop_table_one_blocker[square][king_bit]
+
+        # Rooks and queens
+        straight_sliders = rooks | queens
+        if straight_sliders & rook_full_rays[king_position] != 0:
+            moveable_squares = rook_magic_table[king_position][(((rook_unfull_rays[king_position] & all_pieces_bit) * rook_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[king_position]]
+            checks_bit = moveable_squares & straight_sliders
+            if checks_bit != 0:
+                rook_checks = checks_bit & rooks
+                queen_checks |= checks_bit & queens
+                for square in get_set_bit_indices(checks_bit):
+                    rays |= long_precomputed_rook_table_one_blocker[square][king_bit] & ~(1 << square)
+                    num_checks += 1
+            xray_occupancy = all_pieces_bit & ~(moveable_squares & all_own_pieces_bit)
+            xray_squares = rook_magic_table[king_position][(((rook_unfull_rays[king_position] & xray_occupancy) * rook_magic_numbers[king_position]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[king_position]] & ~moveable_squares
+            for square in get_set_bit_indices(xray_squares & straight_sliders):
+                straight_pins |= long_precomputed_rook_table_one_blocker[square][king_bit]
 
+        self.current_checks = (pawn_checks, knight_checks, bishop_checks, rook_checks, queen_checks, rays, num_checks)
+        self.current_pins = (diagonal_pins, straight_pins)
 
-        else:
-            king_position = find_least_significant_bit_set(bitboard[11])
-            all_own_pieces_bit = bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-            all_opp_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
-            all_pieces_bit = all_own_pieces_bit | all_opp_pieces_bit
-
-            # Pawns (Note we can only give check with one pawn at a time)
-            # For pawns we have to be carefull because they move upwards or downwards depending on whose turn it is
-            attacking_squares = black_pawn_attacks[king_position]
-            if attacking_squares & bitboard[0] != 0:
-                pawn_checks |= attacking_squares & bitboard[0]
-                num_checks += 1
-
-            # Knights (Note we can only give check with one knight at a time)
-            moveable_squares = knight_moves[king_position]
-            if moveable_squares & bitboard[1] != 0: # If there is a knight giving check
-                knight_checks |= moveable_squares & bitboard[1]
-                num_checks += 1
-                
-            # Bishop pins
-            if bitboard[2] & bishop_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[2] & bishop_full_rays[king_position]):
-                    bishop_ray = long_precomputed_bishop_table_one_blocker[square][bitboard[11]]
-                    if has_one_one(bishop_ray & all_pieces_bit): # Check
-                        bishop_checks |= bishop_ray & bitboard[2]
-                        rays = bishop_ray & ~bitboard[2]
-                        num_checks += 1
-                    elif has_one_one(bishop_ray & all_own_pieces_bit) and has_one_one(bishop_ray & all_opp_pieces_bit): # Pin
-                        diagonal_pins |= bishop_ray
-            
-            if num_checks == 2: # If there are two checks or more we may only move king hence other stuff like pins and rays don't need to be computed
-                return (0, 0, 0, 0, 0, 0, 2), (0,0)
-            
-            # Rook pins
-            if bitboard[3] & rook_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[3] & rook_full_rays[king_position]):
-                    rook_ray = long_precomputed_rook_table_one_blocker[square][bitboard[11]]
-                    if has_one_one(rook_ray & all_pieces_bit): # Check
-                        rook_checks |= rook_ray & bitboard[3]
-                        rays = rook_ray & ~bitboard[3]
-                        num_checks += 1
-                    elif has_one_one(rook_ray & all_own_pieces_bit) and has_one_one(rook_ray & all_opp_pieces_bit): # Pin
-                        straight_pins |= rook_ray
-            
-            # Queen pins
-            if bitboard[4] & bishop_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[4] & bishop_full_rays[king_position]):
-                    bishop_ray = long_precomputed_bishop_table_one_blocker[square][bitboard[11]]
-                    if has_one_one(bishop_ray & all_pieces_bit): # Check
-                        queen_checks |= bishop_ray & bitboard[4]
-                        rays = bishop_ray & ~bitboard[4]
-                        num_checks += 1
-                    elif has_one_one(bishop_ray & all_own_pieces_bit) and has_one_one(bishop_ray & all_opp_pieces_bit): # Pin
-                        diagonal_pins |= bishop_ray
-
-            if bitboard[4] & rook_full_rays[king_position] != 0:
-                for square in get_set_bit_indices(bitboard[4] & rook_full_rays[king_position]):
-                    rook_ray = long_precomputed_rook_table_one_blocker[square][bitboard[11]]
-                    if has_one_one(rook_ray & all_pieces_bit): # Check
-                        queen_checks |= rook_ray & bitboard[4]
-                        rays = rook_ray & ~bitboard[4]
-                        num_checks += 1
-                    elif has_one_one(rook_ray & all_own_pieces_bit) and has_one_one(rook_ray & all_opp_pieces_bit): # Pin
-                        straight_pins |= rook_ray
-        return (pawn_checks, knight_checks, bishop_checks, rook_checks, queen_checks, rays, num_checks), (diagonal_pins, straight_pins)
+    def attacked_squares(self):
+        '''
+        Bitboard of all the squares attacked by the side not to move. Our king is taken off the occupancy, so the squares behind it
+        on the ray of a slider giving check are attacked too. Then the king can move to (or castle through) a square only if it is
+        not in this bitboard, instead of calling king_is_safe for every square. It is computed once per ply and cached in 
+        current_attacks, like position_info.
+        '''
+        if self.current_attacks is not None:
+            return self.current_attacks
+        bitboard = self.bitboard
+        if self.turn: # Black pieces attack
+            pawns = bitboard[6]
+            attacks = ((pawns >> 9) & not_h_file) | ((pawns >> 7) & not_a_file)
+            knights, diagonal_sliders, straight_sliders, king_bit = bitboard[7], bitboard[8] | bitboard[10], bitboard[9] | bitboard[10], bitboard[11]
+            all_pieces_bit_without_king = self.all_pieces_bit & ~bitboard[5]
+        else: # White pieces attack
+            pawns = bitboard[0]
+            attacks = ((pawns << 7) & not_h_file) | ((pawns << 9) & not_a_file)
+            knights, diagonal_sliders, straight_sliders, king_bit = bitboard[1], bitboard[2] | bitboard[4], bitboard[3] | bitboard[4], bitboard[5]
+            all_pieces_bit_without_king = self.all_pieces_bit & ~bitboard[11]
+
+        for square in get_set_bit_indices(knights):
+            attacks |= knight_moves[square]
+        for square in get_set_bit_indices(diagonal_sliders):
+            attacks |= bishop_magic_table[square][(((bishop_unfull_rays[square] & all_pieces_bit_without_king) * bishop_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[square]]
+        for square in get_set_bit_indices(straight_sliders):
+            attacks |= rook_magic_table[square][(((rook_unfull_rays[square] & all_pieces_bit_without_king) * rook_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[square]]
+        attacks |= king_moves[find_least_significant_bit_set(king_bit)]
+        self.current_attacks = attacks
+        return attacks
     
-    def get_checks_info(self):
+    def attackers_to(self, square, occupancy):
         '''
-        Count number of checks and if any slider checks return the bit corresponding to the ray of the slider giving check (To block it later).
-        Since after making a check we store in the bitposition we have done so. Hence position has in_check attribute = True.
-        We are going to check for checks more efficiently from the kings position and assuming it can move as any piece.
+        Bitboard of the pieces of both sides in occupancy that attack square, the sliders are blocked only by the pieces in 
+        occupancy. Taking pieces off the occupancy reveals the sliders behind them (x-rays), which is what see does.
         '''
         bitboard = self.bitboard
-        all_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5] | bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-        # Positions of pieces giving checks (one bitboard for each piece type)
-        pawn_checks = 0
-        knight_checks = 0
-        bishop_checks = 0
-        rook_checks = 0
-        queen_checks = 0
-
-        rays = 0 # Rays of sliders giving checks
-        num_checks = 0 # Number of checks
-        if self.turn:
-            king_position = find_least_significant_bit_set(bitboard[5])
-            
-            # Pawns (Note we can only give check with one pawn at a time)
-            # For pawns we have to be carefull because they move upwards or downwards depending on whose turn it is
-            attacking_squares = white_pawn_attacks[king_position]
-            if attacking_squares & bitboard[6] != 0:
-                pawn_checks |= attacking_squares & bitboard[6]
-                num_checks += 1
-
-            # Knights (Note we can only give check with one knight at a time)
-            moveable_squares = knight_moves[king_position]
-            if moveable_squares & bitboard[7] != 0: # If there is a knight giving check
-                knight_checks |= moveable_squares & bitboard[7]
-                num_checks += 1
-
-            # Bishops (Note we can only give check with one bishop at a time)
-            if bitboard[8] != 0:
-                moveable_squares = long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_pieces_bit)] # Ray from king position up to and including pieces that block
-                if moveable_squares & bitboard[8] != 0: # If there is a bishop giving check
-                    bishop_position = find_least_significant_bit_set(moveable_squares & bitboard[8]) # There can only be one bishop giving check
-                    rays = moveable_squares & long_precomputed_bishop_table[bishop_position][bishop_unfull_rays[bishop_position] & (all_pieces_bit)]
-                    bishop_checks |= moveable_squares & bitboard[8]
-                    num_checks += 1
-
-            # Rooks (Note we can only give check with one rook at a time)
-            if bitboard[9] != 0:
-                moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_pieces_bit)]
-                if moveable_squares & bitboard[9] != 0: # If there is a rook giving check
-                    rook_position = find_least_significant_bit_set(moveable_squares & bitboard[9]) # There can only be one rook giving check
-                    rays = moveable_squares & long_precomputed_rook_table[rook_position][rook_unfull_rays[rook_position] & (all_pieces_bit)]
-                    rook_checks |= moveable_squares & bitboard[9]
-                    num_checks += 1
-
-            # Queens (Note we can give only give check with one queen at a time)
-            if bitboard[10] != 0:
-                straight_moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_pieces_bit)]
-                diag_moveable_squares = long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_pieces_bit)] 
-                if straight_moveable_squares & bitboard[10] != 0: # If there is a queen giving check horizontally or vertically
-                    queen_position = find_least_significant_bit_set(straight_moveable_squares & bitboard[10])
-                    rays = straight_moveable_squares & long_precomputed_rook_table[queen_position][rook_unfull_rays[queen_position] & (all_pieces_bit)]
-                    queen_checks |= straight_moveable_squares & bitboard[10]
-                    num_checks += 1
-                if diag_moveable_squares & bitboard[10] != 0: # If there is a queen giving check diagonally
-                    queen_position = find_least_significant_bit_set(diag_moveable_squares & bitboard[10])
-                    rays = diag_moveable_squares & long_precomputed_bishop_table[queen_position][bishop_unfull_rays[queen_position] & (all_pieces_bit)]
-                    queen_checks |= diag_moveable_squares & bitboard[10]
-                    num_checks += 1
-
-            return pawn_checks, knight_checks, bishop_checks, rook_checks, queen_checks, rays, num_checks
-        
-        else: # Blacks turn
-            king_position = find_least_significant_bit_set(bitboard[11])
-
-            # Pawns (Note we can only give check with one pawn at a time)
-            # For pawns we have to be carefull because they move upwards or downwards depending on whose turn it is
-            attacking_squares = black_pawn_attacks[king_position]
-            if attacking_squares & bitboard[0] != 0:
-                pawn_checks |= attacking_squares & bitboard[0]
-                num_checks += 1
-
-            # Knights (Note we can only give check with one knight at a time)
-            moveable_squares = knight_moves[king_position]
-            if moveable_squares & bitboard[1] != 0: # If there is a knight giving check
-                knight_checks |= moveable_squares & bitboard[1]
-                num_checks += 1
-
-            # Bishops (Note we can only give check with one bishop at a time)
-            if bitboard[2] != 0:
-                moveable_squares = long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_pieces_bit)]
-                if moveable_squares & bitboard[2] != 0: # If there is a bishop giving check
-                    bishop_position = find_least_significant_bit_set(moveable_squares & bitboard[2]) # There can only be one bishop giving check
-                    rays = moveable_squares & long_precomputed_bishop_table[bishop_position][bishop_unfull_rays[bishop_position] & (all_pieces_bit)]
-                    bishop_checks |= moveable_squares & bitboard[2]
-                    num_checks += 1
-
-            # Rooks (Note we can only give check with one rook at a time)
-            if bitboard[3] != 0:
-                moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_pieces_bit)]
-                if moveable_squares & bitboard[3] != 0: # If there is a rook giving check
-                    rook_position = find_least_significant_bit_set(moveable_squares & bitboard[3]) # There can only be one rook giving check
-                    rays = moveable_squares & long_precomputed_rook_table[rook_position][rook_unfull_rays[rook_position] & (all_pieces_bit)]
-                    rook_checks |= moveable_squares & bitboard[3]
-                    num_checks += 1
-
-            # Queens (Note we can give only give check with one queen at a time)
-            if bitboard[4] != 0:
-                straight_moveable_squares = long_precomputed_rook_table[king_position][rook_unfull_rays[king_position] & (all_pieces_bit)]
-                diag_moveable_squares = long_precomputed_bishop_table[king_position][bishop_unfull_rays[king_position] & (all_pieces_bit)] 
-                if straight_moveable_squares & bitboard[4] != 0: # If there is a queen giving check horizontally or vertically
-                    queen_position = find_least_significant_bit_set(straight_moveable_squares & bitboard[4])
-                    rays = straight_moveable_squares & long_precomputed_rook_table[queen_position][rook_unfull_rays[queen_position] & (all_pieces_bit)]
-                    queen_checks |= straight_moveable_squares & bitboard[4]
-                    num_checks += 1
-                if diag_moveable_squares & bitboard[4] != 0: # If there is a queen giving check diagonally
-                    queen_position = find_least_significant_bit_set(diag_moveable_squares & bitboard[4])
-                    rays = diag_moveable_squares & long_precomputed_bishop_table[queen_position][bishop_unfull_rays[queen_position] & (all_pieces_bit)]
-                    queen_checks |= diag_moveable_squares & bitboard[4]
-                    num_checks += 1
+        diagonal_sliders = bitboard[2] | bitboard[4] | bitboard[8] | bitboard[10]
+        straight_sliders = bitboard[3] | bitboard[4] | bitboard[9] | bitboard[10]
+        attackers = (black_pawn_attacks[square] & bitboard[0]) | (white_pawn_attacks[square] & bitboard[6]) # (A white pawn attacks square if a black pawn on square would attack it)
+        attackers |= knight_moves[square] & (bitboard[1] | bitboard[7])
+        attackers |= king_moves[square] & (bitboard[5] | bitboard[11])
+        if diagonal_sliders & bishop_full_rays[square]:
+            attackers |= bishop_magic_table[square][(((bishop_unfull_rays[square] & occupancy) * bishop_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[square]] & diagonal_sliders
+        if straight_sliders & rook_full_rays[square]:
+            attackers |= rook_magic_table[square][(((rook_unfull_rays[square] & occupancy) * rook_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[square]] & straight_sliders
+        return attackers & occupancy
+
+    def see(self, move):
+        '''
+        Static Exchange Evaluation: the material the side to move wins (in piece_values, negative if it loses) playing the move
+        and then both sides recapturing on the destination square with their least valuable attacker, each side being free to 
+        stop when recapturing would lose more. Pieces revealed behind the ones that capture (x-rays) join the exchange. Pins and
+        checks are ignored.
+        '''
+        if move >> 15 == 0: # Castling
+            return 0
+        bitboard = self.bitboard
+        origin_square, destination, promotion, capture = move & 63, move >> 6 & 63, move >> 12 & 7, (move >> 15) - 1
+        moving_piece = self.mailbox[origin_square] % 6
+        occupancy = self.all_pieces_bit & ~(1 << origin_square)
+        if capture:
+            gains = [piece_values[capture - 6]]
+            if moving_piece == 0 and destination == self.psquare: # En passant, the captured pawn is not on the destination square
+                occupancy &= ~(1 << (destination - 8 if self.turn else destination + 8))
+        else:
+            gains = [0]
+        piece_value = piece_values[moving_piece] # Value of the piece standing on the destination square
+        if promotion:
+            gains[0] += piece_values[promotion] - piece_values[0]
+            piece_value = piece_values[promotion]
+        diagonal_sliders = bitboard[2] | bitboard[4] | bitboard[8] | bitboard[10]
+        straight_sliders = bitboard[3] | bitboard[4] | bitboard[9] | bitboard[10]
+        attackers = self.attackers_to(destination, occupancy)
+        turn = not self.turn
+        while True:
+            if turn:
+                own_attackers = attackers & self.white_pieces_bit
+                first_piece = 0
+            else:
+                own_attackers = attackers & self.black_pieces_bit
+                first_piece = 6
+            if own_attackers == 0:
+                break
+            for piece in range(6): # Least valuable attacker
+                piece_attackers = own_attackers & bitboard[first_piece + piece]
+                if piece_attackers:
+                    break
+            if piece == 5 and attackers & ~own_attackers: # The king can't capture a defended piece
+                break
+            gains.append(piece_value - gains[-1])
+            piece_value = piece_values[piece]
+            occupancy &= ~(piece_attackers & -piece_attackers)
+            # Sliders behind the piece that captured
+            if piece in (0, 2, 4):
+                attackers |= bishop_magic_table[destination][(((bishop_unfull_rays[destination] & occupancy) * bishop_magic_numbers[destination]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[destination]] & diagonal_sliders
+            if piece in (3, 4):
+                attackers |= rook_magic_table[destination][(((rook_unfull_rays[destination] & occupancy) * rook_magic_numbers[destination]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[destination]] & straight_sliders
+            attackers &= occupancy
+            turn = not turn
+        # Going back, each side only recaptures if it doesn't lose material doing so
+        for index in range(len(gains) - 1, 0, -1):
+            gains[index - 1] = -max(-gains[index - 1], gains[index])
+        return gains[0]
 
-            return pawn_checks, knight_checks, bishop_checks, rook_checks, queen_checks, rays, num_checks
-    
     def in_check_captures(self):
         '''
         We are going to check for checks more efficiently from the kings position and assuming it can move as any piece.
         This will yield the moves to reduce computational time.
         '''
         bitboard = self.bitboard
-        self.current_checks, self.current_pins = self.new_checks_info()
+        if self.current_checks is None:
+            self.position_info()
         all_pins = self.current_pins[0] | self.current_pins[1]
         captures = []
         if self.turn: # If whites turn
 
-            all_own_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
-            all_pieces_bit = all_own_pieces_bit | bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
+            all_pieces_bit = self.all_pieces_bit
         
             # We go piece by piece yielding captures
             # Capturing with King
             piece_bit = bitboard[5]
             origin_square = find_least_significant_bit_set(piece_bit) # We get the indices of the squares pieces of this type are in
+            safe_squares = king_moves[origin_square] & ~self.attacked_squares() # We get the precomputed moveable squares that are not attacked
             for i in range(6,12):
-                capture_check_squares = king_moves[origin_square] & bitboard[i] # We get the precomputed moveable squares
+                capture_check_squares = safe_squares & bitboard[i]
                 if capture_check_squares != 0: # If we can capture
                     for destination in get_set_bit_indices(capture_check_squares):
-                        if self.king_is_safe(destination):
-                            captures.append(Move(origin_square, destination, 0, i))
+                        captures.append(origin_square | destination << 6 | (i + 1) << 15)
 
             if self.current_checks[-1] == 1: # We can only capture (with a piece that is not the king) or block if there is only one check
-                # Capturing with Pawns
+                # Capturing with Pawns (all pawns at once, shifting the pawn bitboard along both diagonals onto the piece giving check)
                 piece_bit = bitboard[0] & ~all_pins
                 if piece_bit != 0: # If we can't move pawns
-                    for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                        for i in range(5):
-                            capture_check_squares = white_pawn_attacks[origin_square] & self.current_checks[i] # We get the precomputed moveable squares
-                            if capture_check_squares != 0: # If we can capture pieces giving check
-                                destination = find_least_significant_bit_set(capture_check_squares) # There's only one check
-                                if destination > 55:
-                                    captures.append(Move(origin_square, destination, 4, i + 6))
-                                    captures.append(Move(origin_square, destination, 3, i + 6))
-                                    captures.append(Move(origin_square, destination, 2, i + 6)) 
-                                    captures.append(Move(origin_square, destination, 1, i + 6))
-                                else:
-                                    captures.append(Move(origin_square, destination, 0, i + 6))
-                        if white_pawn_attacks[origin_square] & passant_bitboards[self.psquare] != 0 and self.king_is_safe_after_passant(origin_square, self.psquare-8): # En passant capture
-                            captures.append(Move(origin_square, self.psquare, 0, 6))
+                    checks_bit = self.current_checks[0] | self.current_checks[1] | self.current_checks[2] | self.current_checks[3] | self.current_checks[4]
+                    for shift, capture_check_squares in ((7, (piece_bit << 7) & not_h_file & checks_bit), (9, (piece_bit << 9) & not_a_file & checks_bit)):
+                        if capture_check_squares != 0: # If we can capture the piece giving check
+                            destination = find_least_significant_bit_set(capture_check_squares) # There's only one check
+                            origin_square = destination - shift
+                            index = self.mailbox[destination]
+                            if destination > 55:
+                                captures.append(origin_square | destination << 6 | 4 << 12 | (index + 1) << 15)
+                                captures.append(origin_square | destination << 6 | 3 << 12 | (index + 1) << 15)
+                                captures.append(origin_square | destination << 6 | 2 << 12 | (index + 1) << 15) 
+                                captures.append(origin_square | destination << 6 | 1 << 12 | (index + 1) << 15)
+                            else:
+                                captures.append(origin_square | destination << 6 | (index + 1) << 15)
+                    if self.psquare != -1: # En passant capture, our pawns that can capture are the ones a black pawn on the passant square would attack
+                        for origin_square in get_set_bit_indices(black_pawn_attacks[self.psquare] & piece_bit):
+                            if self.king_is_safe_after_passant(origin_square, self.psquare-8):
+                                captures.append(origin_square | self.psquare << 6 | 7 << 15)
 
                 # Capturing with knights
                 piece_bit = bitboard[1] & ~all_pins
@@ -808,7 +663,7 @@ class BitPosition:
                         for i in range(5):
                             capture_check_squares = knight_moves[origin_square] & self.current_checks[i] # We get the precomputed moveable squares
                             if capture_check_squares != 0: # If we can capture
-                                captures.append(Move(origin_square, find_least_significant_bit_set(capture_check_squares), 0, i + 6))
+                                captures.append(origin_square | find_least_significant_bit_set(capture_check_squares) << 6 | (i + 7) << 15)
                 
 
                 # Capturing with Rooks
@@ -816,61 +671,63 @@ class BitPosition:
                 if piece_bit != 0:
                     for origin_square in get_set_bit_indices(piece_bit):
                         for i in range(5):
-                            capture_check_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)] & self.current_checks[i]
+                            capture_check_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]] & self.current_checks[i]
                             if capture_check_squares != 0:
-                                captures.append(Move(origin_square, find_least_significant_bit_set(capture_check_squares), 0, i + 6))
+                                captures.append(origin_square | find_least_significant_bit_set(capture_check_squares) << 6 | (i + 7) << 15)
 
                 # Capturing with Bishops
                 piece_bit = bitboard[2] & ~all_pins
                 if piece_bit != 0:
                     for origin_square in get_set_bit_indices(piece_bit):
                         for i in range(5):
-                            capture_check_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)] & self.current_checks[i]
+                            capture_check_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]] & self.current_checks[i]
                             if capture_check_squares != 0:
-                                captures.append(Move(origin_square, find_least_significant_bit_set(capture_check_squares), 0, i + 6))
+                                captures.append(origin_square | find_least_significant_bit_set(capture_check_squares) << 6 | (i + 7) << 15)
                 
                 # Capturing with Queens
                 piece_bit = bitboard[4] & ~all_pins
                 if piece_bit != 0:
                     for origin_square in get_set_bit_indices(piece_bit):
                         for i in range(5):
-                            capture_check_squares = (long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)] | long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]) & self.current_checks[i]
+                            capture_check_squares = (bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]] | rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]) & self.current_checks[i]
                             if capture_check_squares != 0:
-                                captures.append(Move(origin_square, find_least_significant_bit_set(capture_check_squares), 0, i + 6))
+                                captures.append(origin_square | find_least_significant_bit_set(capture_check_squares) << 6 | (i + 7) << 15)
         
         else: # Blacks turn
-            all_own_pieces_bit = bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-            all_pieces_bit = all_own_pieces_bit | bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
+            all_pieces_bit = self.all_pieces_bit
         
             # We go piece by piece yielding captures
             # Capturing with King
             piece_bit = bitboard[11]
             origin_square = find_least_significant_bit_set(piece_bit) # We get the indices of the squares pieces of this type are in
+            safe_squares = king_moves[origin_square] & ~self.attacked_squares() # We get the precomputed moveable squares that are not attacked
             for i in range(5):
-                capture_check_squares = king_moves[origin_square] & bitboard[i] # We get the precomputed moveable squares
+                capture_check_squares = safe_squares & bitboard[i]
                 if capture_check_squares != 0: # If we can capture
                     for destination in get_set_bit_indices(capture_check_squares):
-                        if self.king_is_safe(destination):
-                            captures.append(Move(origin_square, destination, 0, i+6))
+                        captures.append(origin_square | destination << 6 | (i + 7) << 15)
 
             if self.current_checks[-1] == 1: # We can only capture (with a piece that is not the king) or block if there is only one check
-                # Capturing with Pawns
+                # Capturing with Pawns (all pawns at once, shifting the pawn bitboard along both diagonals onto the piece giving check)
                 piece_bit = bitboard[6] & ~all_pins
                 if piece_bit != 0: # If we can't move pawns
-                    for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                        for i in range(5):
-                            capture_check_squares = black_pawn_attacks[origin_square] & self.current_checks[i] # We get the precomputed moveable squares
-                            if capture_check_squares != 0: # If we can capture pieces giving check
-                                destination = find_least_significant_bit_set(capture_check_squares) # There's only one check
-                                if destination > 55:
-                                    captures.append(Move(origin_square, destination, 4, i + 6))
-                                    captures.append(Move(origin_square, destination, 3, i + 6))
-                                    captures.append(Move(origin_square, destination, 2, i + 6)) 
-                                    captures.append(Move(origin_square, destination, 1, i + 6))
-                                else:
-                                    captures.append(Move(origin_square, destination, 0, i + 6))
-                        if black_pawn_attacks[origin_square] & passant_bitboards[self.psquare] != 0 and self.king_is_safe_after_passant(origin_square, self.psquare+8): # En passant capture (ply_info[-1][2] = psquare)
-                            captures.append(Move(origin_square, self.psquare, 0, 6))
+                    checks_bit = self.current_checks[0] | self.current_checks[1] | self.current_checks[2] | self.current_checks[3] | self.current_checks[4]
+                    for shift, capture_check_squares in ((9, (piece_bit >> 9) & not_h_file & checks_bit), (7, (piece_bit >> 7) & not_a_file & checks_bit)):
+                        if capture_check_squares != 0: # If we can capture the piece giving check
+                            destination = find_least_significant_bit_set(capture_check_squares) # There's only one check
+                            origin_square = destination + shift
+                            index = self.mailbox[destination]
+                            if destination < 8:
+                                captures.append(origin_square | destination << 6 | 4 << 12 | (index + 7) << 15)
+                                captures.append(origin_square | destination << 6 | 3 << 12 | (index + 7) << 15)
+                                captures.append(origin_square | destination << 6 | 2 << 12 | (index + 7) << 15) 
+                                captures.append(origin_square | destination << 6 | 1 << 12 | (index + 7) << 15)
+                            else:
+                                captures.append(origin_square | destination << 6 | (index + 7) << 15)
+                    if self.psquare != -1: # En passant capture, our pawns that can capture are the ones a white pawn on the passant square would attack
+                        for origin_square in get_set_bit_indices(white_pawn_attacks[self.psquare] & piece_bit):
+                            if self.king_is_safe_after_passant(origin_square, self.psquare+8):
+                                captures.append(origin_square | self.psquare << 6 | 7 << 15)
 
                 # Capturing with knights
                 piece_bit = bitboard[7] & ~all_pins
@@ -879,7 +736,7 @@ class BitPosition:
                         for i in range(5):
                             capture_check_squares = knight_moves[origin_square] & self.current_checks[i] # We get the precomputed moveable squares
                             if capture_check_squares != 0: # If we can capture
-                                captures.append(Move(origin_square, find_least_significant_bit_set(capture_check_squares), 0, i + 6))
+                                captures.append(origin_square | find_least_significant_bit_set(capture_check_squares) << 6 | (i + 7) << 15)
                 
 
                 # Capturing with Rooks
@@ -887,29 +744,29 @@ class BitPosition:
                 if piece_bit != 0:
                     for origin_square in get_set_bit_indices(piece_bit):
                         for i in range(5):
-                            capture_check_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)] & self.current_checks[i]
+                            capture_check_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]] & self.current_checks[i]
                             if capture_check_squares != 0:
-                                captures.append(Move(origin_square, find_least_significant_bit_set(capture_check_squares), 0, i + 6))
+                                captures.append(origin_square | find_least_significant_bit_set(capture_check_squares) << 6 | (i + 7) << 15)
 
                 # Capturing with Bishops
                 piece_bit = bitboard[8] & ~all_pins
                 if piece_bit != 0:
                     for origin_square in get_set_bit_indices(piece_bit):
                         for i in range(5):
-                            capture_check_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)] & self.current_checks[i]
+                            capture_check_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]] & self.current_checks[i]
                             if capture_check_squares != 0:
-                                captures.append(Move(origin_square, find_least_significant_bit_set(capture_check_squares), 0, i + 6))
+                                captures.append(origin_square | find_least_significant_bit_set(capture_check_squares) << 6 | (i + 7) << 15)
                 
                 # Capturing with Queens
                 piece_bit = bitboard[10] & ~all_pins
                 if piece_bit != 0:
                     for origin_square in get_set_bit_indices(piece_bit):
                         for i in range(5):
-                            capture_check_squares = (long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)] | long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]) & self.current_checks[i]
+                            capture_check_squares = (bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]] | rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]) & self.current_checks[i]
                             if capture_check_squares != 0:
-                                captures.append(Move(origin_square, find_least_significant_bit_set(capture_check_squares), 0, i + 6))
+                                captures.append(origin_square | find_least_significant_bit_set(capture_check_squares) << 6 | (i + 7) << 15)
             
-        return [move for move in sorted(captures, key=lambda move: move.capture, reverse=True)] # return the moves ordered in terms of the score and make is_check = 0 for all
+        return [move for move in sorted(captures, key=lambda move: move >> 15, reverse=True)] # return the moves ordered in terms of the score and make is_check = 0 for all
 
 
     def in_check_moves(self):
@@ -918,33 +775,33 @@ class BitPosition:
         This will yield the moves to reduce computational time.
         '''
         bitboard = self.bitboard
+        if self.current_checks is None:
+            self.position_info()
         _, _, _, _, _, rays, num_checks = self.current_checks
         all_pins = self.current_pins[0] | self.current_pins[1]
-        all_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5] | bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
+        all_pieces_bit = self.all_pieces_bit
         
         if self.turn: # If whites turn
         
             # We go piece by piece yielding blocking moves
 
             if num_checks == 1: # We can only capture (with a piece that is not the king) or block if there is only one check
-                # Blocking with Pawns
+                # Blocking with Pawns (all pawns at once, pushing the pawn bitboard one and two rows onto the ray of the check)
                 piece_bit = bitboard[0] & ~all_pins
                 if piece_bit != 0: # If we can't move pawns
-                    pawn_indices = get_set_bit_indices(piece_bit) # The indices of the squares the pawns are in
-                    for origin_square in pawn_indices: # For position of piece of this type
-                        if white_pawn_moves[origin_square] & all_pieces_bit == 0: # We can move the pawn
-                            moveable_check_squares = white_pawn_moves[origin_square] & rays # We get the precomputed moveable squares
-                            if moveable_check_squares != 0: # If we can capture pieces giving check
-                                for destination in get_set_bit_indices(moveable_check_squares):
-                                    if destination > 55:
-                                            yield Move(origin_square, destination, 4, 0)
-                                            yield Move(origin_square, destination, 3, 0) 
-                                            yield Move(origin_square, destination, 2, 0) 
-                                            yield Move(origin_square, destination, 1, 0)
-                                    else:
-                                        yield Move(origin_square, destination, 0, 0) # checks will have odd is_check attribute
-                        if origin_square < 16 and white_pawn_doubles[origin_square] & rays != 0:
-                            yield Move(origin_square, origin_square + 16, 0, 0)
+                    single_pushes = (piece_bit << 8) & ~all_pieces_bit
+                    double_pushes = ((single_pushes & rank_3) << 8) & rays
+                    single_pushes &= rays
+                    for destination in get_set_bit_indices(single_pushes):
+                        if destination > 55:
+                            yield (destination - 8) | destination << 6 | 4 << 12 | 1 << 15
+                            yield (destination - 8) | destination << 6 | 3 << 12 | 1 << 15 
+                            yield (destination - 8) | destination << 6 | 2 << 12 | 1 << 15 
+                            yield (destination - 8) | destination << 6 | 1 << 12 | 1 << 15
+                        else:
+                            yield (destination - 8) | destination << 6 | 1 << 15
+                    for destination in get_set_bit_indices(double_pushes):
+                        yield (destination - 16) | destination << 6 | 1 << 15
 
                 # Blocking with knights
                 piece_bit = bitboard[1] & ~all_pins
@@ -954,72 +811,69 @@ class BitPosition:
                         block_check_squares = knight_moves[origin_square] & rays # We get the precomputed moveable squares
                         if block_check_squares != 0: # If we can capture
                             for destination in get_set_bit_indices(block_check_squares):
-                                yield Move(origin_square, destination, 0, 0) 
+                                yield origin_square | destination << 6 | 1 << 15 
 
                 # Blocking with Rooks
                 piece_bit = bitboard[3] & ~all_pins
                 if piece_bit != 0:
                     bit_indices = get_set_bit_indices(piece_bit)
                     for origin_square in bit_indices:
-                        block_check_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)] & rays
+                        block_check_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]] & rays
                         if block_check_squares != 0:
                             for destination in get_set_bit_indices(block_check_squares):
-                                yield Move(origin_square, destination, 0, 0)
+                                yield origin_square | destination << 6 | 1 << 15
 
                 # Blocking with Bishops
                 piece_bit = bitboard[2] & ~all_pins
                 if piece_bit != 0:
                     bit_indices = get_set_bit_indices(piece_bit)
                     for origin_square in bit_indices:
-                        block_check_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)] & rays
+                        block_check_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]] & rays
                         if block_check_squares != 0:
                             for destination in get_set_bit_indices(block_check_squares):
-                                yield Move(origin_square, destination, 0, 0) 
+                                yield origin_square | destination << 6 | 1 << 15 
                 
                 # Blocking with Queens
                 piece_bit = bitboard[4] & ~all_pins
                 if piece_bit != 0:
                     bit_indices = get_set_bit_indices(piece_bit)
                     for origin_square in bit_indices:
-                        block_check_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
-                        block_check_squares |= long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                        block_check_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
+                        block_check_squares |= rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                         block_check_squares &= rays
                         if block_check_squares != 0:
                             for destination in get_set_bit_indices(block_check_squares):
-                                yield Move(origin_square, destination, 0, 0)
+                                yield origin_square | destination << 6 | 1 << 15
             
             # Moving king
             piece_bit = bitboard[5]
             origin_square = find_least_significant_bit_set(piece_bit) # We get the indices of the squares pieces of this type are in
-            non_capture_check_squares = king_moves[origin_square] & ~(all_pieces_bit| rays) # We get the precomputed moveable squares
-            if non_capture_check_squares != 0: # If we can capture
+            non_capture_check_squares = king_moves[origin_square] & ~(all_pieces_bit | self.attacked_squares()) # We get the precomputed moveable squares that are not attacked
+            if non_capture_check_squares != 0: # If we can move
                 for destination in get_set_bit_indices(non_capture_check_squares):
-                    if self.king_is_safe(destination):
-                        yield Move(origin_square, destination, 0, 0)
+                    yield origin_square | destination << 6 | 1 << 15
         
         else: # Blacks turn
         
             # We go piece by piece yielding blocking moves
 
             if num_checks == 1: # We can only capture (with a piece that is not the king) or block if there is only one check
-                # Blocking with Pawns
+                # Blocking with Pawns (all pawns at once, pushing the pawn bitboard one and two rows onto the ray of the check)
                 piece_bit = bitboard[6] & ~all_pins
                 if piece_bit != 0: # If we can't move pawns
-                    pawn_indices = get_set_bit_indices(piece_bit) # The indices of the squares the pawns are in
-                    for origin_square in pawn_indices: # For position of piece of this type
-                        if black_pawn_moves[origin_square] & all_pieces_bit == 0: # We can move the pawn
-                            moveable_check_squares = black_pawn_moves[origin_square] & rays # We get the precomputed moveable squares
-                            if moveable_check_squares != 0: # If we can capture pieces giving check
-                                for destination in get_set_bit_indices(moveable_check_squares):
-                                    if destination < 8:
-                                            yield Move(origin_square, destination, 4, 0)
-                                            yield Move(origin_square, destination, 3, 0) 
-                                            yield Move(origin_square, destination, 2, 0) 
-                                            yield Move(origin_square, destination, 1, 0)
-                                    else:
-                                        yield Move(origin_square, destination, 0, 0) # checks will have odd is_check attribute
-                        if origin_square > 47 and black_pawn_doubles[origin_square] & rays != 0:
-                            yield Move(origin_square, origin_square - 16, 0, 0)
+                    single_pushes = (piece_bit >> 8) & ~all_pieces_bit
+                    double_pushes = ((single_pushes & rank_6) >> 8) & rays
+                    single_pushes &= rays
+                    for destination in get_set_bit_indices(single_pushes):
+                        if destination < 8:
+                            yield (destination + 8) | destination << 6 | 4 << 12 | 1 << 15
+                            yield (destination + 8) | destination << 6 | 3 << 12 | 1 << 15 
+                            yield (destination + 8) | destination << 6 | 2 << 12 | 1 << 15 
+                            yield (destination + 8) | destination << 6 | 1 << 12 | 1 << 15
+                        else:
+                            yield (destination + 8) | destination << 6 | 1 << 15
+                    for destination in get_set_bit_indices(double_pushes):
+                        yield (destination + 16) | destination << 6 | 1 << 15
 
                 # Blocking with knights
                 piece_bit = bitboard[7] & ~all_pins
@@ -1029,67 +883,66 @@ class BitPosition:
                         block_check_squares = knight_moves[origin_square] & rays # We get the precomputed moveable squares
                         if block_check_squares != 0: # If we can capture
                             for destination in get_set_bit_indices(block_check_squares):
-                                yield Move(origin_square, destination, 0, 0) 
+                                yield origin_square | destination << 6 | 1 << 15 
 
                 # Blocking with Rooks
                 piece_bit = bitboard[9] & ~all_pins
                 if piece_bit != 0:
                     bit_indices = get_set_bit_indices(piece_bit)
                     for origin_square in bit_indices:
-                        block_check_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)] & rays
+                        block_check_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]] & rays
                         if block_check_squares != 0:
                             for destination in get_set_bit_indices(block_check_squares):
-                                yield Move(origin_square, destination, 0, 0)
+                                yield origin_square | destination << 6 | 1 << 15
 
                 # Blocking with Bishops
                 piece_bit = bitboard[8] & ~all_pins
                 if piece_bit != 0:
                     bit_indices = get_set_bit_indices(piece_bit)
                     for origin_square in bit_indices:
-                        block_check_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)] & rays
+                        block_check_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]] & rays
                         if block_check_squares != 0:
                             for destination in get_set_bit_indices(block_check_squares):
-                                yield Move(origin_square, destination, 0, 0) 
+                                yield origin_square | destination << 6 | 1 << 15 
                 
                 # Blocking with Queens
                 piece_bit = bitboard[10] & ~all_pins
                 if piece_bit != 0:
                     bit_indices = get_set_bit_indices(piece_bit)
                     for origin_square in bit_indices:
-                        block_check_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
-                        block_check_squares |= long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                        block_check_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
+                        block_check_squares |= rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                         block_check_squares &= rays
                         if block_check_squares != 0:
                             for destination in get_set_bit_indices(block_check_squares):
-                                yield Move(origin_square, destination, 0, 0)
+                                yield origin_square | destination << 6 | 1 << 15
             
             # Moving king
             piece_bit = bitboard[11]
             origin_square = find_least_significant_bit_set(piece_bit) # We get the indices of the squares pieces of this type are in
-            non_capture_check_squares = king_moves[origin_square] & ~(all_pieces_bit| rays) # We get the precomputed moveable squares
-            if non_capture_check_squares != 0: # If we can capture
+            non_capture_check_squares = king_moves[origin_square] & ~(all_pieces_bit | self.attacked_squares()) # We get the precomputed moveable squares that are not attacked
+            if non_capture_check_squares != 0: # If we can move
                 for destination in get_set_bit_indices(non_capture_check_squares):
-                    if self.king_is_safe(destination):
-                        yield Move(origin_square, destination, 0, 0)
+                    yield origin_square | destination << 6 | 1 << 15
 
         
 
 
     def capture_moves(self):
         '''
-        We create a set of moves and order them in terms of the score, returning a tuple of moves. This set of moves will always be computed before
-        non_capture_moves so in this one we compute the next_unsafe_squares.
+        We create a set of moves and order them in terms of the score, returning a list of moves. The pins come from position_info, 
+        which is shared with non_capture_moves.
         '''
         bitboard = self.bitboard
-        self.current_pins = self.get_pins_bits() # Computes the pins and stores the in self.pins and self.fake_pins (so that in non capture moves it is not necessary to compute)
-        diagonal_pins, straight_pins = self.current_pins # Add pins to pins_ply so that we don't have to store them inside bitposition
+        if self.current_pins is None:
+            self.position_info()
+        diagonal_pins, straight_pins = self.current_pins
         full_pins = diagonal_pins | straight_pins
         captures = []
 
         if self.turn: # If whites turn
-            all_own_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
-            all_opp_pieces_bit = bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-            all_pieces_bit = all_own_pieces_bit | all_opp_pieces_bit
+            all_opp_pieces_bit = self.black_pieces_bit
+            all_pieces_bit = self.all_pieces_bit
 
             # Capturing with knight that are not pinned
             piece_bit = bitboard[1] & ~full_pins
@@ -1102,78 +955,80 @@ class BitPosition:
                             capture_squares = moveable_squares & bitboard[index] # We get only squares in which opponent pieces are
                             if capture_squares != 0: # If we can capture
                                 for destination in get_set_bit_indices(capture_squares):
-                                    captures.append((index-1, Move(origin_square, destination, 0, index))) # non-checks will have even is_check attribute 
+                                    captures.append((index-1, origin_square | destination << 6 | (index + 1) << 15)) # non-checks will have even is_check attribute 
 
             # Capturing with king
             piece_bit = bitboard[5]
             origin_square = find_least_significant_bit_set(piece_bit) # We get the indices of the squares pieces of this type are in
             moveable_squares = king_moves[origin_square] # We get the precomputed moveable squares
             if moveable_squares & all_opp_pieces_bit != 0: # Current piece can't capture anything
+                moveable_squares &= ~self.attacked_squares() # The king can only capture pieces that are not defended
                 for index in range(6,11): # For each of our opponent pieces, except king
                     capture_squares = moveable_squares & bitboard[index] # We get only squares in which opponent pieces are
                     if capture_squares != 0: # If we can capture
                         for destination in get_set_bit_indices(capture_squares):
-                            if self.king_is_safe(destination):
-                                captures.append((index, Move(origin_square, destination, 0, index)))
+                            captures.append((index, origin_square | destination << 6 | (index + 1) << 15))
 
             # Capturing with rook that are not pinned
             piece_bit = bitboard[3] & ~full_pins
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     if moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(6,11):
                             capture_squares = moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-3, Move(origin_square, destination, 0, index))) # checks will have odd is_check attribute
+                                captures.append((index-3, origin_square | destination << 6 | (index + 1) << 15)) # checks will have odd is_check attribute
 
             # Capturing with bishop that are not pinned
             piece_bit = bitboard[2] & ~full_pins
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
                     if moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(6,11):
                             capture_squares = moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-2, Move(origin_square, destination, 0, index))) # checks will have odd is_check attribute
+                                captures.append((index-2, origin_square | destination << 6 | (index + 1) << 15)) # checks will have odd is_check attribute
             
             # Capturing with queen that are not pinned
             piece_bit = bitboard[4] & ~full_pins
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
-                    moveable_squares |= long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
+                    moveable_squares |= rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     if moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(6,11):
                             capture_squares = moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-4, Move(origin_square, destination, 0, index))) # checks will have odd is_check attribute
+                                captures.append((index-4, origin_square | destination << 6 | (index + 1) << 15)) # checks will have odd is_check attribute
             
-            # Capturing with pawns that are not pinned
+            # Capturing with pawns that are not pinned (all pawns at once, shifting the pawn bitboard along both diagonals)
             piece_bit = bitboard[0] & ~full_pins
             if piece_bit != 0: # If we can't move pawns
-                pawn_indices = get_set_bit_indices(piece_bit) # The indices of the squares the pawns are in
-                for origin_square in pawn_indices: # For position of piece of this type
-                    attacking_squares = white_pawn_attacks[origin_square] # We get the precomputed moveable squares
-                    if attacking_squares & all_opp_pieces_bit != 0: # Current piece can't capture anything
-                        for index in range(6,11): # For each of our opponent pieces, except king
-                            capture_squares = attacking_squares & bitboard[index] # We get only squares in which opponent pieces are
-                            if capture_squares != 0: # If we can capture
-                                for destination in get_set_bit_indices(capture_squares):
-                                    if destination > 55:
-                                        captures.extend([(index, Move(origin_square, destination, 4, index)), (index, Move(origin_square, destination, 3, index)), 
-                                                        (index, Move(origin_square, destination, 2, index)), (index, Move(origin_square, destination, 1, index))])
-                                    else:
-                                        captures.append((index, Move(origin_square, destination, 0, index))) # checks will have odd is_check attribute
-                    if attacking_squares & passant_bitboards[self.psquare] != 0 and self.king_is_safe_after_passant(origin_square, self.psquare-8): # En passant capture (ply_info[-1][2] = psquare)
-                        captures.append((0, Move(origin_square, self.psquare, 0, 6)))
+                capturable_bit = all_opp_pieces_bit & ~bitboard[11]
+                for shift, capture_squares in ((7, (piece_bit << 7) & not_h_file & capturable_bit), (9, (piece_bit << 9) & not_a_file & capturable_bit)):
+                    for destination in get_set_bit_indices(capture_squares):
+                        origin_square = destination - shift
+                        index = self.mailbox[destination]
+                        if destination > 55:
+                            captures.extend([(index, origin_square | destination << 6 | 4 << 12 | (index + 1) << 15), (index, origin_square | destination << 6 | 3 << 12 | (index + 1) << 15), 
+                                            (index, origin_square | destination << 6 | 2 << 12 | (index + 1) << 15), (index, origin_square | destination << 6 | 1 << 12 | (index + 1) << 15)])
+                        else:
+                            captures.append((index, origin_square | destination << 6 | (index + 1) << 15))
+
+            # En passant capture with any pawn (king_is_safe_after_passant also takes care of pinned pawns), our pawns that can 
+            # capture are the ones a black pawn on the passant square would attack
+            if self.psquare != -1:
+                for origin_square in get_set_bit_indices(black_pawn_attacks[self.psquare] & bitboard[0]):
+                    if self.king_is_safe_after_passant(origin_square, self.psquare-8):
+                        captures.append((0, origin_square | self.psquare << 6 | 7 << 15))
 
 
             # Capturing with pinned pieces
@@ -1183,70 +1038,66 @@ class BitPosition:
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)] & diagonal_pins
+                    moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]] & diagonal_pins
                     if moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(6,11):
                             capture_squares = moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-2, Move(origin_square, destination, 0, index))) # checks will have odd is_check attribute
+                                captures.append((index-2, origin_square | destination << 6 | (index + 1) << 15)) # checks will have odd is_check attribute
             
             # Capturing with rook that is pinned
             piece_bit = bitboard[3] & straight_pins
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)] & straight_pins
+                    moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]] & straight_pins
                     if moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(6,11):
                             capture_squares = moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-3, Move(origin_square, destination, 0, index))) # checks will have odd is_check attribute
+                                captures.append((index-3, origin_square | destination << 6 | (index + 1) << 15)) # checks will have odd is_check attribute
 
             # Capturing with queen that is pinned
             piece_bit = bitboard[4] & full_pins
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    diag_moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)] & diagonal_pins
-                    straight_moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)] & straight_pins
+                    diag_moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]] & diagonal_pins
+                    straight_moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]] & straight_pins
                     if diag_moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(6,11):
                             capture_squares = diag_moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-4,Move(origin_square, destination, 0, index))) # checks will have odd is_check attribute
+                                captures.append((index-4,origin_square | destination << 6 | (index + 1) << 15)) # checks will have odd is_check attribute
                     if straight_moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(6,11):
                             capture_squares = straight_moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-4, Move(origin_square, destination, 0, index))) # checks will have odd is_check attribute
+                                captures.append((index-4, origin_square | destination << 6 | (index + 1) << 15)) # checks will have odd is_check attribute
             
-            # Capturing with pawns that are pinned
+            # Capturing with pawns that are pinned (only along the diagonal pin)
             piece_bit = bitboard[0] & diagonal_pins
             if piece_bit != 0: # If we can't move pawns
-                pawn_indices = get_set_bit_indices(piece_bit) # The indices of the squares the pawns are in
-                for origin_square in pawn_indices: # For position of piece of this type
-                    attacking_squares = white_pawn_attacks[origin_square] & diagonal_pins # We get the precomputed moveable squares
-                    if attacking_squares & all_opp_pieces_bit != 0: # Current piece can't capture anything
-                        for index in range(6,11): # For each of our opponent pieces, except king
-                            capture_squares = attacking_squares & bitboard[index] # We get only squares in which opponent pieces are
-                            if capture_squares != 0: # If we can capture
-                                for destination in get_set_bit_indices(capture_squares):
-                                    if destination > 55:
-                                        captures.extend([(index, Move(origin_square, destination, 4, index)), (index, Move(origin_square, destination, 3, index)), 
-                                                        (index, Move(origin_square, destination, 2, index)), (index, Move(origin_square, destination, 1, index))])
-                                    else:
-                                        captures.append((index, Move(origin_square, destination, 0, index))) # checks will have odd is_check attribute
+                capturable_bit = all_opp_pieces_bit & ~bitboard[11] & diagonal_pins
+                for shift, capture_squares in ((7, (piece_bit << 7) & not_h_file & capturable_bit), (9, (piece_bit << 9) & not_a_file & capturable_bit)):
+                    for destination in get_set_bit_indices(capture_squares):
+                        origin_square = destination - shift
+                        index = self.mailbox[destination]
+                        if destination > 55:
+                            captures.extend([(index, origin_square | destination << 6 | 4 << 12 | (index + 1) << 15), (index, origin_square | destination << 6 | 3 << 12 | (index + 1) << 15), 
+                                            (index, origin_square | destination << 6 | 2 << 12 | (index + 1) << 15), (index, origin_square | destination << 6 | 1 << 12 | (index + 1) << 15)])
+                        else:
+                            captures.append((index, origin_square | destination << 6 | (index + 1) << 15))
 
             return [move[1] for move in sorted(captures, key=lambda move: move[0], reverse=True)] # return the moves ordered in terms of the score and make is_check = 0 for all
 
         else: # Blacks turn
-            all_opp_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
-            all_own_pieces_bit = bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-            all_pieces_bit = all_own_pieces_bit | all_opp_pieces_bit
+            all_opp_pieces_bit = self.white_pieces_bit
+            all_pieces_bit = self.all_pieces_bit
 
             # Capturing with knight that are not pinned
             piece_bit = bitboard[7] & ~full_pins
@@ -1259,79 +1110,80 @@ class BitPosition:
                             capture_squares = moveable_squares & bitboard[index] # We get only squares in which opponent pieces are
                             if capture_squares != 0: # If we can capture
                                 for destination in get_set_bit_indices(capture_squares):
-                                    captures.append((index-1, Move(origin_square, destination, 0, index+6))) # non-checks will have even is_check attribute 
+                                    captures.append((index-1, origin_square | destination << 6 | (index + 7) << 15)) # non-checks will have even is_check attribute 
 
             # Capturing with king
             piece_bit = bitboard[11]
             origin_square = find_least_significant_bit_set(piece_bit) # We get the indices of the squares pieces of this type are in
             moveable_squares = king_moves[origin_square] # We get the precomputed moveable squares
             if moveable_squares & all_opp_pieces_bit != 0: # Current piece can't capture anything
+                moveable_squares &= ~self.attacked_squares() # The king can only capture pieces that are not defended
                 for index in range(5): # For each of our opponent pieces, except king
                     capture_squares = moveable_squares & bitboard[index] # We get only squares in which opponent pieces are
                     if capture_squares != 0: # If we can capture
                         for destination in get_set_bit_indices(capture_squares):
-                            if self.king_is_safe(destination):
-                                captures.append((index, Move(origin_square, destination, 0, index+6)))
+                            captures.append((index, origin_square | destination << 6 | (index + 7) << 15))
 
             # Capturing with rook that are not pinned
             piece_bit = bitboard[9] & ~full_pins
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     if moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(5):
                             capture_squares = moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-3, Move(origin_square, destination, 0, index+6))) # checks will have odd is_check attribute
+                                captures.append((index-3, origin_square | destination << 6 | (index + 7) << 15)) # checks will have odd is_check attribute
 
             # Capturing with bishop that are not pinned
             piece_bit = bitboard[8] & ~full_pins
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
                     if moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(5):
                             capture_squares = moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-2, Move(origin_square, destination, 0, index+6))) # checks will have odd is_check attribute
+                                captures.append((index-2, origin_square | destination << 6 | (index + 7) << 15)) # checks will have odd is_check attribute
             
             # Capturing with queen that are not pinned
             piece_bit = bitboard[10] & ~full_pins
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
-                    moveable_squares |= long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
+                    moveable_squares |= rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     if moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(5):
                             capture_squares = moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-4, Move(origin_square, destination, 0, index+6))) # checks will have odd is_check attribute
+                                captures.append((index-4, origin_square | destination << 6 | (index + 7) << 15)) # checks will have odd is_check attribute
             
-            # Capturing with pawns that are not pinned
+            # Capturing with pawns that are not pinned (all pawns at once, shifting the pawn bitboard along both diagonals)
             piece_bit = bitboard[6] & ~full_pins
             if piece_bit != 0: # If we can't move pawns
-                pawn_indices = get_set_bit_indices(piece_bit) # The indices of the squares the pawns are in
-                for origin_square in pawn_indices: # For position of piece of this type
-                    attacking_squares = black_pawn_attacks[origin_square] # We get the precomputed moveable squares
-                    if attacking_squares & all_opp_pieces_bit != 0: # Current piece can't capture anything
-                        for index in range(5): # For each of our opponent pieces, except king
-                            capture_squares = attacking_squares & bitboard[index] # We get only squares in which opponent pieces are
-                            if capture_squares != 0: # If we can capture
-                                for destination in get_set_bit_indices(capture_squares):
-                                    if destination < 8:
-                                        captures.extend([(index, Move(origin_square, destination, 4, index+6)), (index, Move(origin_square, destination, 3, index+6)), 
-                                                        (index, Move(origin_square, destination, 2, index+6)), (index, Move(origin_square, destination, 1, index+6))])
-                                    else:
-                                        captures.append((index, Move(origin_square, destination, 0, index+6))) # checks will have odd is_check attribute
-
-                    if attacking_squares & passant_bitboards[self.psquare] != 0 and self.king_is_safe_after_passant(origin_square, self.psquare+8): # En passant capture (ply_info[-1][2] = psquare)
-                        captures.append((0, Move(origin_square, self.psquare, 0, 6)))
+                capturable_bit = all_opp_pieces_bit & ~bitboard[5]
+                for shift, capture_squares in ((9, (piece_bit >> 9) & not_h_file & capturable_bit), (7, (piece_bit >> 7) & not_a_file & capturable_bit)):
+                    for destination in get_set_bit_indices(capture_squares):
+                        origin_square = destination + shift
+                        index = self.mailbox[destination]
+                        if destination < 8:
+                            captures.extend([(index, origin_square | destination << 6 | 4 << 12 | (index + 7) << 15), (index, origin_square | destination << 6 | 3 << 12 | (index + 7) << 15), 
+                                            (index, origin_square | destination << 6 | 2 << 12 | (index + 7) << 15), (index, origin_square | destination << 6 | 1 << 12 | (index + 7) << 15)])
+                        else:
+                            captures.append((index, origin_square | destination << 6 | (index + 7) << 15))
+
+            # En passant capture with any pawn (king_is_safe_after_passant also takes care of pinned pawns), our pawns that can 
+            # capture are the ones a white pawn on the passant square would attack
+            if self.psquare != -1:
+                for origin_square in get_set_bit_indices(white_pawn_attacks[self.psquare] & bitboard[6]):
+                    if self.king_is_safe_after_passant(origin_square, self.psquare+8):
+                        captures.append((0, origin_square | self.psquare << 6 | 7 << 15))
 
 
             # Capturing with pinned pieces
@@ -1341,63 +1193,60 @@ class BitPosition:
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)] & diagonal_pins
+                    moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]] & diagonal_pins
                     if moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(5):
                             capture_squares = moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-2, Move(origin_square, destination, 0, index+6))) # checks will have odd is_check attribute
+                                captures.append((index-2, origin_square | destination << 6 | (index + 7) << 15)) # checks will have odd is_check attribute
 
             # Capturing with rook that are pinned
             piece_bit = bitboard[9] & straight_pins
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)] & straight_pins
+                    moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]] & straight_pins
                     if moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(5):
                             capture_squares = moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-3, Move(origin_square, destination, 0, index+6))) # checks will have odd is_check attribute
+                                captures.append((index-3, origin_square | destination << 6 | (index + 7) << 15)) # checks will have odd is_check attribute
             
             # Capturing with queen that are pinned
             piece_bit = bitboard[10] & full_pins
             if piece_bit != 0:
                 bit_indices = get_set_bit_indices(piece_bit)
                 for origin_square in bit_indices:
-                    diagonal_moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)] & diagonal_pins
-                    straight_moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)] & straight_pins
+                    diagonal_moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]] & diagonal_pins
+                    straight_moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]] & straight_pins
                     if diagonal_moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(5):
                             capture_squares = diagonal_moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-4, Move(origin_square, destination, 0, index+6))) # checks will have odd is_check attribute
+                                captures.append((index-4, origin_square | destination << 6 | (index + 7) << 15)) # checks will have odd is_check attribute
                     if straight_moveable_squares & all_opp_pieces_bit != 0:
                         for index in range(5):
                             capture_squares = straight_moveable_squares & bitboard[index]
                             destination_bits = get_set_bit_indices(capture_squares)
                             for destination in destination_bits:
-                                captures.append((index-4, Move(origin_square, destination, 0, index+6))) # checks will have odd is_check attribute
+                                captures.append((index-4, origin_square | destination << 6 | (index + 7) << 15)) # checks will have odd is_check attribute
             
-            # Capturing with pawns that are pinned
+            # Capturing with pawns that are pinned (only along the diagonal pin)
             piece_bit = bitboard[6] & diagonal_pins
             if piece_bit != 0: # If we can't move pawns
-                pawn_indices = get_set_bit_indices(piece_bit) # The indices of the squares the pawns are in
-                for origin_square in pawn_indices: # For position of piece of this type
-                    attacking_squares = black_pawn_attacks[origin_square] & diagonal_pins # We get the precomputed moveable squares
-                    if attacking_squares & all_opp_pieces_bit != 0: # Current piece can't capture anything
-                        for index in range(5): # For each of our opponent pieces, except king
-                            capture_squares = attacking_squares & bitboard[index] # We get only squares in which opponent pieces are
-                            if capture_squares != 0: # If we can capture
-                                for destination in get_set_bit_indices(capture_squares):
-                                    if destination < 8:
-                                        captures.extend([(index, Move(origin_square, destination, 4, index+6)), (index, Move(origin_square, destination, 3, index+6)), 
-                                                        (index, Move(origin_square, destination, 2, index+6)), (index, Move(origin_square, destination, 1, index+6))])
-                                    else:
-                                        captures.append((index, Move(origin_square, destination, 0, index+6))) # checks will have odd is_check attribute
+                capturable_bit = all_opp_pieces_bit & ~bitboard[5] & diagonal_pins
+                for shift, capture_squares in ((9, (piece_bit >> 9) & not_h_file & capturable_bit), (7, (piece_bit >> 7) & not_a_file & capturable_bit)):
+                    for destination in get_set_bit_indices(capture_squares):
+                        origin_square = destination + shift
+                        index = self.mailbox[destination]
+                        if destination < 8:
+                            captures.extend([(index, origin_square | destination << 6 | 4 << 12 | (index + 7) << 15), (index, origin_square | destination << 6 | 3 << 12 | (index + 7) << 15), 
+                                            (index, origin_square | destination << 6 | 2 << 12 | (index + 7) << 15), (index, origin_square | destination << 6 | 1 << 12 | (index + 7) << 15)])
+                        else:
+                            captures.append((index, origin_square | destination << 6 | (index + 7) << 15))
 
             return [move[1] for move in sorted(captures, key=lambda move: move[0], reverse=True)] # return the moves ordered in terms of the score and make is_check = 0 for all
     
@@ -1406,13 +1255,13 @@ class BitPosition:
         This will be a generator which when checking if move is a check it yields a move with score 1, else 0.
         '''
         bitboard = self.bitboard
+        if self.current_pins is None:
+            self.position_info()
         diagonal_pins, straight_pins = self.current_pins
         full_pins = diagonal_pins | straight_pins
 
         if self.turn: # If whites turn
-            all_own_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
-            all_opp_pieces_bit = bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-            all_pieces_bit = all_own_pieces_bit | all_opp_pieces_bit
+            all_pieces_bit = self.all_pieces_bit
             
             # Moving pieces that are not pinned
 
@@ -1423,136 +1272,128 @@ class BitPosition:
                     moveable_squares = knight_moves[origin_square] & ~all_pieces_bit # We get the precomputed moveable squares, note captures are computed on capture_moves().
                     if moveable_squares != 0: # If we can move our piece
                         for destination in get_set_bit_indices(moveable_squares): # get_set_bit_indices is a generator so yielding bellow makes it more efficient
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
 
             # King 
             piece_bit = bitboard[5]
             origin_square = find_least_significant_bit_set(piece_bit) # For position of piece of this type
-            moveable_squares = king_moves[origin_square] & ~all_pieces_bit # We get the precomputed moveable squares, note captures are computed on capture_moves().
-            if moveable_squares != 0: # If we can move our piece
-                if self.wc[0]: # If its whites turn with kingside castling rights (ply_info[-1][0] = wc)
+            attacked_squares = self.attacked_squares()
+            moveable_squares = king_moves[origin_square] & ~(all_pieces_bit | attacked_squares) # We get the precomputed moveable squares that are not attacked, note captures are computed on capture_moves().
+            if moveable_squares != 0: # If we can move our piece (if we can't, the squares next to the king we castle through are not safe)
+                if self.castling_rights & 8: # If its whites turn with kingside castling rights
                     if all_pieces_bit & 96 == 0: # If pieces are not blocking
-                        if self.king_is_safe(5) and self.king_is_safe(6):
-                            yield Move(7, 5, 0, -1) # Make the move as if rook moved (better for move method)
+                        if attacked_squares & 96 == 0: # If the king doesn't pass through attacked squares
+                            yield white_kingside_castling # Make the move as if rook moved (better for move method)
 
-                if self.wc[1]: # If its whites turn with queenside castling rights (ply_info[-1][0] = wc)
+                if self.castling_rights & 4: # If its whites turn with queenside castling rights
                     if all_pieces_bit & 14 == 0: # If pieces are not blocking
-                        if self.king_is_safe(2) and self.king_is_safe(3):
-                            yield Move(0, 3, 0, -1)
+                        if attacked_squares & 12 == 0:
+                            yield white_queenside_castling
                     
                 for destination in get_set_bit_indices(moveable_squares): # get_set_bit_indices is a generator so yielding bellow makes it more efficient
-                    if self.king_is_safe(destination):
-                        yield Move(origin_square, destination, 0, 0)
+                    yield origin_square | destination << 6 | 1 << 15
                                 
-            # Pawns
+            # Pawns (all pawns at once, pushing the pawn bitboard one and two rows onto empty squares)
             piece_bit = bitboard[0] & ~full_pins
             if piece_bit != 0:
-                for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = white_pawn_moves[origin_square] & ~all_pieces_bit # We get rid of the squares in which our own or opp pieces are
-                    if moveable_squares != 0:
-                        for destination in get_set_bit_indices(moveable_squares): # Promotions
-                            if destination > 55:
-                                yield Move(origin_square, destination, 4, 0)
-                                yield Move(origin_square, destination, 3, 0)
-                                yield Move(origin_square, destination, 2, 0)
-                                yield Move(origin_square, destination, 1, 0)
-                            elif origin_square < 16 and white_pawn_doubles[origin_square] & all_pieces_bit == 0:
-                                yield Move(origin_square, destination + 8, 0, 0)
-                                yield Move(origin_square, destination, 0, 0)
-                            else:
-                                yield Move(origin_square, destination, 0, 0)
+                single_pushes = (piece_bit << 8) & ~all_pieces_bit
+                for destination in get_set_bit_indices(single_pushes & first_and_last_ranks): # Promotions
+                    yield (destination - 8) | destination << 6 | 4 << 12 | 1 << 15
+                    yield (destination - 8) | destination << 6 | 3 << 12 | 1 << 15
+                    yield (destination - 8) | destination << 6 | 2 << 12 | 1 << 15
+                    yield (destination - 8) | destination << 6 | 1 << 12 | 1 << 15
+                for destination in get_set_bit_indices(((single_pushes & rank_3) << 8) & ~all_pieces_bit): # Double advances
+                    yield (destination - 16) | destination << 6 | 1 << 15
+                for destination in get_set_bit_indices(single_pushes & ~first_and_last_ranks):
+                    yield (destination - 8) | destination << 6 | 1 << 15
 
             # Bishops
             piece_bit = bitboard[2] & ~full_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
                     moveable_squares &= ~ all_pieces_bit
                     if moveable_squares != 0:
                         for destination in get_set_bit_indices(moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
 
             # Rooks
             piece_bit = bitboard[3] & ~full_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     moveable_squares &= ~ all_pieces_bit
                     if moveable_squares != 0:
                         for destination in get_set_bit_indices(moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
             
             # Queens
             piece_bit = bitboard[4] & ~full_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    diag_moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
+                    diag_moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
                     diag_moveable_squares &= ~ all_pieces_bit
-                    straight_moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    straight_moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     straight_moveable_squares &= ~ all_pieces_bit
                     if straight_moveable_squares != 0:
                         for destination in get_set_bit_indices(straight_moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
 
                     if diag_moveable_squares != 0:
                         for destination in get_set_bit_indices(diag_moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
             
             # Moving pinned pieces (Note knights cannot be moved if pinned and kings cannot be pinned)
 
-            # Pinned Pawns
+            # Pinned Pawns (only along a vertical pin, so they can't promote)
             piece_bit = bitboard[0] & straight_pins
             if piece_bit != 0:
-                for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = white_pawn_moves[origin_square] & ~all_pieces_bit & straight_pins # We get rid of the squares in which our own or opp pieces are
-                    if moveable_squares != 0:
-                        for destination in get_set_bit_indices(moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
-                            if origin_square < 16 and white_pawn_doubles[origin_square] & all_pieces_bit == 0: # Double advance
-                                yield Move(origin_square, destination + 8, 0, 0)
+                single_pushes = (piece_bit << 8) & ~all_pieces_bit & straight_pins
+                for destination in get_set_bit_indices(single_pushes):
+                    yield (destination - 8) | destination << 6 | 1 << 15
+                for destination in get_set_bit_indices(((single_pushes & rank_3) << 8) & ~all_pieces_bit): # Double advances
+                    yield (destination - 16) | destination << 6 | 1 << 15
 
             # Pinned Bishops
             piece_bit = bitboard[2] & diagonal_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
                     moveable_squares &= ~ all_pieces_bit
                     moveable_squares &= diagonal_pins
                     if moveable_squares != 0:
                         for destination in get_set_bit_indices(moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
             # Pinned Rooks
             piece_bit = bitboard[3] & straight_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     moveable_squares &= ~ all_pieces_bit
                     moveable_squares &= straight_pins
                     if moveable_squares != 0:
                         for destination in get_set_bit_indices(moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
             
             # Pinned Queens
             piece_bit = bitboard[4] & full_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    diag_moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
+                    diag_moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
                     diag_moveable_squares &= ~ all_pieces_bit
                     diag_moveable_squares &= diagonal_pins
-                    straight_moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    straight_moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     straight_moveable_squares &= ~ all_pieces_bit
                     straight_moveable_squares &= straight_pins
                     if straight_moveable_squares != 0:
                         for destination in get_set_bit_indices(straight_moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
 
                     if diag_moveable_squares != 0:
                         for destination in get_set_bit_indices(diag_moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
         else: # Blacks turn
-            all_opp_pieces_bit = bitboard[0] | bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] | bitboard[5]
-            all_own_pieces_bit = bitboard[6] | bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] | bitboard[11]
-            all_pieces_bit = all_own_pieces_bit | all_opp_pieces_bit
+            all_pieces_bit = self.all_pieces_bit
             
             # Moving pieces that are not pinned
 
@@ -1563,293 +1404,396 @@ class BitPosition:
                     moveable_squares = knight_moves[origin_square] & ~all_pieces_bit # We get the precomputed moveable squares, note captures are computed on capture_moves().
                     if moveable_squares != 0: # If we can move our piece
                         for destination in get_set_bit_indices(moveable_squares): # get_set_bit_indices is a generator so yielding bellow makes it more efficient
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
 
             # King 
             piece_bit = bitboard[11]
             origin_square = find_least_significant_bit_set(piece_bit) # For position of piece of this type
-            moveable_squares = king_moves[origin_square] & ~all_pieces_bit # We get the precomputed moveable squares, note captures are computed on capture_moves().
-            if moveable_squares != 0: # If we can move our piece
-                if self.bc[0]: # If it's black turn with kingside castling rights (ply_info[-1][1] = bc)
+            attacked_squares = self.attacked_squares()
+            moveable_squares = king_moves[origin_square] & ~(all_pieces_bit | attacked_squares) # We get the precomputed moveable squares that are not attacked, note captures are computed on capture_moves().
+            if moveable_squares != 0: # If we can move our piece (if we can't, the squares next to the king we castle through are not safe)
+                if self.castling_rights & 2: # If it's black turn with kingside castling rights
                     if all_pieces_bit & 6917529027641081856 == 0:
-                        if self.king_is_safe(61) and self.king_is_safe(62):
-                            yield Move(63, 61, 0, -1)
+                        if attacked_squares & 6917529027641081856 == 0: # If the king doesn't pass through attacked squares
+                            yield black_kingside_castling
                 
-                if self.bc[1]: # If its black turn with queenside castling rights (ply_info[-1][1] = bc)
+                if self.castling_rights & 1: # If its black turn with queenside castling rights
                     if all_pieces_bit & 1008806316530991104 == 0:
-                        if self.king_is_safe(59) and self.king_is_safe(58):
-                            yield Move(56, 59, 0, -1)
+                        if attacked_squares & 864691128455135232 == 0:
+                            yield black_queenside_castling
                     
                 for destination in get_set_bit_indices(moveable_squares): # get_set_bit_indices is a generator so yielding bellow makes it more efficient
-                    if self.king_is_safe(destination):
-                        yield Move(origin_square, destination, 0, 0)
+                    yield origin_square | destination << 6 | 1 << 15
                                 
-            # Pawns
+            # Pawns (all pawns at once, pushing the pawn bitboard one and two rows onto empty squares)
             piece_bit = bitboard[6] & ~full_pins
             if piece_bit != 0:
-                for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = black_pawn_moves[origin_square] & ~all_pieces_bit # We get rid of the squares in which our own or opp pieces are
-                    if moveable_squares != 0:
-                        for destination in get_set_bit_indices(moveable_squares): # Promotions
-                            if destination < 8:
-                                yield Move(origin_square, destination, 4, 0)
-                                yield Move(origin_square, destination, 3, 0)
-                                yield Move(origin_square, destination, 2, 0)
-                                yield Move(origin_square, destination, 1, 0)
-                            elif origin_square > 47 and black_pawn_doubles[origin_square] & all_pieces_bit == 0: # Double advance
-                                yield Move(origin_square, destination - 8, 0, 0)
-                                yield Move(origin_square, destination, 0, 0)
-                            else:
-                                yield Move(origin_square, destination, 0, 0)
+                single_pushes = (piece_bit >> 8) & ~all_pieces_bit
+                for destination in get_set_bit_indices(single_pushes & first_and_last_ranks): # Promotions
+                    yield (destination + 8) | destination << 6 | 4 << 12 | 1 << 15
+                    yield (destination + 8) | destination << 6 | 3 << 12 | 1 << 15
+                    yield (destination + 8) | destination << 6 | 2 << 12 | 1 << 15
+                    yield (destination + 8) | destination << 6 | 1 << 12 | 1 << 15
+                for destination in get_set_bit_indices(((single_pushes & rank_6) >> 8) & ~all_pieces_bit): # Double advances
+                    yield (destination + 16) | destination << 6 | 1 << 15
+                for destination in get_set_bit_indices(single_pushes & ~first_and_last_ranks):
+                    yield (destination + 8) | destination << 6 | 1 << 15
 
             # Bishops
             piece_bit = bitboard[8] & ~full_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
                     moveable_squares &= ~ all_pieces_bit
                     if moveable_squares != 0:
                         for destination in get_set_bit_indices(moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
 
             # Rooks
             piece_bit = bitboard[9] & ~full_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     moveable_squares &= ~ all_pieces_bit
                     if moveable_squares != 0:
                         for destination in get_set_bit_indices(moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
             
             # Queens
             piece_bit = bitboard[10] & ~full_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    diag_moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
+                    diag_moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
                     diag_moveable_squares &= ~ all_pieces_bit
-                    straight_moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    straight_moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     straight_moveable_squares &= ~ all_pieces_bit
                     if straight_moveable_squares != 0:
                         for destination in get_set_bit_indices(straight_moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
 
                     if diag_moveable_squares != 0:
                         for destination in get_set_bit_indices(diag_moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
             
             # Moving pinned pieces (Note knights cannot be moved if pinned and kings cannot be pinned)
 
-            # Pinned Pawns
+            # Pinned Pawns (only along a vertical pin, so they can't promote)
             piece_bit = bitboard[6] & straight_pins
             if piece_bit != 0:
-                for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = black_pawn_moves[origin_square] & ~all_pieces_bit & straight_pins # We get rid of the squares in which our own or opp pieces are
-                    if moveable_squares != 0:
-                        for destination in get_set_bit_indices(moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
-                            if origin_square > 47 and black_pawn_doubles[origin_square] & all_pieces_bit == 0: # Double advance
-                                yield Move(origin_square, destination - 8, 0, 0)
+                single_pushes = (piece_bit >> 8) & ~all_pieces_bit & straight_pins
+                for destination in get_set_bit_indices(single_pushes):
+                    yield (destination + 8) | destination << 6 | 1 << 15
+                for destination in get_set_bit_indices(((single_pushes & rank_6) >> 8) & ~all_pieces_bit): # Double advances
+                    yield (destination + 16) | destination << 6 | 1 << 15
 
             # Pinned Bishops
             piece_bit = bitboard[8] & diagonal_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
                     moveable_squares &= ~ all_pieces_bit
                     moveable_squares &= diagonal_pins
                     if moveable_squares != 0:
                         for destination in get_set_bit_indices(moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
             # Pinned Rooks
             piece_bit = bitboard[9] & straight_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     moveable_squares &= ~ all_pieces_bit
                     moveable_squares &= straight_pins
                     if moveable_squares != 0:
                         for destination in get_set_bit_indices(moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
             
             # Pinned Queens
             piece_bit = bitboard[10] & full_pins
             if piece_bit != 0:
                 for origin_square in get_set_bit_indices(piece_bit): # For position of piece of this type
-                    diag_moveable_squares = long_precomputed_bishop_table[origin_square][bishop_unfull_rays[origin_square] & (all_pieces_bit)]
+                    diag_moveable_squares = bishop_magic_table[origin_square][(((bishop_unfull_rays[origin_square] & all_pieces_bit) * bishop_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[origin_square]]
                     diag_moveable_squares &= ~ all_pieces_bit
                     diag_moveable_squares &= diagonal_pins
-                    straight_moveable_squares = long_precomputed_rook_table[origin_square][rook_unfull_rays[origin_square] & (all_pieces_bit)]
+                    straight_moveable_squares = rook_magic_table[origin_square][(((rook_unfull_rays[origin_square] & all_pieces_bit) * rook_magic_numbers[origin_square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[origin_square]]
                     straight_moveable_squares &= ~ all_pieces_bit
                     straight_moveable_squares &= straight_pins
                     if straight_moveable_squares != 0:
                         for destination in get_set_bit_indices(straight_moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
 
                     if diag_moveable_squares != 0:
                         for destination in get_set_bit_indices(diag_moveable_squares):
-                            yield Move(origin_square, destination, 0, 0)
+                            yield origin_square | destination << 6 | 1 << 15
     
 
     def move(self, move):
         '''
-        Move piece and switch white and black roles, without rotating the board.
+        Move piece and switch white and black roles, without rotating the board. The move is a packed integer (see encode_move).
         '''
-        self.position_ply_info.append((copy.copy(self.wc), copy.copy(self.bc), copy.copy(self.psquare), copy.copy(self.current_pins), copy.copy(self.current_checks))) # For unmake_move
+        origin_square, destination, promotion, capture = move & 63, move >> 6 & 63, move >> 12 & 7, (move >> 15) - 1
+        # Save the irreversible info of this ply for unmake_move
+        ply = self.ply
+        self.castling_rights_stack[ply] = self.castling_rights
+        self.psquare_stack[ply] = self.psquare
+        self.pins_stack[ply] = self.current_pins
+        self.checks_stack[ply] = self.current_checks
+        self.attacks_stack[ply] = self.current_attacks
+        self.zobrist_key_stack[ply] = self.zobrist_key
+        self.ply = ply + 1
+        # Zobrist key: we take off the old castling rights and passant square (put back at the end) and switch the side to move
+        zobrist_key = self.zobrist_key ^ castling_rights_zobrist_numbers[self.castling_rights] ^ passant_squares_zobrist_numbers[self.psquare] ^ black_to_move_zobrist_number
 
         if self.turn: # If whites move
             # For captures we take off opponent pieces
-            if move.capture == 6 and move.j == self.psquare: # En passant capture (ply_info[-2][2] = last psquare)
-                self.bitboard[6] &= ~(1 << (move.j - 8))
+            if capture == 6 and destination == self.psquare: # En passant capture (ply_info[-2][2] = last psquare)
+                self.bitboard[6] &= ~(1 << (destination - 8))
+                self.black_pieces_bit &= ~(1 << (destination - 8))
+                self.mailbox[destination - 8] = -1
+                zobrist_key ^= zobrist_numbers_pieces[6][destination - 8]
             
-            elif move.capture != 0 and move.capture != -1: # Any other capture
-                self.bitboard[move.capture] &= ~(1 << move.j)
+            elif capture != 0 and capture != -1: # Any other capture
+                self.bitboard[capture] &= ~(1 << destination)
+                self.black_pieces_bit &= ~(1 << destination)
+                zobrist_key ^= zobrist_numbers_pieces[capture][destination]
             
             # For all non promotion moves we put our pieces on new squares
-            if move.prom == 0: # Any non promotion move
-                for indx in range(6):
-                    if move.i in get_set_bit_indices(self.bitboard[indx]): # If this is the piece we are moving
-                        moving_piece = indx
-                        self.bitboard[indx] &= ~(1 << move.i)
-                        self.bitboard[indx] |= 1 << move.j
+            moving_piece = self.mailbox[origin_square]
+            if promotion == 0: # Any non promotion move
+                self.bitboard[moving_piece] ^= (1 << origin_square) | (1 << destination)
+                self.mailbox[destination] = moving_piece
+                zobrist_key ^= zobrist_numbers_pieces[moving_piece][origin_square] ^ zobrist_numbers_pieces[moving_piece][destination]
 
             else: # If we are promoting pawn
-                moving_piece = 0
-                self.bitboard[0] &= ~(1 << move.i)
-                self.bitboard[move.prom] |= 1 << move.j
+                self.bitboard[0] &= ~(1 << origin_square)
+                self.bitboard[promotion] |= 1 << destination
+                self.mailbox[destination] = promotion
+                zobrist_key ^= zobrist_numbers_pieces[0][origin_square] ^ zobrist_numbers_pieces[promotion][destination]
+            self.mailbox[origin_square] = -1
+            self.white_pieces_bit ^= (1 << origin_square) | (1 << destination)
             
             # Castling (we must also move king)
-            if move.capture == -1 and move.i == 0: # White kingside castling
+            if capture == -1 and origin_square == 0: # White kingside castling
                 self.bitboard[5] = 4
-                self.wc = [False, False] 
-            elif move.capture == -1 and move.i == 7: # White queenside castling
+                self.white_pieces_bit ^= 16 | 4
+                self.mailbox[4] = -1
+                self.mailbox[2] = 5
+                self.castling_rights &= 3
+                zobrist_key ^= zobrist_numbers_pieces[5][4] ^ zobrist_numbers_pieces[5][2]
+            elif capture == -1 and origin_square == 7: # White queenside castling
                 self.bitboard[5] = 64
-                self.wc = [False, False] 
-
-            # Updating castling rights
-            elif moving_piece == 5: # If we move king castling rights are lost
-                self.wc = [False, False] 
-            elif move.i == 0 or move.j == 0: # If we move rook on a1
-                self.wc[1] = False
-            elif move.i == 7 or move.j == 7: # If we move rook on h1
-                self.wc[0] = False 
-            elif move.i == 56 or move.j == 56: # If we move rook on a8
-                self.bc[1] = False
-            elif move.i == 63 or move.j == 63: # If we move rook on h8
-                self.bc[0] = False
+                self.white_pieces_bit ^= 16 | 64
+                self.mailbox[4] = -1
+                self.mailbox[6] = 5
+                self.castling_rights &= 3
+                zobrist_key ^= zobrist_numbers_pieces[5][4] ^ zobrist_numbers_pieces[5][6]
 
             # Update psquare if needed
             self.psquare = -1
-            if moving_piece == 0 and move.j - move.i == 16: # If we are moving a pawn twice
-                self.psquare = move.i + 8 # We store the row to reduce size
+            if moving_piece == 0 and destination - origin_square == 16: # If we are moving a pawn twice
+                self.psquare = origin_square + 8 # We store the row to reduce size
 
         
         else: # Blacks move
             # For captures we take off opponent pieces
-            if move.capture == 6 and move.j == self.psquare: # En passant capture
-                self.bitboard[0] &= ~(1 << (move.j + 8))
+            if capture == 6 and destination == self.psquare: # En passant capture
+                self.bitboard[0] &= ~(1 << (destination + 8))
+                self.white_pieces_bit &= ~(1 << (destination + 8))
+                self.mailbox[destination + 8] = -1
+                zobrist_key ^= zobrist_numbers_pieces[0][destination + 8]
             
-            elif move.capture != 0 and move.capture != -1: # Any other capture
-                self.bitboard[move.capture-6] &= ~(1 << move.j)
+            elif capture != 0 and capture != -1: # Any other capture
+                self.bitboard[capture-6] &= ~(1 << destination)
+                self.white_pieces_bit &= ~(1 << destination)
+                zobrist_key ^= zobrist_numbers_pieces[capture - 6][destination]
 
             # For all non promotion moves we put our pieces on new squares
-            if move.prom == 0:
-                for indx in range(6,12):
-                    if move.i in get_set_bit_indices(self.bitboard[indx]): # If this is the piece we are moving
-                        moving_piece = indx
-                        self.bitboard[indx] &= ~(1 << move.i)
-                        self.bitboard[indx] |= 1 << move.j
+            moving_piece = self.mailbox[origin_square]
+            if promotion == 0:
+                self.bitboard[moving_piece] ^= (1 << origin_square) | (1 << destination)
+                self.mailbox[destination] = moving_piece
+                zobrist_key ^= zobrist_numbers_pieces[moving_piece][origin_square] ^ zobrist_numbers_pieces[moving_piece][destination]
 
             else: # If we are promoting pawn
-                moving_piece = 6
-                self.bitboard[6] &= ~(1 << move.i)
-                self.bitboard[move.prom + 6] |= 1 << move.j
-            
+                self.bitboard[6] &= ~(1 << origin_square)
+                self.bitboard[promotion + 6] |= 1 << destination
+                self.mailbox[destination] = promotion + 6
+                zobrist_key ^= zobrist_numbers_pieces[6][origin_square] ^ zobrist_numbers_pieces[promotion + 6][destination]
+            self.mailbox[origin_square] = -1
+            self.black_pieces_bit ^= (1 << origin_square) | (1 << destination)
             
             # Castling (we must also move king)
-            if move.capture == -1 and move.i == 56: # Black kingside castling
+            if capture == -1 and origin_square == 56: # Black kingside castling
                 self.bitboard[11] = 288230376151711744
-                self.bc = [False, False]
-            elif move.capture == -1 and move.i == 63: # Black queenside castling
+                self.black_pieces_bit ^= 1152921504606846976 | 288230376151711744
+                self.mailbox[60] = -1
+                self.mailbox[58] = 11
+                self.castling_rights &= 12
+                zobrist_key ^= zobrist_numbers_pieces[11][60] ^ zobrist_numbers_pieces[11][58]
+            elif capture == -1 and origin_square == 63: # Black queenside castling
                 self.bitboard[11] = 4611686018427387904
-                self.bc = [False, False]
-            
-            # Updating castling rights
-            elif moving_piece == 11 and not self.turn: # If we move king castling rights are lost
-                self.bc = [False, False]
-            elif move.i == 0 or move.j == 0: # If we move rook on a1
-                self.wc[1] = False
-            elif move.i == 7 or move.j == 7: # If we move rook on h1
-                self.wc[0] = False 
-            elif move.i == 56 or move.j == 56: # If we move rook on a8
-                self.bc[1] = False
-            elif move.i == 63 or move.j == 63: # If we move rook on h8
-                self.bc[0] = False
+                self.black_pieces_bit ^= 1152921504606846976 | 4611686018427387904
+                self.mailbox[60] = -1
+                self.mailbox[62] = 11
+                self.castling_rights &= 12
+                zobrist_key ^= zobrist_numbers_pieces[11][60] ^ zobrist_numbers_pieces[11][62]
 
             # Update psquare if needed
             self.psquare = -1
-            if moving_piece == 6 and move.j - move.i == -16: # If we are moving a pawn twice
-                self.psquare = move.j + 8 # We store the row +8 to reduce the size
+            if moving_piece == 6 and destination - origin_square == -16: # If we are moving a pawn twice
+                self.psquare = destination + 8 # We store the row +8 to reduce the size
         
-        # Add move ply info
-        self.move_ply_info.append((moving_piece, move.capture, move.prom))
+        # Updating castling rights (moving the king, moving a rook or capturing a rook)
+        self.castling_rights &= castling_rights_masks[origin_square] & castling_rights_masks[destination]
+        self.moving_piece_stack[ply] = moving_piece
+        self.zobrist_key = zobrist_key ^ castling_rights_zobrist_numbers[self.castling_rights] ^ passant_squares_zobrist_numbers[self.psquare]
 
         # Update info
-        self.current_checks = (0,0,0,0,0,0,0)
-        self.current_pins = (0,0)
+        self.all_pieces_bit = self.white_pieces_bit | self.black_pieces_bit
+        self.current_checks = None # Computed by position_info when needed
+        self.current_pins = None
+        self.current_attacks = None
         self.turn = not self.turn
+        if debug_zobrist:
+            assert self.zobrist_key == position_to_zobrist_key(self), 'Zobrist key out of sync after move ' + str(decode_move(move))
 
 
     def unmake_move(self, move):
         '''
         Takes a move and undoes the move accordingly, updating all position attributes. When the engine transverses the tree of moves it will keep 
-        track of some irreversible aspects of the game at each ply. These are (white castling rights, black castling rights, passant square, 
-        moving piece, capture index, pins, checks).
+        track of some irreversible aspects of the game at each ply in the undo stack. These are (castling rights, passant square, moving piece, 
+        pins, checks, attacked squares, Zobrist key), the capture index and promotion are read back from the move.
         '''
-        moving_indx, capture_indx, move_promotion = self.move_ply_info.pop()
-        self.wc, self.bc, self.psquare, self.current_pins, self.current_checks = self.position_ply_info.pop() # Update irreversible info
+        origin_square, destination, move_promotion, capture_indx = move & 63, move >> 6 & 63, move >> 12 & 7, (move >> 15) - 1
+        # Update irreversible info
+        ply = self.ply - 1
+        self.ply = ply
+        moving_indx = self.moving_piece_stack[ply]
+        self.castling_rights = self.castling_rights_stack[ply]
+        self.psquare = self.psquare_stack[ply]
+        self.current_pins = self.pins_stack[ply]
+        self.current_checks = self.checks_stack[ply]
+        self.current_attacks = self.attacks_stack[ply]
+        self.zobrist_key = self.zobrist_key_stack[ply]
+
+        self.mailbox[destination] = -1
+        self.mailbox[origin_square] = moving_indx
 
         if self.turn: # Whites turn (Last move was black's)
             # Put back the white captured piece
-            if capture_indx == 6 and move.j == self.psquare: # If move was an en passant capture
-                self.bitboard[0] |= 1 << move.j + 8
+            if capture_indx == 6 and destination == self.psquare: # If move was an en passant capture
+                self.bitboard[0] |= 1 << destination + 8
+                self.white_pieces_bit |= 1 << destination + 8
+                self.mailbox[destination + 8] = 0
 
             elif capture_indx != 0 and capture_indx != -1: # If the move was a capture
-                self.bitboard[capture_indx-6] |= 1 << move.j
+                self.bitboard[capture_indx-6] |= 1 << destination
+                self.white_pieces_bit |= 1 << destination
+                self.mailbox[destination] = capture_indx - 6
 
             # Unmove the black moving piece
             if move_promotion == 0:
-                self.bitboard[moving_indx] &= ~(1 << move.j)
+                self.bitboard[moving_indx] &= ~(1 << destination)
             else:
-                self.bitboard[move_promotion+6] &= ~(1 << move.j)
-            self.bitboard[moving_indx] |= 1 << move.i
+                self.bitboard[move_promotion+6] &= ~(1 << destination)
+            self.bitboard[moving_indx] |= 1 << origin_square
+            self.black_pieces_bit ^= (1 << origin_square) | (1 << destination)
 
             # Undoing castling, we must also move the king (the part above takes care of the rook)
             if capture_indx == -1:
+                self.black_pieces_bit ^= self.bitboard[11] | 1152921504606846976
+                self.mailbox[find_least_significant_bit_set(self.bitboard[11])] = -1
+                self.mailbox[60] = 11
                 self.bitboard[11] = 1152921504606846976
                 
         else: # Blacks turn (Last move was white's)
             # Put back the black captured piece
-            if capture_indx == 6 and move.j == self.psquare: # If move was an en passant capture
-                self.bitboard[6] |= 1 << move.j - 8  
+            if capture_indx == 6 and destination == self.psquare: # If move was an en passant capture
+                self.bitboard[6] |= 1 << destination - 8  
+                self.black_pieces_bit |= 1 << destination - 8
+                self.mailbox[destination - 8] = 6
 
             elif capture_indx != 0 and capture_indx != -1: # If the move was a capture
-                self.bitboard[capture_indx] |= 1 << move.j
+                self.bitboard[capture_indx] |= 1 << destination
+                self.black_pieces_bit |= 1 << destination
+                self.mailbox[destination] = capture_indx
 
             # Unmove the white moving piece
             if move_promotion == 0:
-                self.bitboard[moving_indx] &= ~(1 << move.j)
+                self.bitboard[moving_indx] &= ~(1 << destination)
             else:
-                self.bitboard[move_promotion] &= ~(1 << move.j)
+                self.bitboard[move_promotion] &= ~(1 << destination)
 
-            self.bitboard[moving_indx] |= 1 << move.i
+            self.bitboard[moving_indx] |= 1 << origin_square
+            self.white_pieces_bit ^= (1 << origin_square) | (1 << destination)
 
             # Undoing castling, we must also move the king (the part above takes care of the rook)
             if capture_indx == -1:
+                self.white_pieces_bit ^= self.bitboard[5] | 16
+                self.mailbox[find_least_significant_bit_set(self.bitboard[5])] = -1
+                self.mailbox[4] = 5
                 self.bitboard[5] = 16
         
+        self.all_pieces_bit = self.white_pieces_bit | self.black_pieces_bit
+        self.turn = not self.turn
+        if debug_zobrist:
+            assert self.zobrist_key == position_to_zobrist_key(self), 'Zobrist key out of sync after unmake_move ' + str(decode_move(move))
+
+    def make_null_move(self):
+        '''
+        Pass the turn (for null move pruning): the side to move changes and the passant square is cleared. It uses a slot of the
+        undo stack like move, with moving piece -1, so it must be undone with unmake_null_move. Don't call it when in check.
+        '''
+        ply = self.ply
+        self.castling_rights_stack[ply] = self.castling_rights
+        self.psquare_stack[ply] = self.psquare
+        self.pins_stack[ply] = self.current_pins
+        self.checks_stack[ply] = self.current_checks
+        self.attacks_stack[ply] = self.current_attacks
+        self.zobrist_key_stack[ply] = self.zobrist_key
+        self.moving_piece_stack[ply] = -1
+        self.ply = ply + 1
+        self.zobrist_key ^= passant_squares_zobrist_numbers[self.psquare] ^ black_to_move_zobrist_number
+        self.psquare = -1
+        self.current_checks = None
+        self.current_pins = None
+        self.current_attacks = None
         self.turn = not self.turn
 
+    def unmake_null_move(self):
+        ply = self.ply - 1
+        self.ply = ply
+        self.psquare = self.psquare_stack[ply]
+        self.current_pins = self.pins_stack[ply]
+        self.current_checks = self.checks_stack[ply]
+        self.current_attacks = self.attacks_stack[ply]
+        self.zobrist_key = self.zobrist_key_stack[ply]
+        self.turn = not self.turn
+
+    def last_move_was_null(self):
+        return self.ply > 0 and self.moving_piece_stack[self.ply - 1] == -1
+
+    def has_pieces(self):
+        '''
+        True if the side to move has pieces other than pawns and the king (null move pruning is not safe without them, because of 
+        zugzwang).
+        '''
+        bitboard = self.bitboard
+        if self.turn:
+            return bitboard[1] | bitboard[2] | bitboard[3] | bitboard[4] != 0
+        return bitboard[7] | bitboard[8] | bitboard[9] | bitboard[10] != 0
+
+    def state(self):
+        '''
+        The position as a small tuple (bitboards, turn, castling rights, passant square) to send to other processes, instead 
+        of pickling the BitPosition with its undo stacks. position_from_state builds the BitPosition back.
+        '''
+        return tuple(self.bitboard), self.turn, self.castling_rights, self.psquare
+
+def position_from_state(state):
+    bitboard, turn, castling_rights, psquare = state
+    return BitPosition(list(bitboard), turn, [bool(castling_rights & 8), bool(castling_rights & 4)], 
+                       [bool(castling_rights & 2), bool(castling_rights & 1)], psquare)
+
 
 ######################################################
 # Simple evaluation function (CHECK THE POINTS PER SQUARE ARE RELIABLE)
@@ -1966,22 +1910,21 @@ def evaluation_function_black(bitposition):
 
 
 def position_to_zobrist_key(bitposition):
+    '''
+    Compute the Zobrist key of a position from scratch. BitPosition keeps its key up to date incrementally, this is used to 
+    initialise it and to verify it (see debug_zobrist).
+    '''
     key = 0
-    for i, bit in enumerate(bitposition.bitboard):
-        array = bit_to_numpy_array(bit) * zobrist_numbers_pieces[i]
-        for element in array:
-            if element != 0:
-                key ^= element
+    for piece_index, piece_bit in enumerate(bitposition.bitboard):
+        piece_zobrist_numbers = zobrist_numbers_pieces[piece_index]
+        for square in get_set_bit_indices(piece_bit):
+            key ^= piece_zobrist_numbers[square]
     if not bitposition.turn: # If black is moving
         key ^= black_to_move_zobrist_number
-    # Castling key (we first get a 16 bit integer representing the castling rights)
-    castling_bit = bitposition.wc[0] << 3
-    castling_bit |= bitposition.wc[1] << 2
-    castling_bit |= bitposition.bc[0] << 1
-    castling_bit |= bitposition.bc[1] << 0
-    key ^= castling_rights_zobrist_numbers[castling_bit]
+    # Castling key (castling rights are a 4 bit integer)
+    key ^= castling_rights_zobrist_numbers[bitposition.castling_rights]
     # Passant key
-    key ^= passant_squares_zobrist_numbers[bitposition.passant_square]
+    key ^= passant_squares_zobrist_numbers[bitposition.psquare]
     return key
 
 
@@ -1991,17 +1934,177 @@ def position_to_zobrist_key(bitposition):
 ######################################################
 
 import time
-import itertools
+import multiprocessing
+import threading
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, wait
+from transposition_table import TranspositionTable, EXACT, LOWER, UPPER
+from time_manager import TimeManager
+
+def order_captures(position, captures):
+    '''
+    Sort captures in MVV-LVA order: most valuable victim first, and for the same victim the least valuable attacker first.
+    '''
+    mailbox = position.mailbox
+    return sorted(captures, key=lambda move: (move >> 15) * 8 - mailbox[move & 63] % 6, reverse=True)
+
+def is_losing_capture(position, move):
+    '''
+    A capture loses material if its static exchange evaluation is negative, which can only happen if the capturing piece is 
+    worth more than the captured one (so see is only called then).
+    '''
+    return piece_values[position.mailbox[move & 63] % 6] > piece_values[(move >> 15) - 7] and position.see(move) < 0
+
+def material_balance(position):
+    '''
+    White's material minus black's in piece_values (the kings cancel out). A cheap estimate of the evaluation, which is much 
+    slower, for the futility margins.
+    '''
+    bitboard = position.bitboard
+    return sum(piece_values[piece] * (count_bits(bitboard[piece]) - count_bits(bitboard[piece + 6])) for piece in range(5))
+
+class MovePicker:
+    '''
+    Staged move generator for the search. It yields the hash move (from the transposition table or the previous iteration) first, 
+    then the captures that don't lose material (see) in MVV-LVA order, then the killer moves, then the rest of the quiet moves 
+    (ordered by the history table if one is given, indexed by origin and destination square) and last the losing captures. A 
+    stage is only generated once the earlier ones are exhausted, so a node that gets a cutoff from the hash move or a capture 
+    never generates its quiet moves.
+    The hash move must be legal in the position, killers don't need to be (only the ones among the quiet moves are yielded).
+    '''
+    def __init__(self, position, in_check, hash_move = None, killers = (), history = None):
+        self.position = position
+        self.in_check = in_check
+        self.hash_move = hash_move
+        self.killers = killers
+        self.history = history
+
+    def __iter__(self):
+        position = self.position
+        hash_move = self.hash_move
+
+        # Hash move
+        if hash_move is not None:
+            yield hash_move
+
+        # Captures
+        if self.in_check:
+            capture_moves = position.in_check_captures()
+        else:
+            capture_moves = position.capture_moves()
+        losing_captures = []
+        for move in order_captures(position, capture_moves):
+            if move != hash_move:
+                if is_losing_capture(position, move):
+                    losing_captures.append(move)
+                else:
+                    yield move
+
+        # Killers, they are only yielded if they are among our quiet moves
+        if self.in_check:
+            non_capture_moves = position.in_check_moves()
+        else:
+            non_capture_moves = position.non_capture_moves()
+        killers = self.killers
+        if killers:
+            non_capture_moves = list(non_capture_moves)
+            for move in killers:
+                if move != hash_move and move in non_capture_moves:
+                    yield move
+
+        # Quiet moves
+        history = self.history
+        if history is not None:
+            non_capture_moves = sorted(non_capture_moves, key=lambda move: history[move & 4095], reverse=True)
+        for move in non_capture_moves:
+            if move != hash_move and move not in killers:
+                yield move
+
+        # Losing captures
+        for move in losing_captures:
+            yield move
+
+
+max_search_ply = 128 # Plies from the root the killer table can hold
 
 class Engine:
     '''
     In this engine a good evaluation for us will be positive and a good evaluation for opponent will be negative.
+    With pvs, moves after the first one are searched with a null window (Principal Variation Search) and only re-searched if 
+    they turn out better. With an aspiration_window each iteration of Search starts with a window of that size around the 
+    previous score (None searches with the full window). With quiet_move_ordering, quiet moves that caused a cutoff are stored
+    as killers of their ply and in the history table, and quiet moves are searched in that order. With null_move_pruning, at nodes 
+    with depth > null_move_reduction we first let the side to move pass and search with the depth reduced by null_move_reduction 
+    more, if that is still good enough for a cutoff we don't search the moves.
+    At nodes with depth <= 3 the material balance is compared with the window using a margin of futility_margin per ply of
+    depth: with reverse_futility_pruning we return if even after losing the margin we are above beta (or the opponent below alpha),
+    with futility_pruning (depth <= 2) quiet moves that don't give check are skipped if even gaining the margin can't reach alpha
+    (or beta for the opponent). With late_move_reductions, quiet moves that don't give check searched late at nodes with
+    depth >= 3 are searched one ply shallower (two if depth >= 5 and they come after the sixth move) with a null window, and 
+    only searched again at full depth if they turn out better. None of them is done when in check or at the root.
+    At depth 0 the quiescence search takes over, with delta_pruning it skips captures that can't reach the window even winning
+    delta_margin more than the captured piece, and with see_pruning captures that lose material.
+    Search polls the clock every time_check_nodes nodes and, once its time is over, abandons the iteration it is in and plays 
+    the best move of the last completed one. It doesn't start an iteration that is predicted to take longer than the time left.
+    How much time a search gets is decided by a TimeManager (see time_manager.py).
+    The principal variation of each iteration is collected in a triangular table (pv_table[ply] is the best line found from the
+    node at that ply). With pv_ordering the next iteration searches the move of that line first at every ply along it, 
+    otherwise only at the root.
+    With workers > 1 Search uses Lazy SMP: workers - 1 helper processes search the same position at the same time sharing the
+    transposition table (in shared memory), each with its quiet moves ordered slightly differently by a random history table, so
+    they fill the table with results the main search can use. When the main search finishes the helpers are stopped and the 
+    deepest completed iteration of all of them is played. Call close to free the shared memory.
+    With workers > 1 and root_split, each iteration instead splits the root moves over a pool of workers processes (kept between
+    searches, close shuts it down). The best score found so far is shared between them as the lower bound of their window, and
+    the results are merged in move order so ties always go to the same move.
     '''
-    def __init__(self, evaluation_func):
+    def __init__(self, evaluation_func, hash_size_mb = 16, pvs = True, aspiration_window = 25, quiet_move_ordering = True, 
+                 null_move_pruning = True, null_move_reduction = 2, late_move_reductions = True, futility_pruning = True,
+                 reverse_futility_pruning = True, futility_margin = 25, delta_pruning = True, delta_margin = 20, see_pruning = True,
+                 time_check_nodes = 256, pv_ordering = True, workers = 1, root_split = False, hash_name = None):
+        self.options = {name: value for name, value in locals().items() if name not in ('self', 'evaluation_func', 'workers', 'root_split', 'hash_name')} # (For the helpers)
         self.evaluation_func = evaluation_func
+        self.workers = workers
+        self.root_split = root_split and workers > 1
+        self.pool = None # Process pool of the root split, started by the first search
+        self.root_bound = None # Best root score of the current iteration, shared with the pool
+        self.root_generation = None # Number of the current root split iteration, shared with the pool (its tasks stop when it changes)
+        self.stop_event = None # An Event (threading or multiprocessing), when it is set the search stops like at the deadline
+        self.helper_nodes = 0 # Nodes searched by the Lazy SMP helpers in the last search
+        self.pv_ordering = pv_ordering
+        self.pv_table = [()] * (max_search_ply + 1) # pv_table[ply] is the principal variation from the node at ply (a tuple of moves)
+        self.pv = [] # Principal variation of the last completed iteration
+        self.following_pv = False # Whether the current node is on the principal variation of the previous iteration
+        self.iterations = [] # (depth, score, principal variation, time) of each completed iteration of the last search
+        self.on_iteration = None # Called with each of the iterations as it completes (BackgroundSearch streams them)
+        self.time_check_nodes = time_check_nodes
+        self.deadline = float('inf') # time.time() at which the search stops
+        self.stopped = False # Set when the deadline is reached, then every node returns straight away and the iteration is discarded
+        self.delta_pruning = delta_pruning
+        self.delta_margin = delta_margin
+        self.see_pruning = see_pruning
+        self.late_move_reductions = late_move_reductions
+        self.futility_pruning = futility_pruning
+        self.reverse_futility_pruning = reverse_futility_pruning
+        self.futility_margin = futility_margin
+        self.null_move_pruning = null_move_pruning
+        self.null_move_reduction = null_move_reduction
+        self.pvs = pvs
+        self.aspiration_window = aspiration_window
+        self.quiet_move_ordering = quiet_move_ordering
+        self.killers = [[0, 0] for _ in range(max_search_ply)] # Two killer moves for each ply from the root
+        self.history = [0] * 4096 # Indexed by origin square | destination square << 6 (the first 12 bits of a move)
+        self.root_ply = 0 # position.ply at the root, so position.ply - root_ply is the ply from the root
+        self.cutoffs = 0 # Beta cutoffs at nodes with depth > 0, and how many of them happened on the first move searched
+        self.first_move_cutoffs = 0
         self.current_depth = 1
         self.last_best_move = None
-        self.hash_table = {}
+        # Fixed size, scores are stored from the engine's point of view like alpha_beta returns them. It is in shared memory with
+        # several Lazy SMP workers, hash_name attaches to the table of another engine (for the helpers). With the root split 
+        # each worker has its own table and the main process only uses the age of its (single bucket) table.
+        self.hash_table = TranspositionTable(0 if self.root_split else hash_size_mb, shared = workers > 1 and not root_split, name = hash_name)
+        self.nodes = 0 # Number of nodes searched (calls to alpha_beta and quiescence)
+        self.quiescence_nodes = 0 # Number of them in the quiescence search
 
 
     def alpha_beta(self, position, depth, alpha, beta, our_turn):
@@ -2010,73 +2113,164 @@ class Engine:
         if position.three_fold():  # Repetitions
             return 0, 0
         '''
+        ply = position.ply - self.root_ply
+        if ply < max_search_ply:
+            self.pv_table[ply] = ()
+        if depth <= 0:
+            return self.quiescence(position, alpha, beta, our_turn), 0
         
+        self.nodes += 1
+        if self.nodes % self.time_check_nodes == 0 and (time.time() > self.deadline or self.stop_event is not None and self.stop_event.is_set()):
+            self.stopped = True
+        if self.stopped:
+            return 0, 0
         is_check = position.is_check()
 
-        # Quiesence search (Only captures)
-        if depth <= 0 and is_check:
-            capture_moves = position.in_check_captures()
-            non_capture_moves = []
-        elif depth <= 0 and not is_check:
-            capture_moves = position.capture_moves()
-            non_capture_moves = []
-        # Normal search
-        elif is_check: # If we are in check
-            capture_moves = position.in_check_captures()
-            non_capture_moves = position.in_check_moves()
+        # Transposition table, if the position was searched at least as deep we may return the stored score (never at the root, 
+        # where we need the best move). Otherwise its best move is searched first.
+        hash_move = None
+        entry = self.hash_table.probe(position.zobrist_key)
+        if entry is not None:
+            hash_move, hash_depth, hash_bound, hash_score = entry
+            if hash_depth >= depth and depth != self.current_depth:
+                if hash_bound == EXACT or (hash_bound == LOWER and hash_score >= beta) or (hash_bound == UPPER and hash_score <= alpha):
+                    return hash_score, hash_move
+            hash_move = hash_move or None # (0 is stored when there is no move)
+        # If we are on the principal variation of the previous iteration we start with its move (only the first move we search
+        # continues it)
+        on_pv = self.following_pv and ply < len(self.pv) and (self.pv_ordering or ply == 0)
+        if on_pv:
+            hash_move = self.pv[ply] or None
+        self.following_pv = False
+
+        # Null move pruning: if the side to move passes and a shallower search still fails high (for us) or low (for the opponent),
+        # making a move would be even better, so we cut. Not when in check (passing would be illegal), not twice in a row and not 
+        # with only pawns and king (in zugzwang passing would be better than any move).
+        if (self.null_move_pruning and depth > self.null_move_reduction and depth != self.current_depth and not is_check 
+            and not position.last_move_was_null() and position.has_pieces()):
+            position.make_null_move()
+            if our_turn:
+                null_value = self.alpha_beta(position, depth - 1 - self.null_move_reduction, beta - 1, beta, False)[0]
+            else:
+                null_value = self.alpha_beta(position, depth - 1 - self.null_move_reduction, alpha, alpha + 1, True)[0]
+            position.unmake_null_move()
+            if self.stopped:
+                return 0, 0
+            if our_turn and null_value >= beta:
+                return beta, 0
+            if not our_turn and null_value <= alpha:
+                return alpha, 0
+
+        # Futility: close to the leaves, if the material balance is far enough from the window a shallow search is not 
+        # expected to bring it back (mate scores are never pruned). The evaluation only adds a few points to the material, 
+        # less than the margins
+        futile = False
+        if depth <= 3 and not is_check and position.ply != self.root_ply and -10000 < alpha and beta < 10000:
+            margin = self.futility_margin * depth
+            if self.reverse_futility_pruning or (self.futility_pruning and depth <= 2):
+                static_value = material_balance(position) if position.turn == our_turn else -material_balance(position) # (For us)
+            if self.reverse_futility_pruning:
+                if our_turn and static_value - margin >= beta:
+                    return beta, 0
+                if not our_turn and static_value + margin <= alpha:
+                    return alpha, 0
+            if self.futility_pruning and depth <= 2:
+                futile = static_value + margin <= alpha if our_turn else static_value - margin >= beta
+        reduce = self.late_move_reductions and depth >= 3 and not is_check and position.ply != self.root_ply
+        alpha_start, beta_start = alpha, beta
+        self.following_pv = on_pv
+        if self.quiet_move_ordering:
+            moves = MovePicker(position, is_check, hash_move, tuple(self.killers[ply]) if ply < max_search_ply else (), self.history)
         else:
-            capture_moves = position.capture_moves()
-            non_capture_moves = position.non_capture_moves()
+            moves = MovePicker(position, is_check, hash_move)
         
-        if depth > 0:
-            value1 = -10004  # This is the best evaluation for us in the child_values (we start at the worst possible evaluation)
-            value2 = 10004 # This is the best evaluation for opponent in the child_values (we start at the worst possible evaluation)
-        elif our_turn: # If we are in quiescence, we have a baseline evaluation as if no captures happened
-            value1 = self.evaluation_func(position)
-        else:
-            value2 = self.evaluation_func(position)
+        value1 = -10004  # This is the best evaluation for us in the child_values (we start at the worst possible evaluation)
+        value2 = 10004 # This is the best evaluation for opponent in the child_values (we start at the worst possible evaluation)
 
         best_move = None
-        if depth == self.current_depth and self.last_best_move != None: # If we are starting an alpha beta search and we have already a previous best we will start with the previous best
-            capture_moves.insert(0, self.last_best_move)
+        # Principal Variation Search: we expect the first move to be the best, so for the next ones we only prove they are not 
+        # better with a null window (alpha, alpha + 1) for us or (beta - 1, beta) for the opponent. Only if that fails we search
+        # them again with the full window.
+        pvs = self.pvs
+        moves_searched = 0
+        # The first move is always searched, so best_move is set even if all the others are pruned
 
         if our_turn:  
             # If we have to move, we want to maximize. This is ensured because the evaluation function takes into account if engine is 
             # playing as white or not.
-            for move in itertools.chain(capture_moves, non_capture_moves):
+            for move in moves:
                 position.move(move)
-                child_value = self.alpha_beta(position, depth - 1, alpha, beta, False)[0]
+                reduction = 0
+                if (futile or reduce) and moves_searched and move >> 15 <= 1 and move >> 12 & 7 == 0 and not position.is_check():
+                    if futile:
+                        position.unmake_move(move)
+                        continue
+                    if moves_searched >= 3:
+                        reduction = 2 if depth >= 5 and moves_searched >= 6 else 1
+                if reduction:
+                    child_value = self.alpha_beta(position, depth - 1 - reduction, alpha, alpha + 1, False)[0]
+                if not reduction or child_value > alpha: # Not reduced or the reduced search failed high
+                    if pvs and moves_searched:
+                        child_value = self.alpha_beta(position, depth - 1, alpha, alpha + 1, False)[0]
+                        if alpha < child_value < beta: # Fail high, the move may be better
+                            child_value = self.alpha_beta(position, depth - 1, alpha, beta, False)[0]
+                    else:
+                        child_value = self.alpha_beta(position, depth - 1, alpha, beta, False)[0]
+                moves_searched += 1
+                position.unmake_move(move)
+                self.following_pv = False
+                if self.stopped: # (At the root best_move is the best of the moves searched before the stop)
+                    return 0, best_move
                 if child_value > value1:
                     # If we can improve the best value, then we have found a better move in the child values
                     value1 = child_value
                     best_move = move
-                position.unmake_move(move)
+                    if value1 > alpha and ply < max_search_ply: # Inside the window, its line is the principal variation
+                        self.pv_table[ply] = (move,) + self.pv_table[ply + 1]
                 if value1 >= beta:
                     # If our best move is better than the best in another set of moves that lead from a different 
                     # move from opponent, then opponent will choose the other move. So theres no need to calculate in this set
                     # of child values anymore.
+                    self.store_cutoff(position, move, depth, moves_searched)
                     break 
                 alpha = max(alpha, value1) 
 
         else:  # If opponent has to move
-            for move in itertools.chain(capture_moves, non_capture_moves):
+            for move in moves:
                 position.move(move)
-                child_value = self.alpha_beta(position, depth - 1, alpha, beta, True)[0]
+                reduction = 0
+                if (futile or reduce) and moves_searched and move >> 15 <= 1 and move >> 12 & 7 == 0 and not position.is_check():
+                    if futile:
+                        position.unmake_move(move)
+                        continue
+                    if moves_searched >= 3:
+                        reduction = 2 if depth >= 5 and moves_searched >= 6 else 1
+                if reduction:
+                    child_value = self.alpha_beta(position, depth - 1 - reduction, beta - 1, beta, True)[0]
+                if not reduction or child_value < beta: # Not reduced or the reduced search failed low
+                    if pvs and moves_searched:
+                        child_value = self.alpha_beta(position, depth - 1, beta - 1, beta, True)[0]
+                        if alpha < child_value < beta: # Fail low, the move may be better for the opponent
+                            child_value = self.alpha_beta(position, depth - 1, alpha, beta, True)[0]
+                    else:
+                        child_value = self.alpha_beta(position, depth - 1, alpha, beta, True)[0]
+                moves_searched += 1
+                position.unmake_move(move) 
+                self.following_pv = False
+                if self.stopped:
+                    return 0, best_move
                 if child_value < value2:
                     value2 = child_value
                     best_move = move
-                position.unmake_move(move) 
+                    if value2 < beta and ply < max_search_ply:
+                        self.pv_table[ply] = (move,) + self.pv_table[ply + 1]
                 if alpha >= value2:
                     # If opponent's best move is better than the best in another set of moves that lead from a different 
                     # move (parent2) from us, then we will choose the other move (parent2). So there's no need to calculate in
                     # this set of child moves any more.
+                    self.store_cutoff(position, move, depth, moves_searched)
                     break             
                 beta = min(beta, value2)
-        # If we have reached quisence search and there are no captures
-
-        if best_move == None and depth <= 0:
-            return self.evaluation_func(position), 0
-        
         # If we reach a position where game has ended
 
         if best_move == None and not is_check:  # Stalemate (There are no captures or non captures and no checks)
@@ -2096,24 +2290,443 @@ class Engine:
         else:
             x = value2
 
+        if x >= beta_start: # There was a cutoff, the value is at least x
+            bound = LOWER
+        elif x <= alpha_start: # All moves failed low, the value is at most x
+            bound = UPPER
+        else:
+            bound = EXACT
+        self.hash_table.store(position.zobrist_key, depth, bound, x, best_move)
+
         return (x, best_move)
 
-    def Search(self, position, time_left):
+    def quiescence(self, position, alpha, beta, our_turn):
+        '''
+        Search only captures until the position is quiet, so we don't evaluate in the middle of an exchange. The side to move 
+        can stand pat (keep the static evaluation) instead of capturing, unless it is in check, then all the evasions are searched.
+        Captures are searched in MVV-LVA order (most valuable victim first, and among those the least valuable attacker first).
+        Returns the score from the engine's point of view, like alpha_beta.
+        '''
+        self.nodes += 1
+        self.quiescence_nodes += 1
+        if self.nodes % self.time_check_nodes == 0 and (time.time() > self.deadline or self.stop_event is not None and self.stop_event.is_set()):
+            self.stopped = True
+        if self.stopped:
+            return 0
+        is_check = position.is_check()
+        if is_check:
+            moves = position.in_check_captures()
+            moves.extend(position.in_check_moves())
+            if not moves: # Checkmate
+                return -10003 if our_turn else 10003
+            value = -10004 if our_turn else 10004
+        else:
+            # Stand pat, if the evaluation is already outside the window the side to move doesn't need to capture
+            stand_pat = value = self.evaluation_func(position)
+            if our_turn:
+                if value >= beta:
+                    return value
+                alpha = max(alpha, value)
+            else:
+                if value <= alpha:
+                    return value
+                beta = min(beta, value)
+            moves = order_captures(position, position.capture_moves())
+
+        for move in moves:
+            if not is_check and not move >> 12 & 7: # Promotions are never pruned
+                captured_value = piece_values[(move >> 15) - 7]
+                # Delta pruning, even winning the captured piece (and delta_margin for the position) doesn't reach the window
+                if self.delta_pruning:
+                    if our_turn and stand_pat + captured_value + self.delta_margin <= alpha:
+                        continue
+                    if not our_turn and stand_pat - captured_value - self.delta_margin >= beta:
+                        continue
+                # SEE pruning, captures that lose material in the exchange
+                if self.see_pruning and is_losing_capture(position, move):
+                    continue
+            position.move(move)
+            child_value = self.quiescence(position, alpha, beta, not our_turn)
+            position.unmake_move(move)
+            if self.stopped:
+                return 0
+            if our_turn:
+                if child_value > value:
+                    value = child_value
+                    if value >= beta:
+                        break
+                    alpha = max(alpha, value)
+            else:
+                if child_value < value:
+                    value = child_value
+                    if value <= alpha:
+                        break
+                    beta = min(beta, value)
+        return value
+
+    def store_cutoff(self, position, move, depth, moves_searched):
+        '''
+        Called when a move caused a cutoff. If it is a quiet move (not a capture or promotion) we store it as the first killer 
+        of its ply and increase its history by depth squared, so moves that cut deep trees count more.
+        '''
+        self.cutoffs += 1
+        if moves_searched == 1:
+            self.first_move_cutoffs += 1
+        if self.quiet_move_ordering and move >> 15 <= 1 and move >> 12 & 7 == 0:
+            ply = position.ply - self.root_ply
+            if ply < max_search_ply:
+                killers = self.killers[ply]
+                if killers[0] != move:
+                    killers[1] = killers[0]
+                    killers[0] = move
+            self.history[move & 4095] += depth * depth
+
+    def age_move_ordering(self):
+        '''
+        Before a new search the killers are cleared (plies are counted from a different root) and the history is halved, so it
+        keeps some of what was learnt but adapts to the new position.
+        '''
+        for killers in self.killers:
+            killers[0] = 0
+            killers[1] = 0
+        history = self.history
+        for index in range(4096):
+            history[index] >>= 1
+
+    def Search(self, position, time_left = None, max_depth = 14, wtime = None, btime = None, winc = 0, binc = 0, movestogo = None):
+        '''
+        Iterative deepening search. Either time_left is the time for this move, or the clocks are given (wtime and btime the 
+        time left, winc and binc the increments and movestogo the moves until the next time control, all in seconds) and the 
+        TimeManager decides how long to think.
+        '''
         # alpha is the current best evaluation for white, it will start at -1000
         # beta is the current best evaluation for black, it will start at +1000
         start_time = time.time()
-        time_for_move = self.TimeManager(position, time_left)
-        best_move = None
-        alpha = -10005
-        beta = 10005
-        for depth in range(1,15):
+        self.hash_table.new_search()
+        self.age_move_ordering()
+        self.root_ply = position.ply
+        self.time_manager = self.TimeManager(position, time_left, wtime, btime, winc, binc, movestogo)
+        self.last_best_move = None # The best move of a previous search may not be legal in this position
+        self.pv = []
+        self.iterations = []
+        self.stopped = False
+        self.deadline = start_time + self.time_manager.hard_limit
+        if self.workers > 1 and not self.root_split:
+            helpers = self.start_helpers(position, max_depth)
+        best_value = 0
+        completed_depth = 0
+        iteration_times = []
+        for depth in range(1, max_depth + 1):
+            if depth > 1:
+                # Each iteration is expected to take as many times longer than the previous one as that one took compared to the 
+                # one before (the effective branching factor), if it wouldn't finish in time we don't start it
+                branching_factor = iteration_times[-1] / iteration_times[-2] if len(iteration_times) > 1 and iteration_times[-2] > 0 else 4
+                if not self.time_manager.start_iteration(time.time() - start_time, iteration_times[-1] * branching_factor):
+                    break
+            iteration_start = time.time()
             self.current_depth = depth
-            best_value, best_move = self.alpha_beta(position, depth, alpha, beta, our_turn = True)
-            self.last_best_move = best_move
-            if time.time() - start_time > time_left:
+            if self.aspiration_window is None or depth == 1:
+                alpha = -10005
+                beta = 10005
+            else: # Aspiration window around the previous score
+                alpha = max(best_value - self.aspiration_window, -10005)
+                beta = min(best_value + self.aspiration_window, 10005)
+            delta = self.aspiration_window
+            while True:
+                if self.root_split:
+                    value, move = self.root_split_iteration(position, depth)
+                    break
+                self.following_pv = True
+                value, move = self.alpha_beta(position, depth, alpha, beta, our_turn = True)
+                # If the score is outside the window it is only a bound (and the move may not be the best), so we widen the window
+                # on the side it failed and search again
+                if self.stopped:
+                    break
+                if value <= alpha and alpha > -10005:
+                    alpha = max(value - delta, -10005)
+                elif value >= beta and beta < 10005:
+                    beta = min(value + delta, 10005)
+                else:
+                    break
+                delta *= 2
+            if self.stopped: # The iteration didn't finish, we keep the result of the previous one
+                if self.last_best_move is None: # Unless it was the first, then we play the best move searched or the first move
+                    self.last_best_move = move or next(iter(MovePicker(position, position.is_check())), None)
+                    self.pv = [self.last_best_move] if self.last_best_move else []
                 break
+            best_value = value
+            self.last_best_move = move
+            if not move: # No legal moves (mate or stalemate)
+                self.pv = []
+            else:
+                self.pv = list(self.pv_table[0]) if self.pv_table[0] and self.pv_table[0][0] == move else [move]
+            self.iterations.append((depth, value, self.pv, time.time() - start_time))
+            if self.on_iteration is not None:
+                self.on_iteration(self.iterations[-1])
+            completed_depth = depth
+            iteration_times.append(time.time() - iteration_start)
+            self.time_manager.update(move, value)
+
+        if self.workers > 1 and not self.root_split:
+            for depth, value, move, pv in self.stop_helpers(helpers):
+                if depth > completed_depth: # A helper completed a deeper iteration, it becomes our last one
+                    completed_depth, best_value, self.last_best_move, self.pv = depth, value, move, pv
+                    self.iterations.append((depth, value, pv, time.time() - start_time))
+                    if self.on_iteration is not None:
+                        self.on_iteration(self.iterations[-1])
+        return ["Time taken:", time.time() - start_time, "seconds", "Best move: ", self.last_best_move, "Evaluation: ", best_value, 'Depth:', completed_depth,
+                'Principal variation:', self.pv]
+
+    def start_helpers(self, position, max_depth):
+        '''
+        Start the Lazy SMP helper processes on the position, they search until stop_helpers is called (or the deadline). They
+        have their own stop event, self.stop_event stops the main search which then stops them.
+        '''
+        context = multiprocessing.get_context()
+        stop_event = context.Event()
+        results = context.Queue()
+        processes = []
+        for worker in range(1, self.workers):
+            process = context.Process(target = lazy_smp_helper, args = (worker, position.state(), self.evaluation_func, self.options, 
+                                      self.hash_table.name, self.hash_table.age, self.deadline, max_depth, stop_event, results), daemon = True)
+            process.start()
+            processes.append(process)
+        return processes, results, stop_event
+
+    def stop_helpers(self, helpers):
+        '''
+        Stop the helpers and return the (depth, score, best move, principal variation) of their last completed iterations.
+        '''
+        processes, results, stop_event = helpers
+        stop_event.set()
+        for process in processes:
+            process.join()
+        helper_results = []
+        self.helper_nodes = 0
+        while not results.empty(): # (A helper that failed doesn't put a result)
+            depth, value, move, pv, nodes = results.get()
+            helper_results.append((depth, value, move, pv))
+            self.helper_nodes += nodes
+        return helper_results
+
+    def root_split_iteration(self, position, depth):
+        '''
+        Search every root move to depth - 1 in the process pool and return (score, best move) like alpha_beta at the root. The 
+        position is sent as its state. Each move is searched with a window starting just below the best score found so far 
+        (shared in root_bound), so a move that ties with it still gets its exact score. Then the merge in move order (the 
+        previous best move first) doesn't depend on which worker finished first. The workers don't see self.stop_event, when
+        it is set we change root_generation, which stops the tasks of this iteration.
+        '''
+        if self.pool is None:
+            context = multiprocessing.get_context()
+            self.root_bound = context.Value('i', -10005)
+            self.root_generation = context.Value('i', 0, lock = False) # (Changed under the bound's lock)
+            self.pool = ProcessPoolExecutor(self.workers, context, initializer = root_split_worker_init, 
+                                            initargs = (self.evaluation_func, self.options, self.root_bound, self.root_generation))
+        if position.is_check():
+            moves = position.in_check_captures() + list(position.in_check_moves())
+        else:
+            moves = position.capture_moves() + list(position.non_capture_moves())
+        if not moves:
+            return (-10003 if position.is_check() else 0), 0
+        if self.pv and self.pv[0] in moves:
+            moves.remove(self.pv[0])
+            moves.insert(0, self.pv[0])
+        with self.root_bound.get_lock():
+            self.root_bound.value = -10005
+            self.root_generation.value += 1
+            generation = self.root_generation.value
+        state = position.state()
+        futures = [self.pool.submit(root_split_task, state, move, depth, self.deadline, generation, self.hash_table.age) for move in moves]
+        best_value = -10004
+        best_move = 0
+        for move, future in zip(moves, futures):
+            while not future.done() and not (self.stop_event is not None and self.stop_event.is_set()):
+                wait((future,), 0.05)
+            result, nodes = future.result() if future.done() else (None, 0)
+            self.nodes += nodes
+            if result is None: # The deadline was reached or the search stopped, the moves not started yet are not searched
+                self.stopped = True
+                with self.root_bound.get_lock():
+                    self.root_generation.value += 1 # Stops the running tasks
+                for future in futures:
+                    future.cancel()
+                break
+            value, alpha, pv = result
+            if alpha < value and value > best_value: # (A score not above its alpha is only an upper bound)
+                best_value = value
+                best_move = move
+                self.pv_table[0] = (move,) + pv
+        return best_value, best_move
+
+    def close(self):
+        '''
+        Free the shared memory of the transposition table (only needed with workers > 1) and shut down the root split pool.
+        An Engine can also be used in a with statement, which closes it.
+        '''
+        self.hash_table.close()
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    def TimeManager(self, position, time_left, wtime = None, btime = None, winc = 0, binc = 0, movestogo = None):
+        '''
+        The TimeManager of a search, with the clock of the side to move if the clocks were given (both of them, like in UCI), 
+        otherwise with time_left for the move (no time limit if neither is given).
+        '''
+        if (wtime is None) != (btime is None): # (Otherwise with only the opponent's clock we would search without a time limit)
+            raise ValueError('wtime and btime must be given together')
+        clock = wtime if position.turn else btime
+        if clock is not None:
+            return TimeManager(clock, winc if position.turn else binc, movestogo)
+        return TimeManager.move_time(float('inf') if time_left is None else time_left)
+
+
+class BackgroundSearch:
+    '''
+    Engine.Search running in a thread, so the caller (a GUI event loop, a server) keeps running while the engine thinks. The
+    search is on a copy of the position. Each completed iteration (depth, score, principal variation, time) is passed to 
+    callback (called in the search thread) and put in the asyncio queue, then None is put in the queue when the search ends.
+    A ponder search, on the position after the reply we expect, thinks without a time limit until ponderhit gives it the time
+    for the move (if the opponent played the expected move) or stop (if not).
+    '''
+    def __init__(self, engine, position, time_left = None, max_depth = 14, callback = None, queue = None, ponder = False, **clock):
+        '''
+        The clock arguments are the ones of Engine.Search (wtime, btime, winc, binc, movestogo). With a queue it must be created
+        in a running event loop.
+        '''
+        self.engine = engine
+        self.callback = callback
+        self.queue = queue
+        self.loop = asyncio.get_running_loop() if queue is not None else None
+        self.pondering = ponder
+        self.timer = None
+        self.search_result = None
+        self.stop_event = threading.Event()
+        engine.stop_event = self.stop_event
+        engine.on_iteration = self.on_iteration
+        if ponder:
+            time_left = None
+            clock = {}
+        self.thread = threading.Thread(target = self.run, args = (position_from_state(position.state()), time_left, max_depth, clock), 
+                                       daemon = True)
+        self.thread.start()
+
+    def run(self, position, time_left, max_depth, clock):
+        try:
+            self.search_result = self.engine.Search(position, time_left, max_depth, **clock)
+        finally:
+            self.engine.stop_event = None
+            self.engine.on_iteration = None
+            if self.timer is not None:
+                self.timer.cancel()
+            if self.queue is not None:
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+    def on_iteration(self, iteration):
+        if self.callback is not None:
+            self.callback(iteration)
+        if self.queue is not None:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, iteration)
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    def result(self, timeout = None):
+        '''
+        Wait for the search to end and return what Engine.Search returned (None if it is still running after timeout seconds).
+        '''
+        self.thread.join(timeout)
+        return self.search_result
 
-        return ["Time taken:", time.time() - start_time, "seconds", "Best move: ", self.last_best_move, "Evaluation: ", best_value, 'Depth:', depth]
+    def stop(self):
+        '''
+        Stop the search and return its result, the best move of its last completed iteration.
+        '''
+        self.stop_event.set()
+        return self.result()
+
+    def ponderhit(self, time_left):
+        '''
+        The opponent played the move we pondered on: the search goes on for time_left more seconds (it keeps the iterations
+        completed while pondering).
+        '''
+        self.pondering = False
+        self.timer = threading.Timer(time_left, self.stop)
+        self.timer.daemon = True
+        self.timer.start()
 
-    def TimeManager(self, position, time_left):
-        return 5
+
+def lazy_smp_helper(worker, state, evaluation_func, options, hash_name, hash_age, deadline, max_depth, stop_event, results):
+    '''
+    A Lazy SMP helper process: search the position with the shared transposition table until stop_event is set and put 
+    (depth, score, best move, principal variation, nodes) of the last completed iteration in results.
+    '''
+    random.seed(worker)
+    engine = Engine(evaluation_func, hash_name = hash_name, **options)
+    engine.hash_table.age = hash_age - 1 # (Search starts a new age, the same as the main search's)
+    engine.history = [random.randrange(64) for _ in range(4096)] # Each helper orders the quiet moves differently
+    engine.stop_event = stop_event
+    with engine:
+        result = engine.Search(position_from_state(state), max(deadline - time.time(), 0), max_depth)
+    results.put((result[8], result[6], result[4], result[10], engine.nodes))
+
+
+# Engine and shared bound of a root split worker process, set by root_split_worker_init when the pool starts it
+root_split_engine = None
+root_split_bound = None
+root_split_generation = None
+
+def root_split_worker_init(evaluation_func, options, bound, generation):
+    global root_split_engine, root_split_bound, root_split_generation
+    root_split_engine = Engine(evaluation_func, **options)
+    root_split_bound = bound
+    root_split_generation = generation
+
+class RootSplitStop:
+    '''
+    The stop event of a root split task's search: it is set once the main process has changed the generation.
+    '''
+    def __init__(self, generation):
+        self.generation = generation
+
+    def is_set(self):
+        return root_split_generation.value != self.generation
+
+def root_split_task(state, move, depth, deadline, generation, hash_age):
+    '''
+    Search a root move of the position with this state to depth - 1 in a root split worker. Returns ((score, alpha, principal
+    variation after the move), nodes), or (None, nodes) if the deadline was reached or the iteration stopped (its generation is
+    not the current one). A better score is shared in the bound. hash_age is the age of the main search's transposition table,
+    the first task of each search ages the worker's tables like Search does.
+    '''
+    if time.time() > deadline or root_split_generation.value != generation:
+        return None, 0
+    engine = root_split_engine
+    if engine.hash_table.age != hash_age:
+        engine.hash_table.new_search()
+        engine.hash_table.age = hash_age
+        engine.age_move_ordering()
+    engine.stop_event = RootSplitStop(generation)
+    position = position_from_state(state)
+    engine.root_ply = position.ply
+    position.move(move)
+    engine.current_depth = depth
+    engine.deadline = deadline
+    engine.stopped = False
+    engine.following_pv = False
+    engine.nodes = 0
+    alpha = root_split_bound.value - 1
+    value = engine.alpha_beta(position, depth - 1, alpha, 10005, False)[0]
+    if engine.stopped:
+        return None, engine.nodes
+    with root_split_bound.get_lock():
+        if value > root_split_bound.value and root_split_generation.value == generation: # (Otherwise the next iteration may be using the bound)
+            root_split_bound.value = int(value)
+    return (value, alpha, engine.pv_table[1]), engine.nodes
@@ -0,0 +1,645 @@
+###################################
+# Benchmarks for the move generator and the search
+###################################
+
+import os
+import sys
+import time
+import random
+import tempfile
+import tracemalloc
+import subprocess
+from array import array
+
+from BitPosition import *
+from bit_operations import get_set_bit_indices, find_least_significant_bit_set, has_one_one, count_bits
+
+benchmark_fens = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', # Initial position
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', # Kiwipete
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+]
+
+pawn_heavy_fens = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    '4k3/pppppppp/8/8/8/8/PPPPPPPP/4K3 w - - 0 1',
+    '4k3/1p1p1ppp/p1p1p3/P1P1P3/1P1P4/5PPP/8/4K3 w - - 0 1',
+    '8/PPPk4/8/8/8/8/4Kppp/8 w - - 0 1',
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+]
+
+# Endgames where most moves are king moves
+king_walk_fens = [
+    '8/8/4k3/8/2K5/8/8/8 w - - 0 1',
+    '8/8/3k4/8/8/4K3/8/7R w - - 0 1',
+    '8/5k2/8/8/8/2B5/3KN3/8 w - - 0 1',
+    '8/8/8/3k4/8/8/2p5/2K2Q2 b - - 0 1',
+    '8/3k4/8/2p1p3/2P1P3/8/3K4/8 w - - 0 1',
+]
+
+# Quiet positions the search can reach depth 4 on in a few seconds, and roots without legal moves
+search_fens = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    '4k3/pppppppp/8/8/8/8/PPPPPPPP/4K3 w - - 0 1',
+    'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3',
+    '7k/5Q2/6K1/8/8/8/8/8 b - - 0 1', # Stalemate, the search returns no move
+    '7k/6Q1/6K1/8/8/8/8/8 b - - 0 1', # Mated
+]
+
+# Tactics (mates and won material) with their best move, all solved at depth 4 without pruning
+tactic_positions = [
+    ('6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1', 'a1a8'),
+    ('rnb1kbnr/pppp1ppp/8/4p3/4P2q/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3', 'f3h4'),
+    ('2q1k3/8/8/8/4N3/8/8/4K3 w - - 0 1', 'e4d6'),
+    ('rnbqkbnr/pppp1ppp/8/4p3/6P1/5P2/PPPPP2P/RNBQKBNR b KQkq - 0 2', 'd8h4'),
+    ('r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4', 'h5f7'),
+    ('6k1/pp4pp/8/8/8/8/r4PPP/3R2K1 w - - 0 1', 'd1d8'),
+]
+
+def position_from_fen(fen):
+    '''
+    Create a BitPosition from the first four fields of a fen (a1 = 0, h8 = 63).
+    '''
+    pieces = 'PNBRQKpnbrqk'
+    fen_board, turn, castling_rights, ep_square = fen.split()[:4]
+    bitboards = [0] * 12
+    for row, fen_row in enumerate(fen_board.split('/')):
+        col = 0
+        for char in fen_row:
+            if char.isdigit():
+                col += int(char)
+            else:
+                bitboards[pieces.index(char)] |= 1 << ((7 - row) * 8 + col)
+                col += 1
+    passant_square = -1 if ep_square == '-' else (int(ep_square[1]) - 1) * 8 + ord(ep_square[0]) - ord('a')
+    return BitPosition(bitboards, turn = turn == 'w', wc = ['K' in castling_rights, 'Q' in castling_rights],
+                       bc = ['k' in castling_rights, 'q' in castling_rights], passant_square = passant_square)
+
+def legal_moves(bitposition):
+    if not bitposition.is_check():
+        return list(bitposition.capture_moves()) + list(bitposition.non_capture_moves())
+    return list(bitposition.in_check_captures()) + list(bitposition.in_check_moves())
+
+def count_nodes(bitposition, depth):
+    if depth == 0:
+        return 1
+    count = 0
+    for move in legal_moves(bitposition):
+        bitposition.move(move)
+        count += count_nodes(bitposition, depth - 1)
+        bitposition.unmake_move(move)
+    return count
+
+def count_nodes_move_array(bitposition, depth):
+    '''
+    Same as count_nodes but keeping the move list of each node in an array('I') of packed moves.
+    '''
+    if depth == 0:
+        return 1
+    count = 0
+    for move in array('I', legal_moves(bitposition)):
+        bitposition.move(move)
+        count += count_nodes_move_array(bitposition, depth - 1)
+        bitposition.unmake_move(move)
+    return count
+
+def perft_nodes_per_second(fens, depth, count_function = count_nodes):
+    nodes = 0
+    start_time = time.time()
+    for fen in fens:
+        nodes += count_function(position_from_fen(fen), depth)
+    time_taken = time.time() - start_time
+    return {'Nodes': nodes, 'Time taken': time_taken, 'Nodes per second': nodes / time_taken}
+
+def benchmark_move_generation(fens, depth, repeats = 5):
+    '''
+    Generate the legal moves of each node up to depth (excluding the leaves), repeats times, timing only the generators. 
+    Returns the number of nodes generated per second.
+    '''
+    generated = 0
+    time_taken = 0
+    def walk(bitposition, depth):
+        nonlocal generated, time_taken
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            moves = legal_moves(bitposition)
+        time_taken += time.perf_counter() - start_time
+        generated += repeats
+        if depth > 1:
+            for move in moves:
+                bitposition.move(move)
+                walk(bitposition, depth - 1)
+                bitposition.unmake_move(move)
+    for fen in fens:
+        walk(position_from_fen(fen), depth)
+    return {'Nodes generated': generated, 'Time taken': time_taken, 'Nodes generated per second': generated / time_taken}
+
+def collect_bitboards(bitposition, depth, bitboards):
+    '''
+    Store a copy of the bitboards of every node in the tree up to depth.
+    '''
+    bitboards.append(list(bitposition.bitboard))
+    if depth == 0:
+        return bitboards
+    for move in legal_moves(bitposition):
+        bitposition.move(move)
+        collect_bitboards(bitposition, depth - 1, bitboards)
+        bitposition.unmake_move(move)
+    return bitboards
+
+def collect_positions(bitposition, depth, positions):
+    '''
+    Store a new BitPosition (pieces and side to move) for every node in the tree up to depth.
+    '''
+    positions.append(BitPosition(list(bitposition.bitboard), bitposition.turn))
+    if depth == 0:
+        return positions
+    for move in legal_moves(bitposition):
+        bitposition.move(move)
+        collect_positions(bitposition, depth - 1, positions)
+        bitposition.unmake_move(move)
+    return positions
+
+######################################################
+# Slider lookups: dictionaries vs magic bitboards
+######################################################
+
+def dictionary_slider_tables(unfull_rays, magic_table, magic_numbers, magic_shifts):
+    '''
+    The slider lookup the magic tables replaced: for each square a dictionary from the blockers on its unfull rays to the valid
+    moves. Every subset of the rays is enumerated with the carry-rippler trick and its moves are read from the magic table.
+    '''
+    tables = []
+    for square in range(64):
+        table = {}
+        rays = unfull_rays[square]
+        blockers_bit = 0
+        while True:
+            table[blockers_bit] = magic_table[square][((blockers_bit * magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> magic_shifts[square]]
+            blockers_bit = (blockers_bit - rays) & rays
+            if blockers_bit == 0:
+                break
+        tables.append(table)
+    return tables
+
+def benchmark_slider_lookups(fens, depth = 2):
+    '''
+    For every node up to depth we look up the moves of all sliders and the slider rays from both kings (as the move generator
+    does), once with dictionary tables and once with the magic tables. Returns the nodes per second of each backend.
+    '''
+    long_precomputed_rook_table = dictionary_slider_tables(rook_unfull_rays, rook_magic_table, rook_magic_numbers, rook_magic_shifts)
+    long_precomputed_bishop_table = dictionary_slider_tables(bishop_unfull_rays, bishop_magic_table, bishop_magic_numbers, bishop_magic_shifts)
+    nodes = []
+    for fen in fens:
+        collect_bitboards(position_from_fen(fen), depth, nodes)
+
+    rook_probes = []
+    bishop_probes = []
+    for bitboard in nodes:
+        all_pieces_bit = 0
+        for piece_bit in bitboard:
+            all_pieces_bit |= piece_bit
+        for square in get_set_bit_indices(bitboard[3] | bitboard[4] | bitboard[5] | bitboard[9] | bitboard[10] | bitboard[11]):
+            rook_probes.append((square, all_pieces_bit))
+        for square in get_set_bit_indices(bitboard[2] | bitboard[4] | bitboard[5] | bitboard[8] | bitboard[10] | bitboard[11]):
+            bishop_probes.append((square, all_pieces_bit))
+
+    start_time = time.time()
+    for square, all_pieces_bit in rook_probes:
+        long_precomputed_rook_table[square][rook_unfull_rays[square] & all_pieces_bit]
+    for square, all_pieces_bit in bishop_probes:
+        long_precomputed_bishop_table[square][bishop_unfull_rays[square] & all_pieces_bit]
+    dict_time = time.time() - start_time
+
+    start_time = time.time()
+    for square, all_pieces_bit in rook_probes:
+        rook_magic_table[square][(((rook_unfull_rays[square] & all_pieces_bit) * rook_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> rook_magic_shifts[square]]
+    for square, all_pieces_bit in bishop_probes:
+        bishop_magic_table[square][(((bishop_unfull_rays[square] & all_pieces_bit) * bishop_magic_numbers[square]) & 0xFFFFFFFFFFFFFFFF) >> bishop_magic_shifts[square]]
+    magic_time = time.time() - start_time
+
+    lookups = len(rook_probes) + len(bishop_probes)
+    return {'Nodes': len(nodes), 'Lookups': lookups,
+            'Dictionary nodes per second': len(nodes) / dict_time, 'Magic nodes per second': len(nodes) / magic_time,
+            'Dictionary lookups per second': lookups / dict_time, 'Magic lookups per second': lookups / magic_time}
+
+
+######################################################
+# King move legality: king_is_safe vs attacked_squares
+######################################################
+
+def benchmark_king_moves(fens, depth = 3, repeats = 5):
+    '''
+    For every node up to depth find the legal king moves (captures included), once calling king_is_safe on each destination
+    and once with a single AND against the attacked_squares bitboard. Returns the nodes per second of each.
+    '''
+    nodes = []
+    for fen in fens:
+        collect_positions(position_from_fen(fen), depth, nodes)
+
+    times = []
+    for use_attack_map in (False, True):
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            for bitposition in nodes:
+                bitposition.current_attacks = None
+                king_position = find_least_significant_bit_set(bitposition.bitboard[5 if bitposition.turn else 11])
+                destinations = king_moves[king_position] & ~(bitposition.white_pieces_bit if bitposition.turn else bitposition.black_pieces_bit)
+                if use_attack_map:
+                    safe_destinations = destinations & ~bitposition.attacked_squares()
+                else:
+                    safe_destinations = [destination for destination in get_set_bit_indices(destinations) if bitposition.king_is_safe(destination)]
+        times.append(time.perf_counter() - start_time)
+    calls = len(nodes) * repeats
+    return {'Nodes': len(nodes), 'king_is_safe nodes per second': calls / times[0], 'Attack map nodes per second': calls / times[1]}
+
+
+######################################################
+# Bit operations
+######################################################
+
+# The helpers utils had before bit_operations, they loop once per square
+def looping_get_set_bit_indices(bit):
+    index = 0
+    while bit:
+        if bit & 1:
+            yield index
+        index += 1
+        bit >>= 1
+
+def looping_find_least_significant_bit_set(bitboard):
+    if bitboard == 0:
+        return -1
+    position = 0
+    while (bitboard & 1) == 0:
+        bitboard >>= 1
+        position += 1
+    return position
+
+def looping_has_one_one(n):
+    count = 0
+    while n:
+        n &= (n - 1)
+        count += 1
+        if count > 1:
+            return False
+    return count == 1
+
+def looping_count_bits(n):
+    count = 0
+    while n:
+        n &= (n - 1)
+        count += 1
+    return count
+
+def benchmark_bit_operations(num_bitboards = 10000, seed = 0):
+    '''
+    Time per call (in nanoseconds) of the looping helpers and the bit_operations ones, on random sparse bitboards (around 8 
+    bits set, like the piece and move bitboards in the move generator).
+    '''
+    rng = random.Random(seed)
+    bitboards = [rng.getrandbits(64) & rng.getrandbits(64) & rng.getrandbits(64) for _ in range(num_bitboards)]
+    results = {}
+    for name, looping_function, function in (('get_set_bit_indices', lambda bit: list(looping_get_set_bit_indices(bit)), lambda bit: list(get_set_bit_indices(bit))),
+                                             ('find_least_significant_bit_set', looping_find_least_significant_bit_set, find_least_significant_bit_set),
+                                             ('has_one_one', looping_has_one_one, has_one_one),
+                                             ('count_bits', looping_count_bits, count_bits)):
+        times = []
+        for f in (looping_function, function):
+            start_time = time.perf_counter()
+            for bitboard in bitboards:
+                f(bitboard)
+            times.append((time.perf_counter() - start_time) / num_bitboards * 1e9)
+        results[name] = {'Looping ns per call': times[0], 'New ns per call': times[1], 'Speedup': times[0] / times[1]}
+    return results
+
+
+######################################################
+# Move encoding
+######################################################
+
+def benchmark_move_encoding(fens, depth = 2):
+    '''
+    Bytes allocated to hold the legal moves of every node up to depth as Move tuples, as a list of packed moves and as an 
+    array('I') of packed moves, and the perft nodes per second with lists and with arrays of packed moves.
+    '''
+    move_lists = []
+    def collect_moves(bitposition, depth):
+        moves = legal_moves(bitposition)
+        move_lists.append(moves)
+        if depth == 0:
+            return
+        for move in moves:
+            bitposition.move(move)
+            collect_moves(bitposition, depth - 1)
+            bitposition.unmake_move(move)
+    for fen in fens:
+        collect_moves(position_from_fen(fen), depth)
+
+    results = {'Nodes': len(move_lists), 'Moves': sum(len(moves) for moves in move_lists)}
+    for name, convert in (('Move tuples', lambda moves: [decode_move(move) for move in moves]),
+                          ('Packed list', lambda moves: [move + 0 for move in moves]), # move + 0 makes a new int, as the generators do
+                          ('Packed array', lambda moves: array('I', moves))):
+        tracemalloc.start()
+        stored = [convert(moves) for moves in move_lists]
+        results[name + ' bytes'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del stored
+    results['Perft list nodes per second'] = perft_nodes_per_second(fens, depth + 1)['Nodes per second']
+    results['Perft array nodes per second'] = perft_nodes_per_second(fens, depth + 1, count_nodes_move_array)['Nodes per second']
+    return results
+
+
+######################################################
+# Make and unmake
+######################################################
+
+def benchmark_make_unmake(fens, depth = 2, repeats = 10):
+    '''
+    Make and unmake every legal move of each node up to depth, repeats times, timing only the move and unmake_move calls.
+    Returns the number of make/unmake pairs per second.
+    '''
+    pairs = 0
+    time_taken = 0
+    def walk(bitposition, depth):
+        nonlocal pairs, time_taken
+        moves = legal_moves(bitposition)
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            for move in moves:
+                bitposition.move(move)
+                bitposition.unmake_move(move)
+        time_taken += time.perf_counter() - start_time
+        pairs += repeats * len(moves)
+        if depth > 1:
+            for move in moves:
+                bitposition.move(move)
+                walk(bitposition, depth - 1)
+                bitposition.unmake_move(move)
+    for fen in fens:
+        walk(position_from_fen(fen), depth)
+    return {'Make/unmake pairs': pairs, 'Time taken': time_taken, 'Pairs per second': pairs / time_taken}
+
+
+######################################################
+# Zobrist hashing
+######################################################
+
+def benchmark_zobrist(fens, depth = 2, repeats = 10):
+    '''
+    Keys per second computing the Zobrist key of every node up to depth from scratch, to compare with the make/unmake pairs 
+    per second (which keep the key up to date incrementally).
+    '''
+    nodes = []
+    for fen in fens:
+        collect_positions(position_from_fen(fen), depth, nodes)
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for bitposition in nodes:
+            position_to_zobrist_key(bitposition)
+    time_taken = time.perf_counter() - start_time
+    return {'Nodes': len(nodes), 'Full recompute keys per second': len(nodes) * repeats / time_taken}
+
+
+######################################################
+# Static exchange evaluation
+######################################################
+
+def benchmark_see(fens, depth = 2, repeats = 10):
+    '''
+    Calls per second of see on every capture, and of attackers_to on every destination square of a capture, of every node up 
+    to depth. Also returns how many of the captures lose material.
+    '''
+    captures = []
+    for fen in fens:
+        for bitposition in collect_positions(position_from_fen(fen), depth, []):
+            for move in bitposition.in_check_captures() if bitposition.is_check() else bitposition.capture_moves():
+                captures.append((bitposition, move))
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for bitposition, move in captures:
+            bitposition.see(move)
+    see_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for bitposition, move in captures:
+            bitposition.attackers_to(move >> 6 & 63, bitposition.all_pieces_bit)
+    attackers_time = time.perf_counter() - start_time
+    return {'Captures': len(captures), 'Losing captures': sum(bitposition.see(move) < 0 for bitposition, move in captures),
+            'see per second': len(captures) * repeats / see_time, 'attackers_to per second': len(captures) * repeats / attackers_time}
+
+
+######################################################
+# Search
+######################################################
+
+def position_and_engine(fen, **engine_options):
+    '''
+    The position of the fen and an Engine with the evaluation of its side to move, engine_options are passed to Engine.
+    '''
+    position = position_from_fen(fen)
+    return position, Engine(evaluation_function_white if position.turn else evaluation_function_black, **engine_options)
+
+def benchmark_search(fens, depth, **engine_options):
+    '''
+    Iterative deepening search up to depth on each position (with the evaluation of the side to move), engine_options are
+    passed to Engine. Returns the nodes searched (and how many in the quiescence search), the time taken, the transposition 
+    table hit rate, the rate of cutoffs on the first move searched and the best move of each position.
+    '''
+    nodes = 0
+    quiescence_nodes = 0
+    probes = 0
+    hits = 0
+    cutoffs = 0
+    first_move_cutoffs = 0
+    best_moves = []
+    start_time = time.time()
+    for fen in fens:
+        position, engine = position_and_engine(fen, **engine_options)
+        with engine:
+            best_moves.append(engine.Search(position, float('inf'), max_depth = depth)[4])
+            nodes += engine.nodes
+            quiescence_nodes += engine.quiescence_nodes
+            probes += engine.hash_table.probes
+            hits += engine.hash_table.hits
+            cutoffs += engine.cutoffs
+            first_move_cutoffs += engine.first_move_cutoffs
+    time_taken = time.time() - start_time
+    return {'Nodes': nodes, 'Quiescence nodes': quiescence_nodes, 'Time taken': time_taken, 'Nodes per second': nodes / time_taken, 'Hash hit rate': hits / probes if probes else 0,
+            'First move cutoff rate': first_move_cutoffs / cutoffs if cutoffs else 0,
+            'Best moves': [decode_move(move) if move else move for move in best_moves]}
+
+def benchmark_tactics(positions, depth, **engine_options):
+    '''
+    Search each (fen, best move) position up to depth, engine_options are passed to Engine. Returns how many best moves were
+    found, the nodes searched and the time taken, to check that pruning saves nodes without missing tactics.
+    '''
+    squares = [file + rank for rank in '12345678' for file in 'abcdefgh']
+    solved = 0
+    nodes = 0
+    start_time = time.time()
+    for fen, best_move in positions:
+        position, engine = position_and_engine(fen, **engine_options)
+        with engine:
+            move = decode_move(engine.Search(position, float('inf'), max_depth = depth)[4])
+            solved += squares[move.i] + squares[move.j] == best_move
+            nodes += engine.nodes
+    return {'Solved': solved, 'Positions': len(positions), 'Nodes': nodes, 'Time taken': time.time() - start_time}
+
+
+def benchmark_lazy_smp(fens, depth, worker_counts = (1, 2, 4, 8)):
+    '''
+    Time to reach depth on the positions with each number of Lazy SMP workers, with the nodes of the main search and of the
+    helpers. The time includes starting the helper processes.
+    '''
+    results = {}
+    for workers in worker_counts:
+        nodes = 0
+        helper_nodes = 0
+        start_time = time.time()
+        for fen in fens:
+            position, engine = position_and_engine(fen, workers = workers)
+            with engine:
+                engine.Search(position, float('inf'), max_depth = depth)
+                nodes += engine.nodes
+                helper_nodes += engine.helper_nodes
+        results[workers] = {'Time to depth': time.time() - start_time, 'Main search nodes': nodes, 'Helper nodes': helper_nodes}
+    return results
+
+def benchmark_root_split(fens, depth, worker_counts = (1, 2, 4, 8)):
+    '''
+    Wall clock time at which each depth was completed (summed over the positions) with the root moves split over each number
+    of workers (1 is the normal search). The pool is started before the timing.
+    '''
+    results = {}
+    for workers in worker_counts:
+        depth_times = [0] * depth
+        nodes = 0
+        for fen in fens:
+            position, engine = position_and_engine(fen, workers = workers, root_split = True)
+            with engine:
+                engine.Search(position, float('inf'), max_depth = 1)
+                engine.nodes = 0
+                engine.Search(position, float('inf'), max_depth = depth)
+                for iteration_depth, _, _, iteration_time in engine.iterations:
+                    depth_times[iteration_depth - 1] += iteration_time
+                nodes += engine.nodes
+        results[workers] = {'Time per depth': depth_times, 'Nodes': nodes}
+    return results
+
+def benchmark_time_control(fens, budgets = (0.05, 0.2, 1)):
+    '''
+    Search each position with each time budget (in seconds) and no depth limit, returns for every budget the longest time a
+    search took, how much that is over the budget and the depths reached.
+    '''
+    results = {}
+    for time_left in budgets:
+        times = []
+        depths = []
+        for fen in fens:
+            position, engine = position_and_engine(fen)
+            with engine:
+                result = engine.Search(position, time_left)
+                times.append(result[1])
+                depths.append(result[8])
+        results[time_left] = {'Longest search': max(times), 'Overrun': max(times) - time_left, 'Depths': depths}
+    return results
+
+
+def benchmark_clock(fens, clocks = ((1, 0, None), (10, 0.1, None), (30, 0, 40))):
+    '''
+    Search each position as if the side to move had clock = (time left, increment, moves to go), returns for every clock the 
+    soft and hard limits of the TimeManager and the time each search took and the depth it reached.
+    '''
+    results = {}
+    for time_left, increment, moves_to_go in clocks:
+        times = []
+        depths = []
+        for fen in fens:
+            position, engine = position_and_engine(fen)
+            with engine:
+                result = engine.Search(position, wtime = time_left, btime = time_left, winc = increment, binc = increment, movestogo = moves_to_go)
+                times.append(result[1])
+                depths.append(result[8])
+        results[(time_left, increment, moves_to_go)] = {'Soft limit': engine.time_manager.soft_limit, 'Hard limit': engine.time_manager.hard_limit,
+                                                        'Times': times, 'Depths': depths}
+    return results
+
+def benchmark_background_search(fens, think_time = 1, frame_time = 0.01, **engine_options):
+    '''
+    Search each position in a BackgroundSearch while this thread runs a frame loop (like the GUI's) for think_time seconds, 
+    then stop it. Returns the longest frame (the GUI freezes for that long), how long stop took and the depths reached.
+    '''
+    frames = []
+    stop_times = []
+    depths = []
+    for fen in fens:
+        position, engine = position_and_engine(fen, **engine_options)
+        with engine:
+            search = BackgroundSearch(engine, position)
+            start_time = time.time()
+            frame_start = start_time
+            while time.time() - start_time < think_time:
+                time.sleep(frame_time)
+                frames.append(time.time() - frame_start)
+                frame_start = time.time()
+            stop_start = time.time()
+            result = search.stop()
+            stop_times.append(time.time() - stop_start)
+            depths.append(result[8])
+    return {'Longest frame': max(frames), 'Longest stop': max(stop_times), 'Depths': depths}
+
+
+######################################################
+# Startup
+######################################################
+
+def benchmark_import_time():
+    '''
+    Time importing BitPosition in a new interpreter, first without the attack tables cache (they are built and written) and 
+    then with the cache that the first import wrote.
+    '''
+    source_path = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, '-c', 'import time; start_time = time.time(); import BitPosition; print(time.time() - start_time)']
+    with tempfile.TemporaryDirectory() as directory:
+        environment = dict(os.environ, BITPOSITION_TABLES = os.path.join(directory, 'attack_tables.bin'))
+        times = [float(subprocess.run(command, cwd = source_path, env = environment, capture_output = True, text = True, check = True).stdout) 
+                 for _ in range(2)]
+    return {'Import time without cache': times[0], 'Import time with cache': times[1]}
+
+
+if __name__ == '__main__':
+    print('Startup:', benchmark_import_time())
+    print('Bit operations:', benchmark_bit_operations())
+    print('Slider lookups:', benchmark_slider_lookups(benchmark_fens))
+    print('Move encoding:', benchmark_move_encoding(benchmark_fens))
+    print('Make/unmake:', benchmark_make_unmake(benchmark_fens))
+    print('Zobrist:', benchmark_zobrist(benchmark_fens))
+    print('Perft depth 3:', perft_nodes_per_second(benchmark_fens, 3))
+    print('SEE:', benchmark_see(benchmark_fens))
+    print('Search depth 3:', benchmark_search(search_fens, 3))
+    print('Search depth 3 without PVS and aspiration windows:', benchmark_search(search_fens, 3, pvs = False, aspiration_window = None))
+    print('Search depth 3 without killers and history:', benchmark_search(search_fens, 3, quiet_move_ordering = False))
+    print('Search depth 4:', benchmark_search(search_fens[:3], 4))
+    print('Search depth 4 without null move pruning:', benchmark_search(search_fens[:3], 4, null_move_pruning = False))
+    print('Search depth 4 without late move reductions:', benchmark_search(search_fens[:3], 4, late_move_reductions = False))
+    print('Search depth 4 without futility pruning:', benchmark_search(search_fens[:3], 4, futility_pruning = False, reverse_futility_pruning = False))
+    print('Search depth 3 tactical:', benchmark_search(benchmark_fens, 3))
+    print('Search depth 3 tactical without delta and SEE pruning:', benchmark_search(benchmark_fens, 3, delta_pruning = False, see_pruning = False))
+    print('Search depth 5 with a small hash table:', benchmark_search(search_fens, 5, hash_size_mb = 0.001))
+    print('Search depth 5 with a small hash table without principal variation ordering:', benchmark_search(search_fens, 5, hash_size_mb = 0.001, pv_ordering = False))
+    print('Lazy SMP depth 5:', benchmark_lazy_smp(search_fens, 5))
+    print('Root split depth 5:', benchmark_root_split(search_fens, 5))
+    print('Time control:', benchmark_time_control(benchmark_fens + search_fens))
+    print('Clock:', benchmark_clock(benchmark_fens + search_fens))
+    print('Background search:', benchmark_background_search(search_fens))
+    print('Background search with root split:', benchmark_background_search(search_fens, workers = 2, root_split = True))
+    print('Tactics depth 4:', benchmark_tactics(tactic_positions, 4))
+    print('Tactics depth 4 without late move reductions and futility pruning:', 
+          benchmark_tactics(tactic_positions, 4, late_move_reductions = False, futility_pruning = False, reverse_futility_pruning = False))
+    print('Pawn heavy perft depth 4:', perft_nodes_per_second(pawn_heavy_fens, 4))
+    print('Pawn heavy move generation:', benchmark_move_generation(pawn_heavy_fens, 3))
+    print('King walk king moves:', benchmark_king_moves(king_walk_fens))
+    print('King walk perft depth 4:', perft_nodes_per_second(king_walk_fens, 4))
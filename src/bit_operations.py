@@ -0,0 +1,37 @@
+###################################
+# Bit operations on bitboards
+###################################
+
+# Bitboards are python integers, so instead of looping bit by bit we use integer tricks that run in C:
+# - bit & -bit keeps only the least significant one (two's complement).
+# - int.bit_length() gives the index of the most significant one plus one.
+# - int.bit_count() counts the ones (python 3.10+).
+
+def get_set_bit_indices(bit):
+    '''
+    Yield the indices of the ones in a bit, from least to most significant. Each step pops the least significant one, so it
+    loops once per set bit instead of once per square.
+    '''
+    while bit:
+        least_significant_bit = bit & -bit
+        yield least_significant_bit.bit_length() - 1
+        bit ^= least_significant_bit
+
+def find_least_significant_bit_set(bitboard):
+    '''
+    Index of the least significant one, or -1 if there are no bits set.
+    '''
+    return (bitboard & -bitboard).bit_length() - 1
+
+if hasattr(int, 'bit_count'):
+    def count_bits(bit):
+        return bit.bit_count()
+else:
+    def count_bits(bit):
+        return bin(bit).count('1')
+
+def has_one_one(n):
+    '''
+    True if exactly one bit is set.
+    '''
+    return n != 0 and n & (n - 1) == 0
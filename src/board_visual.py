@@ -4,8 +4,8 @@ import time
 import argparse
 
 
-from BitPosition import Move, BitPosition, Engine, evaluation_function_black, evaluation_function_white
-from utils import board_to_bitboards, bitboards_to_board
+from BitPosition import BitPosition, decode_move, white_kingside_castling, white_queenside_castling, black_kingside_castling, black_queenside_castling, Engine, BackgroundSearch, position_from_state, evaluation_function_black, evaluation_function_white
+from utils import board_to_bitboards, mailbox_to_board
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Play Chess")
@@ -82,7 +82,7 @@ def play_and_undo_moves(position, depth, screen, square_size, pieces_images, boa
 
     for move in valid_moves:
         position.move(move)
-        updated_board = bitboards_to_board(position.bitboard)
+        updated_board = mailbox_to_board(position.mailbox)
         draw_board(screen, updated_board, None, (0, 0))
         pygame.display.flip()
         time.sleep(1)  # Wait for 1 second
@@ -131,22 +131,24 @@ def main():
     bitboards_array = board_to_bitboards(board)
     position = BitPosition(bitboards_array, turn = True)
 
+    if args.mode == 'engine':
+        player_is_white = args.side == 'white'
+        engine = Engine(evaluation_function_black if player_is_white else evaluation_function_white)
+        engine_turn = not player_is_white
+        # The engine thinks in a BackgroundSearch so the window keeps responding. On the player's time it ponders on the reply
+        # it expects (ponder_move)
+        search = None
+        ponder_move = None
+        game_over = False
+
     while True:
         if args.mode == 'engine':
-            player_is_white = args.side == 'white'
-            if player_is_white:
-                engine = Engine(evaluation_function_black)
-                engine_turn = False
-            else:
-                engine = Engine(evaluation_function_white)
-                engine_turn = True
-
             mouse_pos = pygame.mouse.get_pos()
             for e in pygame.event.get():
                 if e.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
-                elif e.type == pygame.MOUSEBUTTONDOWN: # Left click down
+                elif e.type == pygame.MOUSEBUTTONDOWN and not engine_turn and not game_over: # Left click down (the pieces can't be moved while the engine thinks)
                     selected_pos = get_square_at_pos(mouse_pos, square_size)
                     selected_piece = board[selected_pos[0] * 8 + selected_pos[1]]
                     if selected_piece != '0':
@@ -165,10 +167,10 @@ def main():
                                     break
                         if choice:
                             for move in promoting_moves:
-                                if move.prom == {'N': 1, 'B': 2, 'R': 3, 'Q': 4}[choice]:
+                                if decode_move(move).prom == {'N': 1, 'B': 2, 'R': 3, 'Q': 4}[choice]:
                                     position.move(move)
                                     move_history.append(move)
-                                    board = bitboards_to_board(position.bitboard)
+                                    board = mailbox_to_board(position.mailbox)
                                     board[to_index] = promotion_color + choice
                                     break
 
@@ -188,18 +190,18 @@ def main():
                             promoting_moves = []
 
                             for move in valid_moves:
-                                if move.i == from_index and move.j == to_index and move.prom == 0:
+                                if decode_move(move)[:3] == (from_index, to_index, 0):
                                     move_valid = True
                                     position.move(move)
                                     move_history.append(move)
                                     engine_turn = True
                                     break
-                                elif move.i == from_index and move.j == to_index and move.prom != 0:
+                                elif decode_move(move)[:2] == (from_index, to_index) and decode_move(move).prom != 0:
                                     promoting_moves.append(move)
 
 
                             if move_valid and promoting_moves == []:
-                                board = bitboards_to_board(position.bitboard)
+                                board = mailbox_to_board(position.mailbox)
                                 board[to_index] = selected_piece
                             
                             elif promoting_moves != []:
@@ -208,39 +210,59 @@ def main():
                                 promotion_color = 'w' if position.turn else 'b'
                                 draw_promotion_menu(screen, square_size, promotion_color)
                                     
-                            elif from_index == 4 and to_index == 6 and Move(7, 5, 0, -1) in valid_moves: # White kingside castling
-                                position.move(Move(7, 5, 0, -1))
-                                move_history.append(Move(7, 5, 0, -1))
-                                board = bitboards_to_board(position.bitboard)
+                            elif from_index == 4 and to_index == 6 and white_kingside_castling in valid_moves: # White kingside castling
+                                position.move(white_kingside_castling)
+                                move_history.append(white_kingside_castling)
+                                board = mailbox_to_board(position.mailbox)
                                 engine_turn = True
-                            elif from_index == 4 and to_index == 2 and Move(0, 3, 0, -1) in valid_moves: # White queenside castling
-                                position.move(Move(0, 3, 0, -1))
-                                move_history.append(Move(0, 3, 0, -1))
-                                board = bitboards_to_board(position.bitboard)
+                            elif from_index == 4 and to_index == 2 and white_queenside_castling in valid_moves: # White queenside castling
+                                position.move(white_queenside_castling)
+                                move_history.append(white_queenside_castling)
+                                board = mailbox_to_board(position.mailbox)
                                 engine_turn = True
-                            elif from_index == 60 and to_index == 62 and Move(63, 61, 0, -1) in valid_moves: # Black kingside castling
-                                position.move(Move(63, 61, 0, -1))
-                                move_history.append(Move(63, 61, 0, -1))
-                                board = bitboards_to_board(position.bitboard)
+                            elif from_index == 60 and to_index == 62 and black_kingside_castling in valid_moves: # Black kingside castling
+                                position.move(black_kingside_castling)
+                                move_history.append(black_kingside_castling)
+                                board = mailbox_to_board(position.mailbox)
                                 engine_turn = True
-                            elif from_index == 60 and to_index == 58 and Move(56, 59, 0, -1) in valid_moves: # Black queenside castling
-                                position.move(Move(56, 59, 0, -1))
-                                move_history.append(Move(56, 59, 0, -1))
-                                board = bitboards_to_board(position.bitboard)
+                            elif from_index == 60 and to_index == 58 and black_queenside_castling in valid_moves: # Black queenside castling
+                                position.move(black_queenside_castling)
+                                move_history.append(black_queenside_castling)
+                                board = mailbox_to_board(position.mailbox)
                                 engine_turn = True
                             else:
                                 board[from_index] = selected_piece  # Revert to original position
 
                             dragged_piece = None
                             selected_piece = None
-                if  engine_turn:
-                    engine_move = engine.Search(position, 5)[4]  # Replace 'engine' with your engine's variable
-                    position.move(engine_move)
-                    move_history.append(engine_move)
-                    board = bitboards_to_board(position.bitboard)
+
+            if engine_turn:
+                if search is not None and search.pondering:
+                    if move_history[-1] == ponder_move: # The expected move, the ponder search goes on with the time for our move
+                        search.ponderhit(5)
+                    else:
+                        search.stop()
+                        search = None
+                if search is None:
+                    search = BackgroundSearch(engine, position, 5)
+                elif search.done():
+                    result = search.result()
+                    engine_move = result[4]
+                    search = None
                     engine_turn = False  # Switch turns
+                    if not engine_move: # The player mated or stalemated the engine
+                        print('Checkmate' if position.is_check() else 'Stalemate')
+                        game_over = True
+                    else:
+                        position.move(engine_move)
+                        move_history.append(engine_move)
+                        board = mailbox_to_board(position.mailbox)
+                        ponder_move = result[10][1] if len(result[10]) > 1 else None
+                        if ponder_move:
+                            ponder_position = position_from_state(position.state())
+                            ponder_position.move(ponder_move)
+                            search = BackgroundSearch(engine, ponder_position, ponder = True)
 
-                
         else:
             mouse_pos = pygame.mouse.get_pos()
 
@@ -270,10 +292,10 @@ def main():
                                     break
                         if choice:
                             for move in promoting_moves:
-                                if move.prom == {'N': 1, 'B': 2, 'R': 3, 'Q': 4}[choice]:
+                                if decode_move(move).prom == {'N': 1, 'B': 2, 'R': 3, 'Q': 4}[choice]:
                                     position.move(move)
                                     move_history.append(move)
-                                    board = bitboards_to_board(position.bitboard)
+                                    board = mailbox_to_board(position.mailbox)
                                     board[to_index] = promotion_color + choice
                                     break
 
@@ -294,17 +316,17 @@ def main():
                             promoting_moves = []
 
                             for move in valid_moves:
-                                if move.i == from_index and move.j == to_index and move.prom == 0:
+                                if decode_move(move)[:3] == (from_index, to_index, 0):
                                     move_valid = True
                                     position.move(move)
                                     move_history.append(move)
                                     break
-                                elif move.i == from_index and move.j == to_index and move.prom != 0:
+                                elif decode_move(move)[:2] == (from_index, to_index) and decode_move(move).prom != 0:
                                     promoting_moves.append(move)
 
 
                             if move_valid and promoting_moves == []:
-                                board = bitboards_to_board(position.bitboard)
+                                board = mailbox_to_board(position.mailbox)
                                 board[to_index] = selected_piece
                             
                             elif promoting_moves != []:
@@ -313,22 +335,22 @@ def main():
                                 promotion_color = 'w' if position.turn else 'b'
                                 draw_promotion_menu(screen, square_size, promotion_color)
                                     
-                            elif from_index == 4 and to_index == 6 and Move(7, 5, 0, -1) in valid_moves: # White kingside castling
-                                position.move(Move(7, 5, 0, -1))
-                                move_history.append(Move(7, 5, 0, -1))
-                                board = bitboards_to_board(position.bitboard)
-                            elif from_index == 4 and to_index == 2 and Move(0, 3, 0, -1) in valid_moves: # White queenside castling
-                                position.move(Move(0, 3, 0, -1))
-                                move_history.append(Move(0, 3, 0, -1))
-                                board = bitboards_to_board(position.bitboard)
-                            elif from_index == 60 and to_index == 62 and Move(63, 61, 0, -1) in valid_moves: # Black kingside castling
-                                position.move(Move(63, 61, 0, -1))
-                                move_history.append(Move(63, 61, 0, -1))
-                                board = bitboards_to_board(position.bitboard)
-                            elif from_index == 60 and to_index == 58 and Move(56, 59, 0, -1) in valid_moves: # Black queenside castling
-                                position.move(Move(56, 59, 0, -1))
-                                move_history.append(Move(56, 59, 0, -1))
-                                board = bitboards_to_board(position.bitboard)
+                            elif from_index == 4 and to_index == 6 and white_kingside_castling in valid_moves: # White kingside castling
+                                position.move(white_kingside_castling)
+                                move_history.append(white_kingside_castling)
+                                board = mailbox_to_board(position.mailbox)
+                            elif from_index == 4 and to_index == 2 and white_queenside_castling in valid_moves: # White queenside castling
+                                position.move(white_queenside_castling)
+                                move_history.append(white_queenside_castling)
+                                board = mailbox_to_board(position.mailbox)
+                            elif from_index == 60 and to_index == 62 and black_kingside_castling in valid_moves: # Black kingside castling
+                                position.move(black_kingside_castling)
+                                move_history.append(black_kingside_castling)
+                                board = mailbox_to_board(position.mailbox)
+                            elif from_index == 60 and to_index == 58 and black_queenside_castling in valid_moves: # Black queenside castling
+                                position.move(black_queenside_castling)
+                                move_history.append(black_queenside_castling)
+                                board = mailbox_to_board(position.mailbox)
                             else:
                                 board[from_index] = selected_piece  # Revert to original position
 
@@ -340,7 +362,7 @@ def main():
                         if move_history:  # Check if there are moves to undo
                             last_move = move_history.pop()  # Get the last move
                             position.unmake_move(last_move)  # Undo the last move
-                            board = bitboards_to_board(position.bitboard)  # Update board display
+                            board = mailbox_to_board(position.mailbox)  # Update board display
 
                     elif e.key == pygame.K_SPACE:  # Press SPACE to start the auto-play and undo
                         play_and_undo_moves(position, 1, screen, square_size, pieces_images, board, promoting, promotion_color)  # Depth is set to 2 here
@@ -2,7 +2,7 @@
 # Test Move generator efficiency and correctness on position
 ###################################
 
-from BitPosition import BitPosition
+from BitPosition import BitPosition, decode_move
 from utils import board_to_bitboards, bitposition_to_chessboard, compare_dicts, bitposition_to_fen
 import time
 import chess
@@ -105,7 +105,7 @@ def move_maker_v2(bitposition, depth, initial_depth, leaf_nodes=None):
         count += leaf_count
 
         if depth == initial_depth:
-            leaf_nodes[(move.i, move.j)] = leaf_count  # Store the leaf node count for the initial move
+            leaf_nodes[decode_move(move)[:2]] = leaf_count  # Store the leaf node count for the initial move
         
         bitposition.unmake_move(move)  # Unmake the move
 
@@ -0,0 +1,66 @@
+###################################
+# Time management
+###################################
+
+# With a clock (time left, increment and moves to go until the next time control) each move gets a share of the time left.
+# The soft limit is the time we aim to use: after each iteration the search stops if it went past it. It is scaled by how the
+# search is going, extended if the best move changed or the score dropped (we may be about to make a mistake) and shortened if
+# the best move has been the same for several iterations. The hard limit is the deadline the search polls, it is never
+# exceeded (apart from the time between two polls) and keeps enough time on the clock for the next moves.
+# All times are in seconds (UCI sends milliseconds).
+
+default_moves_to_go = 30 # Moves we plan for in sudden death (no moves to go), more than a game usually has left
+move_overhead = 0.05 # Time kept on every move for the GUI and the communication
+max_clock_share = 0.8 # The hard limit never uses more of the clock than this, the search may overrun it by a clock poll
+max_extension = 4 # The hard limit is at most this many times the soft limit
+score_drop = 15 # A score this much lower than the previous iteration's (in evaluation units, a pawn is 20) extends the time
+stable_iterations = 3 # Iterations with the same best move after which we stop early
+
+class TimeManager:
+    def __init__(self, time_left, increment = 0, moves_to_go = None):
+        time_left = max(time_left - move_overhead, 0)
+        moves_to_go = min(moves_to_go or default_moves_to_go, default_moves_to_go)
+        self.hard_limit = min((time_left / moves_to_go + increment) * max_extension, time_left * max_clock_share)
+        self.soft_limit = min(time_left / moves_to_go + increment * 0.75, self.hard_limit)
+        self.adjust = True # The soft limit is scaled with the stability of the search
+        self.scale = 1
+        self.best_move = None
+        self.best_value = None
+        self.stable_iterations = 0
+
+    @classmethod
+    def move_time(cls, time_left):
+        '''
+        A fixed time for the move (like UCI movetime): the search uses it all, the soft and hard limits are the same.
+        '''
+        time_manager = cls(0)
+        time_manager.soft_limit = time_manager.hard_limit = time_left
+        time_manager.adjust = False
+        return time_manager
+
+    def update(self, best_move, value):
+        '''
+        Call after each completed iteration with its best move and score to scale the soft limit.
+        '''
+        if best_move == self.best_move:
+            self.stable_iterations += 1
+        else:
+            self.stable_iterations = 0
+        if self.adjust and self.best_move is not None:
+            scale = 1
+            if self.stable_iterations == 0: # The best move changed
+                scale *= 1.5
+            elif self.stable_iterations >= stable_iterations:
+                scale *= 0.5
+            if value < self.best_value - score_drop:
+                scale *= 2
+            self.scale = scale
+        self.best_move = best_move
+        self.best_value = value
+
+    def start_iteration(self, elapsed, predicted_time):
+        '''
+        Whether to start a new iteration after elapsed seconds, if it is predicted to take predicted_time. We don't if we are
+        past the (scaled) soft limit or it wouldn't finish before the hard limit.
+        '''
+        return elapsed < min(self.soft_limit * self.scale, self.hard_limit) and elapsed + predicted_time <= self.hard_limit
@@ -0,0 +1,155 @@
+###################################
+# Transposition table
+###################################
+
+# The transposition table stores for positions already searched (by their Zobrist key) the depth they were searched to, the
+# score, whether the score is exact or a bound and the best move. It has a fixed size: the entries live in preallocated arrays
+# (one per field) grouped in buckets of bucket_size entries, and a position can only be stored in the bucket its key indexes.
+# When a bucket is full we replace the entry from the oldest search, and among those the shallowest one.
+# A shared table lives in a multiprocessing.shared_memory block, so several processes (Lazy SMP) can use the same one. Writes 
+# are not locked, so instead of the key we store the key XOR the rest of the entry: if two processes write the same entry at 
+# once the stored key doesn't match any more and the entry is simply not found (a move from another position is never returned).
+# The block is freed by close, or when the table is garbage collected (or at exit) if it wasn't closed.
+
+import weakref
+from array import array
+from multiprocessing import shared_memory
+
+# Bound types
+EXACT = 0 # The score is the value of the position
+LOWER = 1 # The search failed high, the value is at least the score
+UPPER = 2 # The search failed low, the value is at most the score
+
+bucket_size = 4
+entry_bytes = 8 + 4 + 4 + 1 + 1 + 1 # key, move, score, depth, bound, age
+
+def entry_data(move, score, depth, bound):
+    '''
+    The fields of an entry packed in an integer below 2**64, the stored key is the position's key XOR this.
+    '''
+    return move | (int(score) & 0xFFFF) << 20 | depth << 36 | bound << 44 # (The evaluation may return numpy integers)
+
+def free_shared_memory(block, views, owner):
+    '''
+    Release the views of a shared table and close its memory block, the process that created it also unlinks it (otherwise
+    it outlives the process).
+    '''
+    for view in views:
+        view.release()
+    block.close()
+    if owner:
+        block.unlink()
+
+class TranspositionTable:
+    def __init__(self, size_mb = 16, shared = False, name = None):
+        '''
+        With shared a new shared memory block is created for the table, with name the table attaches to the block of that name
+        (the name of a shared table, with the same size_mb).
+        '''
+        buckets = 1
+        while (buckets * 2) * bucket_size * entry_bytes <= size_mb * 1024 * 1024: # Power of two so the bucket is key & mask
+            buckets *= 2
+        self.bucket_mask = buckets - 1
+        self.size = buckets * bucket_size
+        if shared or name is not None:
+            self.shared_memory = shared_memory.SharedMemory(name, create = name is None, size = entry_bytes * self.size)
+            self.name = self.shared_memory.name
+            buffer = self.shared_memory.buf
+            size = self.size
+            self.keys = buffer[:8 * size].cast('Q')
+            self.moves = buffer[8 * size:12 * size].cast('I')
+            self.scores = buffer[12 * size:16 * size].cast('i')
+            self.depths = buffer[16 * size:17 * size]
+            self.bounds = buffer[17 * size:18 * size]
+            self.ages = buffer[18 * size:19 * size]
+            self.owner = name is None # The process that created the block frees it
+            self.finalizer = weakref.finalize(self, free_shared_memory, self.shared_memory, 
+                                              (self.keys, self.moves, self.scores, self.depths, self.bounds, self.ages), self.owner)
+        else:
+            self.shared_memory = None
+            self.name = None
+            self.keys = array('Q', bytes(8 * self.size))
+            self.moves = array('I', bytes(4 * self.size))
+            self.scores = array('i', bytes(4 * self.size))
+            self.depths = array('B', bytes(self.size))
+            self.bounds = array('B', bytes(self.size))
+            self.ages = array('B', bytes(self.size))
+        self.age = 0 # Age of the current search, entries from older searches are replaced first
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        '''
+        Call before each search, so entries of previous searches are replaced first. Also resets the hit rate.
+        '''
+        self.age = (self.age + 1) & 255
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        if self.shared_memory is not None:
+            self.shared_memory.buf[:] = bytes(len(self.shared_memory.buf))
+            return
+        for table in (self.keys, self.moves, self.scores, self.depths, self.bounds, self.ages):
+            table[:] = array(table.typecode, bytes(table.itemsize * self.size))
+
+    def close(self):
+        '''
+        Stop using a shared table, the process that created it also frees the shared memory.
+        '''
+        if self.shared_memory is not None:
+            self.finalizer()
+            self.shared_memory = None
+
+    def probe(self, key):
+        '''
+        Return (move, depth, bound, score) of the position with this Zobrist key, or None if it is not stored. The move is 0
+        if no best move was stored.
+        '''
+        self.probes += 1
+        keys = self.keys
+        start = (key & self.bucket_mask) * bucket_size
+        for index in range(start, start + bucket_size):
+            move, score, depth, bound = self.moves[index], self.scores[index], self.depths[index], self.bounds[index]
+            if keys[index] ^ entry_data(move, score, depth, bound) == key:
+                self.hits += 1
+                return move, depth, bound, score
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        '''
+        Store a search result, replacing the same position if it is in its bucket. Otherwise we replace the entry with the
+        lowest depth, where every search of age difference counts as 8 plies less.
+        '''
+        keys = self.keys
+        depths = self.depths
+        ages = self.ages
+        age = self.age
+        start = (key & self.bucket_mask) * bucket_size
+        replace = start
+        replace_value = 1 << 16
+        for index in range(start, start + bucket_size):
+            if keys[index] ^ entry_data(self.moves[index], self.scores[index], depths[index], self.bounds[index]) == key:
+                if depth < depths[index] and bound != EXACT and ages[index] == age: # Keep the deeper result of this search
+                    if move and not self.moves[index]:
+                        keys[index] ^= entry_data(move, 0, 0, 0) # (The stored key depends on the move)
+                        self.moves[index] = move
+                    return
+                replace = index
+                break
+            value = depths[index] - 8 * ((age - ages[index]) & 255)
+            if value < replace_value:
+                replace = index
+                replace_value = value
+        keys[replace] = key ^ entry_data(move, score, depth, bound)
+        self.moves[replace] = move
+        self.scores[replace] = score
+        depths[replace] = depth
+        self.bounds[replace] = bound
+        ages[replace] = age
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0
+
+    def memory_bytes(self):
+        return sum(table.itemsize * len(table) for table in (self.keys, self.moves, self.scores, self.depths, self.bounds, self.ages))
@@ -1,10 +1,18 @@
+import os
+import mmap
+import array
+import struct
+import hashlib
+import random
 import chess
 import numpy as np
 
+from bit_operations import get_set_bit_indices, count_bits
+
 def bit_to_numpy_array(bit):
     array = np.zeros(64, dtype=int)
-    for i in range(64):
-        array[i] = (bit >> i) & 1
+    for i in get_set_bit_indices(bit):
+        array[i] = 1
     return array[::-1]
 
 def compare_dicts(dict1, dict2):
@@ -24,25 +32,23 @@ def bitposition_to_chessboard(bitposition):
 
     piece_symbols = ['P', 'N', 'B', 'R', 'Q', 'K', 'p', 'n', 'b', 'r', 'q', 'k']
     
-    # Iterate through each bitboard and set pieces on the board
-    for i, bitboard in enumerate(bitposition.bitboard):
-        # For each square, check if there's a piece and place it
-        for square in range(64):
-            if bitboard & (1 << square):
-                board.set_piece_at(chess.SQUARES[square], chess.Piece.from_symbol(piece_symbols[i]))
+    # Read each piece from the square to piece mailbox
+    for square, piece_index in enumerate(bitposition.mailbox):
+        if piece_index != -1:
+            board.set_piece_at(chess.SQUARES[square], chess.Piece.from_symbol(piece_symbols[piece_index]))
 
     # Set the turn
     board.turn = chess.WHITE if bitposition.turn else chess.BLACK
 
     # Set castling rights
     board.castling_rights = 0
-    if bitposition.wc[0]:
+    if bitposition.castling_rights & 8:
         board.castling_rights |= chess.BB_H1
-    if bitposition.wc[1]:
+    if bitposition.castling_rights & 4:
         board.castling_rights |= chess.BB_A1
-    if bitposition.bc[0]:
+    if bitposition.castling_rights & 2:
         board.castling_rights |= chess.BB_H8
-    if bitposition.bc[1]:
+    if bitposition.castling_rights & 1:
         board.castling_rights |= chess.BB_A8
 
     # Set en passant square
@@ -55,12 +61,8 @@ def bitposition_to_fen(bitposition):
     # Mapping of piece types to their representations
     pieces = ['P', 'N', 'B', 'R', 'Q', 'K', 'p', 'n', 'b', 'r', 'q', 'k']
 
-    # Generate the 8x8 board representation
-    board = [''] * 64
-    for i, bitboard in enumerate(bitposition.bitboard):
-        for j in range(64):
-            if bitboard & (1 << j):
-                board[j] = pieces[i]
+    # Generate the 8x8 board representation from the square to piece mailbox
+    board = [pieces[piece_index] if piece_index != -1 else '' for piece_index in bitposition.mailbox]
 
     # Convert board to FEN string
     fen_rows = []
@@ -85,8 +87,8 @@ def bitposition_to_fen(bitposition):
     turn = 'w' if bitposition.turn else 'b'
 
     # Castling rights
-    wc = ''.join(['K' if bitposition.wc[0] else '', 'Q' if bitposition.wc[1] else ''])
-    bc = ''.join(['k' if bitposition.bc[0] else '', 'q' if bitposition.bc[1] else ''])
+    wc = ''.join(['K' if bitposition.castling_rights & 8 else '', 'Q' if bitposition.castling_rights & 4 else ''])
+    bc = ''.join(['k' if bitposition.castling_rights & 2 else '', 'q' if bitposition.castling_rights & 1 else ''])
     castling_rights = wc + bc or '-'
 
     # En passant target square
@@ -99,37 +101,6 @@ def bitposition_to_fen(bitposition):
 
     return f'{fen_board} {turn} {castling_rights} {ep_square} 0 1'  # Assuming halfmove and fullmove are set to default values
 
-def has_one_one(n):
-    count = 0
-    while n:
-        n &= (n - 1)  # Flip the least significant 1 bit of n to 0
-        count += 1
-        if count > 1:
-            return False
-    if count == 1:
-        return True
-    return False
-
-
-def get_set_bit_indices(bit):
-    # Get the indices of the ones in a bit
-    indices = []
-    index = 0
-    while bit:
-        if bit & 1:
-            yield index
-        index += 1
-        bit >>= 1
-
-def find_least_significant_bit_set(bitboard):
-    if bitboard == 0:
-        return -1  # No bits are set
-    position = 0
-    while (bitboard & 1) == 0:
-        bitboard >>= 1
-        position += 1
-    return position
-
 def board_to_bitboards(board):
     """
     Convert a standard board representation to a set of bitboards.
@@ -167,14 +138,19 @@ def bitboards_to_board(bitboards):
     pieces_1 = ['wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK']
     board = ['0'] * 64
     for piece_index, bitboard in enumerate(bitboards): # w_pawns, w_knights, w_bishops, w_rooks, w_queens, w_king, ...
-        for i in range(64):
-            if bitboard & (1 << (i)):
-                #board_row = i // 8
-                #board_column = 7-(i % 8)
-                #board_index = board_row * 8 + board_column
-                board[i] = pieces_1[piece_index]
+        for i in get_set_bit_indices(bitboard):
+            board[i] = pieces_1[piece_index]
     return board
 
+def mailbox_to_board(mailbox):
+    """
+    Convert the square to piece mailbox of a BitPosition (piece index or -1 for empty squares) to a standard board representation.
+    Returns:
+    list: A list of 64 characters representing the board state.
+    """
+    pieces_1 = ['wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK']
+    return [pieces_1[piece_index] if piece_index != -1 else '0' for piece_index in mailbox]
+
 
 def generate_knight_moves(square): # Crawler (bitboard for all squares)
     moves = 0
@@ -543,3 +519,97 @@ def get_ordered_blockers(square, piece_type):
     return ordered_blockers
 
 
+
+
+def find_magic_number(square, piece_type, seed=None):
+    '''
+    Search for a magic number for a rook or bishop on a given square. Multiplying the blockers on the unfull rays by the magic
+    number (modulo 2^64) and keeping the top n bits, where n is the number of squares on the unfull rays, gives an index with
+    no destructive collisions. Returns the tuple (magic_number, shift) with shift = 64 - n.
+    '''
+    if piece_type == 'R':
+        ray_mask = generate_rook_unfull_rays(square)
+    elif piece_type == 'B':
+        ray_mask = generate_bishop_unfull_rays(square)
+    else:
+        return 'piece type should be either R or B'
+
+    relevant_bits = count_bits(ray_mask)
+    shift = 64 - relevant_bits
+    blockers_bits = generate_bit_combinations(square, piece_type)
+    valid_moves_bits = [get_valid_piece_moves_including_captures(square, piece_type, blockers_bit) for blockers_bit in blockers_bits]
+
+    rng = random.Random(seed)
+    while True:
+        # Sparse candidates (few ones) are much more likely to be magic
+        magic_number = rng.getrandbits(64) & rng.getrandbits(64) & rng.getrandbits(64)
+        if count_bits((ray_mask * magic_number) & 0xFF00000000000000) < 6:
+            continue
+        used = [None] * (1 << relevant_bits)
+        for blockers_bit, valid_moves_bit in zip(blockers_bits, valid_moves_bits):
+            index = ((blockers_bit * magic_number) & 0xFFFFFFFFFFFFFFFF) >> shift
+            if used[index] is None:
+                used[index] = valid_moves_bit
+            elif used[index] != valid_moves_bit: # Destructive collision, try another number
+                break
+        else:
+            return magic_number, shift
+
+
+######################################################
+# Binary cache for precomputed tables
+######################################################
+
+# Header: file tag, version, checksum of the sources the tables were built from, checksum of the data, number of tables.
+# Then for each table its name, offset (in bytes from the start of the data) and number of 64-bit integers.
+table_cache_tag = b'BITPOSTB'
+table_cache_header = struct.Struct('<8sI32s32sI')
+table_cache_entry = struct.Struct('<32sQQ')
+
+def write_table_cache(path, version, source_checksum, tables):
+    '''
+    Store a dictionary of flat tables of unsigned 64-bit integers in a binary file. It is written to a temporary file first
+    and then renamed, so processes reading the cache at the same time never see half a file.
+    '''
+    names = list(tables)
+    data = bytearray()
+    entries = []
+    for name in names:
+        entries.append((name.encode(), len(data), len(tables[name])))
+        data += array.array('Q', tables[name]).tobytes()
+
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(table_cache_header.pack(table_cache_tag, version, source_checksum, hashlib.sha256(data).digest(), len(names)))
+        for entry in entries:
+            file.write(table_cache_entry.pack(*entry))
+        file.write(data)
+    os.replace(temporary_path, path)
+
+def read_table_cache(path, version, source_checksum):
+    '''
+    Memory-map a file written by write_table_cache and return a dictionary of memoryviews (format 'Q') of its tables. Returns None
+    if the file is missing, has another version, was built from other sources or its data doesn't match the checksum.
+    '''
+    try:
+        with open(path, 'rb') as file:
+            mapped_file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError): # Missing or empty file
+        return None
+
+    if len(mapped_file) < table_cache_header.size:
+        return None
+    tag, file_version, file_source_checksum, data_checksum, num_tables = table_cache_header.unpack_from(mapped_file)
+    if tag != table_cache_tag or file_version != version or file_source_checksum != source_checksum:
+        return None
+
+    data_start = table_cache_header.size + num_tables * table_cache_entry.size
+    data = memoryview(mapped_file)[data_start:]
+    if hashlib.sha256(data).digest() != data_checksum:
+        return None
+
+    tables = {}
+    for i in range(num_tables):
+        name, offset, length = table_cache_entry.unpack_from(mapped_file, table_cache_header.size + i * table_cache_entry.size)
+        tables[name.rstrip(b'\0').decode()] = data[offset:offset + 8 * length].cast('Q')
+    return tables